@@ -0,0 +1,223 @@
+""" bulk IP access rules for Cloudflare API"""
+from __future__ import absolute_import
+
+import re
+
+from .exceptions import CloudFlareError, CloudFlareAPIError
+from .paging import all_pages
+from .parallel import imap_unordered, RateLimit, DEFAULT_WORKERS, DEFAULT_RATE
+
+# the largest page size allowed when listing access rules
+PER_PAGE = 1000
+MODES = ['block', 'challenge', 'js_challenge', 'managed_challenge', 'whitelist']
+
+def target(value):
+    """ the (target, value) of an access rule for an IP, CIDR, ASN (12345 or AS12345) or country code
+
+    A (target, value) tuple (or a configuration dict) is passed thru; values are normalized so
+    that they compare equal to the ones the API returns.
+    """
+
+    if isinstance(value, dict):
+        value = (value['target'], value['value'])
+    if isinstance(value, tuple):
+        rule_target, value = value
+    elif isinstance(value, int) or re.match(r'^(AS)?[0-9]+$', value, re.IGNORECASE):
+        rule_target = 'asn'
+    elif '/' in value:
+        rule_target = 'ip_range'
+    elif ':' in value:
+        rule_target = 'ip6'
+    elif re.match(r'^[A-Za-z][A-Za-z0-9]$', value):
+        rule_target = 'country'
+    else:
+        rule_target = 'ip'
+    value = str(value).strip()
+    if rule_target == 'asn':
+        value = 'AS' + re.sub(r'^AS', '', value, flags=re.IGNORECASE)
+    elif rule_target == 'country':
+        value = value.upper()
+    else:
+        value = value.lower()
+    return rule_target, value
+
+def _rules(cf, zone_id=None, organization_id=None):
+    """ the access rules endpoint for a zone, an organization or the user - returns (rules, identifier, scope)"""
+
+    if zone_id and organization_id:
+        raise CloudFlareAPIError(0, 'access rules are for a zone or an organization; not both')
+    if zone_id:
+        return cf.zones.firewall.access_rules.rules, zone_id, 'zone'
+    if organization_id:
+        return cf.organizations.firewall.access_rules.rules, organization_id, 'organization'
+    return cf.user.firewall.access_rules.rules, None, 'user'
+
+class Plan(object):
+    """ the changes needed to make the access rules of one mode match the desired values
+
+    adds is a list of (target, value), removes a list of current rules and conflicts a list of
+    current rules for a desired value that have another mode (these are left alone).
+    errors is a list of (action, item, exception) once applied.
+    """
+
+    def __init__(self, mode, scope, identifier, notes=None):
+        """ bulk IP access rules for Cloudflare API"""
+
+        self.mode = mode
+        self.scope = scope
+        self.identifier = identifier
+        self.notes = notes
+        self.adds = []
+        self.removes = []
+        self.conflicts = []
+        self.unchanged = 0
+        self.desired = 0
+        # API calls used to read the rules
+        self.read_calls = 0
+        self.applied = False
+        self.errors = []
+
+    @property
+    def api_calls(self):
+        """ API calls used to read the rules and make the changes"""
+
+        return self.read_calls + len(self.adds) + len(self.removes)
+
+    @property
+    def saved(self):
+        """ API calls saved compared with looking up each desired value before adding it"""
+
+        naive = self.desired + len(self.adds) + len(self.removes)
+        return max(naive - self.api_calls, 0)
+
+    def summary(self):
+        """ the plan (and its results) as a dict"""
+
+        return {
+            'mode': self.mode,
+            'scope': self.scope,
+            'add': len(self.adds),
+            'remove': len(self.removes),
+            'conflicts': len(self.conflicts),
+            'unchanged': self.unchanged,
+            'api_calls': self.api_calls,
+            'api_calls_saved': self.saved,
+            'applied': self.applied,
+            'errors': len(self.errors),
+        }
+
+def diff(current, desired, mode, scope, notes=None, remove=True):
+    """ compare rules from the API with the desired values - returns (adds, removes, conflicts, unchanged)
+
+    Rules are indexed by their (target, value); so this is linear in the number of rules.
+    Only rules of this mode, made at this scope (not inherited from the user or organization)
+    and, if notes is given, with those notes are ever removed.
+    """
+
+    by_config = {}
+    for rule in current:
+        by_config[target(rule['configuration'])] = rule
+
+    adds = []
+    conflicts = []
+    unchanged = 0
+    wanted = set()
+    for value in desired:
+        key = target(value)
+        if key in wanted:
+            continue
+        wanted.add(key)
+        rule = by_config.get(key)
+        if rule is None:
+            adds.append(key)
+        elif rule['mode'] == mode:
+            unchanged += 1
+        else:
+            conflicts.append(rule)
+
+    removes = []
+    if remove:
+        for key, rule in by_config.items():
+            if key in wanted or rule['mode'] != mode:
+                continue
+            if (rule.get('scope') or {}).get('type', scope) != scope:
+                continue
+            if notes is not None and rule.get('notes') != notes:
+                continue
+            removes.append(rule)
+    return adds, removes, conflicts, unchanged
+
+def plan(cf, desired, mode='block', zone_id=None, organization_id=None, notes=None, remove=True,
+         workers=DEFAULT_WORKERS):
+    """ work out the changes needed to make the rules of mode match desired (IPs, CIDRs, ASNs or
+    country codes) - nothing is changed
+
+    The rules are for a zone, an organization or (with neither) the user. Every existing rule is
+    read once (a page of PER_PAGE at a time).
+    """
+
+    if mode not in MODES:
+        raise CloudFlareAPIError(0, '%s: unknown access rule mode' % (mode))
+    rules, identifier, scope = _rules(cf, zone_id, organization_id)
+    p = Plan(mode, scope, identifier, notes)
+    current = list(all_pages(rules, identifier, per_page=PER_PAGE, workers=workers))
+    p.read_calls += max((len(current) + PER_PAGE - 1) // PER_PAGE, 1)
+
+    desired = list(desired)
+    p.desired = len(desired)
+    p.adds, p.removes, p.conflicts, p.unchanged = diff(current, desired, mode, scope, notes, remove)
+    return p
+
+def apply(cf, p, rate=DEFAULT_RATE, workers=DEFAULT_WORKERS):
+    """ make the changes in a plan; workers at a time and no faster than rate a second - failures are
+    added to p.errors
+    """
+
+    if p.scope == 'zone':
+        rules = cf.zones.firewall.access_rules.rules
+    elif p.scope == 'organization':
+        rules = cf.organizations.firewall.access_rules.rules
+    else:
+        rules = cf.user.firewall.access_rules.rules
+    identifiers = [p.identifier] if p.identifier else []
+    rate_limit = RateLimit(rate)
+
+    def add(key):
+        """ one add"""
+        data = {'mode': p.mode, 'configuration': {'target': key[0], 'value': key[1]}}
+        if p.notes is not None:
+            data['notes'] = p.notes
+        rate_limit.wait()
+        return rules.post(*identifiers, data=data)
+
+    def remove(rule):
+        """ one remove"""
+        rate_limit.wait()
+        return rules.delete(*(identifiers + [rule['id']]))
+
+    def run(action, func, items):
+        """ workers at a time"""
+        for item, _, error in imap_unordered(func, items, workers):
+            if error is not None:
+                if not isinstance(error, CloudFlareError):
+                    raise error
+                p.errors.append((action, item, error))
+
+    run('remove', remove, p.removes)
+    run('add', add, p.adds)
+    p.applied = True
+    return p
+
+def sync(cf, desired, mode='block', zone_id=None, organization_id=None, notes=None, remove=True,
+         dry_run=False, rate=DEFAULT_RATE, workers=DEFAULT_WORKERS):
+    """ make the access rules of mode match desired (IPs, CIDRs, ASNs or country codes) - returns the Plan
+
+    New rules get notes; with notes given only rules with those notes are removed (so rules made
+    by hand are left alone). With remove=False nothing is removed. With dry_run=True the plan is
+    worked out but nothing is changed.
+    """
+
+    p = plan(cf, desired, mode, zone_id, organization_id, notes, remove, workers)
+    if not dry_run:
+        apply(cf, p, rate, workers)
+    return p
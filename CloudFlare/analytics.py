@@ -0,0 +1,249 @@
+""" chunked analytics for Cloudflare API"""
+from __future__ import absolute_import
+
+import hashlib
+import json
+import os
+import time
+
+from .exceptions import CloudFlareAPIError
+from .logpull import timestamp
+from .parallel import imap, RateLimit, DEFAULT_WORKERS, DEFAULT_RATE
+
+# a long time range is fetched this many seconds at a time
+DEFAULT_CHUNK = 86400
+# recent analytics are still being aggregated - chunks that ended less than this long ago are never cached
+SETTLE = 3 * 3600
+# the endpoints that can be fetched in chunks
+ENDPOINTS = ['dashboard', 'colos', 'dns']
+
+def chunks(since, until, chunk=DEFAULT_CHUNK):
+    """ split since to until (unix times or datetimes) into a list of (start, end) chunks
+
+    Chunks end on multiples of chunk so that the same chunks come up every time; only the first
+    (which starts at since) and the last (which ends at until) can be short.
+    """
+
+    since, until = timestamp(since), timestamp(until)
+    results = []
+    start = since
+    while start < until:
+        end = min(start - start % chunk + chunk, until)
+        results.append((start, end))
+        start = end
+    return results
+
+def iso(t):
+    """ a unix time as the API wants it"""
+
+    return time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(t))
+
+def _get(cf, endpoint, zone_id, start, end, params):
+    """ one chunk from the API"""
+
+    params = dict(params or {}, since=iso(start), until=iso(end))
+    if endpoint == 'dns':
+        r = cf.zones.dns_analytics.report.bytime.get(zone_id, params=params)
+    else:
+        # continuous would move the chunk back in time to where the data is complete
+        params.setdefault('continuous', 'false')
+        r = getattr(cf.zones.analytics, endpoint).get(zone_id, params=params)
+    if cf._base.raw:
+        return r['result']
+    return r
+
+def _add(a, b):
+    """ two sets of totals added together - dicts are added key by key; other values are kept from a
+    (a can be None)"""
+
+    if isinstance(a, dict) and isinstance(b, dict):
+        result = dict(a)
+        for key, value in b.items():
+            result[key] = _add(a[key], value) if key in a else value
+        return result
+    if isinstance(a, (int, float)) and isinstance(b, (int, float)) and not isinstance(a, bool):
+        return a + b
+    return a if a is not None else b
+
+def _merge_dashboard(results):
+    """ the chunks of zones/analytics/dashboard as one"""
+
+    totals = None
+    timeseries = []
+    for result in results:
+        totals = _add(totals, result.get('totals'))
+        timeseries.extend(result.get('timeseries') or [])
+    if totals is not None and timeseries:
+        totals['since'] = timeseries[0].get('since')
+        totals['until'] = timeseries[-1].get('until')
+    return {'totals': totals, 'timeseries': timeseries}
+
+def _merge_colos(results):
+    """ the chunks of zones/analytics/colos as one - each colo's timeseries is joined up"""
+
+    colos = []
+    by_id = {}
+    for result in results:
+        for colo in result:
+            merged = by_id.get(colo['colo_id'])
+            if merged is None:
+                merged = by_id[colo['colo_id']] = {'colo_id': colo['colo_id'], 'totals': None, 'timeseries': []}
+                colos.append(merged)
+            merged['totals'] = _add(merged['totals'], colo.get('totals'))
+            merged['timeseries'].extend(colo.get('timeseries') or [])
+    return colos
+
+def _merge_dns(results):
+    """ the chunks of zones/dns_analytics/report/bytime as one - a row that's missing from a chunk is zeros there"""
+
+    intervals = []
+    rows = []
+    by_dimensions = {}
+    totals = {}
+    minimum = {}
+    maximum = {}
+    query = None
+    for result in results:
+        n = len(result.get('time_intervals') or [])
+        metrics = (result.get('query') or {}).get('metrics') or []
+        for row in result.get('data') or []:
+            key = tuple(row.get('dimensions') or [])
+            merged = by_dimensions.get(key)
+            if merged is None:
+                merged = by_dimensions[key] = {'dimensions': list(key),
+                                               'metrics': [[0] * len(intervals) for _ in row['metrics']]}
+                rows.append(merged)
+            for series, values in zip(merged['metrics'], row['metrics']):
+                series.extend(values)
+        for merged in rows:
+            for series in merged['metrics']:
+                series.extend([0] * (len(intervals) + n - len(series)))
+        intervals.extend(result.get('time_intervals') or [])
+        for metric in metrics:
+            for merged_values, values, pick in [(totals, result.get('totals'), None),
+                                                (minimum, result.get('min'), min),
+                                                (maximum, result.get('max'), max)]:
+                if not values or metric not in values:
+                    continue
+                if metric not in merged_values:
+                    merged_values[metric] = values[metric]
+                elif pick is None:
+                    merged_values[metric] += values[metric]
+                else:
+                    merged_values[metric] = pick(merged_values[metric], values[metric])
+        query = query or result.get('query')
+    if query is not None and intervals:
+        query = dict(query, since=intervals[0][0], until=intervals[-1][1])
+    return {'rows': len(rows), 'data': rows, 'time_intervals': intervals, 'query': query,
+            'totals': totals, 'min': minimum, 'max': maximum}
+
+MERGE = {'dashboard': _merge_dashboard, 'colos': _merge_colos, 'dns': _merge_dns}
+
+class Cache(object):
+    """ a directory of analytics chunks - one JSON file per chunk; only chunks that can't change are kept"""
+
+    def __init__(self, directory):
+        """ chunked analytics for Cloudflare API"""
+
+        self.directory = directory
+
+    def _path(self, key):
+        """ where a chunk is kept"""
+
+        digest = hashlib.sha256(json.dumps(key, sort_keys=True).encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, digest + '.json')
+
+    def get(self, key):
+        """ a chunk (or None)"""
+
+        try:
+            with open(self._path(key), 'r') as f:
+                return json.load(f)
+        except (IOError, OSError, ValueError):
+            return None
+
+    def put(self, key, result):
+        """ keep a chunk"""
+
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+        path = self._path(key)
+        # via a rename so a chunk is never left half written
+        tmp = '%s.%d.tmp' % (path, os.getpid())
+        with open(tmp, 'w') as f:
+            json.dump(result, f)
+        os.rename(tmp, path)
+
+class Report(object):
+    """ what fetch() got - result is the merged result (shaped like the API's own), chunks the number of
+    chunks, api_calls those fetched and cached those from the cache
+    """
+
+    def __init__(self):
+        """ chunked analytics for Cloudflare API"""
+
+        self.result = None
+        self.chunks = 0
+        self.api_calls = 0
+        self.cached = 0
+
+    def summary(self):
+        """ the results as a dict"""
+
+        return {
+            'chunks': self.chunks,
+            'api_calls': self.api_calls,
+            'cached': self.cached,
+        }
+
+def fetch(cf, endpoint, zone_id, since, until=None, params=None, chunk=DEFAULT_CHUNK, cache=None,
+          rate=DEFAULT_RATE, workers=DEFAULT_WORKERS):
+    """ analytics for a long time range - returns a Report
+
+    endpoint is 'dashboard' (zones/analytics/dashboard), 'colos' (zones/analytics/colos) or 'dns'
+    (zones/dns_analytics/report/bytime); params are passed on (i.e. metrics and dimensions for dns).
+    since to until (unix times or datetimes; until defaults to now) is split into chunks (see chunks())
+    that are fetched workers at a time, no faster than rate a second, and merged in time order.
+    The API picks the size of the time buckets from the length of each chunk.
+
+    With cache (a directory) chunks that ended more than SETTLE seconds ago are kept; so fetching
+    the same report again only calls the API for the newest chunk. Totals are the sum of each
+    chunk's totals - so unique visitors can be counted more than once.
+    """
+
+    if endpoint not in ENDPOINTS:
+        raise CloudFlareAPIError(0, '%s: unknown analytics endpoint' % (endpoint))
+    if until is None:
+        until = time.time()
+    if cache is not None and not isinstance(cache, Cache):
+        cache = Cache(cache)
+    settled = time.time() - SETTLE
+    rate_limit = RateLimit(rate)
+    report = Report()
+
+    def key(w):
+        """ what a chunk is cached under"""
+        return [endpoint, zone_id, params or {}, w[0], w[1]]
+
+    def get(w):
+        """ one chunk - returns (result, fetched)"""
+        if cache is not None and w[1] <= settled:
+            result = cache.get(key(w))
+            if result is not None:
+                return result, False
+        rate_limit.wait()
+        return _get(cf, endpoint, zone_id, w[0], w[1], params), True
+
+    todo = chunks(since, until, chunk)
+    results = []
+    for w, (result, fetched) in zip(todo, imap(get, todo, workers)):
+        report.chunks += 1
+        if fetched:
+            report.api_calls += 1
+            if cache is not None and w[1] <= settled:
+                cache.put(key(w), result)
+        else:
+            report.cached += 1
+        results.append(result)
+    report.result = MERGE[endpoint](results)
+    return report
@@ -2,16 +2,20 @@
 from __future__ import absolute_import
 
 import json
-import requests
+import threading
+import time
 
-from .logging_helper import CFlogger
 from .utils import user_agent, sanitize_secrets
 from .read_configs import read_configs
 from .api_v4 import api_v4
 from .api_extras import api_extras
+from .resolve import Resolver
+from .uploads import MultipartStream, is_stream
 from .exceptions import CloudFlareError, CloudFlareAPIError, CloudFlareInternalError
 
 BASE_URL = 'https://api.cloudflare.com/client/v4'
+# streamed responses are read this much at a time
+STREAM_CHUNK = 64 * 1024
 
 class CloudFlare(object):
     """ Cloudflare v4 API"""
@@ -19,7 +23,7 @@ class CloudFlare(object):
     class _v4base(object):
         """ Cloudflare v4 API"""
 
-        def __init__(self, email, token, certtoken, bearer, base_url, debug, raw, use_sessions):
+        def __init__(self, email, token, certtoken, bearer, base_url, debug, raw, use_sessions, timings=None):
             """ Cloudflare v4 API"""
 
             self.email = email
@@ -30,16 +34,33 @@ class CloudFlare(object):
             self.raw = raw
             self.use_sessions = use_sessions
             self.session = None
-            self.user_agent = user_agent()
+            self._session_lock = threading.Lock()
+            self._user_agent = None
+            self.timings = timings
 
             if debug:
+                # logging is only imported when it's needed
+                from .logging_helper import CFlogger
                 self.logger = CFlogger(debug).getLogger()
             else:
                 self.logger = None
 
+        @property
+        def user_agent(self):
+            """ Cloudflare v4 API"""
+
+            # built on first use as it needs the requests package version
+            if self._user_agent is None:
+                start = time.time()
+                self._user_agent = user_agent()
+                if self.timings:
+                    # this is where the requests package is first imported
+                    self.timings.since('import', start)
+            return self._user_agent
+
         def call_with_no_auth(self, method, parts,
                               identifier1=None, identifier2=None, identifier3=None,
-                              params=None, data=None, files=None):
+                              params=None, data=None, files=None, raw=None):
             """ Cloudflare v4 API"""
 
             headers = {
@@ -48,11 +69,11 @@ class CloudFlare(object):
             }
             return self._call(method, headers, parts,
                               identifier1, identifier2, identifier3,
-                              params, data, files)
+                              params, data, files, raw)
 
         def call_with_auth(self, method, parts,
                            identifier1=None, identifier2=None, identifier3=None,
-                           params=None, data=None, files=None):
+                           params=None, data=None, files=None, raw=None):
             """ Cloudflare v4 API"""
 
             if self.email is '' or self.token is '':
@@ -63,7 +84,7 @@ class CloudFlare(object):
                 'X-Auth-Key': self.token,
                 'Content-Type': 'application/json'
             }
-            if type(data) == str:
+            if isinstance(data, (str, bytes)) or is_stream(data):
                 # passing javascript vs JSON
                 headers['Content-Type'] = 'application/javascript'
             if files:
@@ -73,11 +94,11 @@ class CloudFlare(object):
                 del headers['Content-Type']
             return self._call(method, headers, parts,
                               identifier1, identifier2, identifier3,
-                              params, data, files)
+                              params, data, files, raw)
 
         def call_with_auth_unwrapped(self, method, parts,
                                      identifier1=None, identifier2=None, identifier3=None,
-                                     params=None, data=None, files=None):
+                                     params=None, data=None, files=None, stream=False):
             """ Cloudflare v4 API"""
 
             if self.email is '' or self.token is '':
@@ -88,7 +109,7 @@ class CloudFlare(object):
                 'X-Auth-Key': self.token,
                 'Content-Type': 'application/json'
             }
-            if type(data) == str:
+            if isinstance(data, (str, bytes)) or is_stream(data):
                 # passing javascript vs JSON
                 headers['Content-Type'] = 'application/javascript'
             if files:
@@ -98,11 +119,11 @@ class CloudFlare(object):
                 del headers['Content-Type']
             return self._call_unwrapped(method, headers, parts,
                                         identifier1, identifier2, identifier3,
-                                        params, data, files)
+                                        params, data, files, stream)
 
         def call_with_certauth(self, method, parts,
                                identifier1=None, identifier2=None, identifier3=None,
-                               params=None, data=None, files=None):
+                               params=None, data=None, files=None, raw=None):
             """ Cloudflare v4 API"""
 
             if self.certtoken is '' or self.certtoken is None:
@@ -114,11 +135,11 @@ class CloudFlare(object):
             }
             return self._call(method, headers, parts,
                               identifier1, identifier2, identifier3,
-                              params, data, files)
+                              params, data, files, raw)
         
         def call_with_bearer_auth(self, method, parts,
                                identifier1=None, identifier2=None, identifier3=None,
-                               params=None, data=None, files=None):
+                               params=None, data=None, files=None, raw=None):
             """ Cloudflare v4 API"""
 
             if self.bearer is '' or self.bearer is None:
@@ -130,13 +151,16 @@ class CloudFlare(object):
             }
             return self._call(method, headers, parts,
                               identifier1, identifier2, identifier3,
-                              params, data, files)
+                              params, data, files, raw)
 
         def _network(self, method, headers, parts,
                      identifier1=None, identifier2=None, identifier3=None,
-                     params=None, data=None, files=None):
+                     params=None, data=None, files=None, stream=False):
             """ Cloudflare v4 API"""
 
+            # requests is slow to import; so it's only imported once a call is made
+            import requests
+
             if self.logger:
                 self.logger.debug('Call: %s,%s,%s,%s,%s,%s',
                                   str(parts[0]),
@@ -193,65 +217,91 @@ class CloudFlare(object):
 
             if self.use_sessions:
                 if self.session is None:
-                    self.session = requests.Session()
+                    # one session (and its connection pool) is shared by all threads
+                    with self._session_lock:
+                        if self.session is None:
+                            self.session = requests.Session()
             else:
                 self.session = requests
 
+            if files:
+                # stream the multipart body from the files; rather than building it in memory
+                data = MultipartStream(files, data if isinstance(data, dict) else None)
+                headers['Content-Type'] = data.content_type
+                files = None
+            # strings and files (or iterators) are sent as-is; anything else is sent as JSON
+            send_raw = isinstance(data, (str, bytes)) or is_stream(data)
+
+            # with timings the body is read after the headers arrive; so it's timed on its own
+            read_later = stream or bool(self.timings)
+            if self.timings:
+                connections = self._connections(url)
             try:
                 if method == 'GET':
                     response = self.session.get(url,
                                                 headers=headers,
                                                 params=params,
-                                                data=data)
+                                                data=data,
+                                                stream=read_later)
                 elif method == 'POST':
-                    if type(data) == str:
+                    if send_raw:
                         response = self.session.post(url,
                                                      headers=headers,
                                                      params=params,
                                                      data=data,
-                                                     files=files)
+                                                     files=files,
+                                                     stream=read_later)
                     else:
                         response = self.session.post(url,
                                                      headers=headers,
                                                      params=params,
                                                      json=data,
-                                                     files=files)
+                                                     files=files,
+                                                     stream=read_later)
                 elif method == 'PUT':
-                    if type(data) == str:
+                    if send_raw:
                         response = self.session.put(url,
                                                     headers=headers,
                                                     params=params,
-                                                    data=data)
+                                                    data=data,
+                                                    stream=read_later)
                     else:
                         response = self.session.put(url,
                                                     headers=headers,
                                                     params=params,
-                                                    json=data)
+                                                    json=data,
+                                                    stream=read_later)
                 elif method == 'DELETE':
-                    if type(data) == str:
+                    if send_raw:
                         response = self.session.delete(url,
                                                        headers=headers,
                                                        params=params,
-                                                       data=data)
+                                                       data=data,
+                                                       stream=read_later)
                     else:
                         response = self.session.delete(url,
                                                        headers=headers,
                                                        params=params,
-                                                       json=data)
+                                                       json=data,
+                                                       stream=read_later)
                 elif method == 'PATCH':
-                    if type(data) == str:
+                    if send_raw:
                         response = self.session.request('PATCH', url,
                                                         headers=headers,
                                                         params=params,
-                                                        data=data)
+                                                        data=data,
+                                                        stream=read_later)
                     else:
                         response = self.session.request('PATCH', url,
                                                         headers=headers,
                                                         params=params,
-                                                        json=data)
+                                                        json=data,
+                                                        stream=read_later)
                 else:
                     # should never happen
                     raise CloudFlareAPIError(0, 'method not supported')
+                if self.timings:
+                    self._time_network(url, connections, response, stream)
                 if self.logger:
                     self.logger.debug('Call: done!')
             except Exception as e:
@@ -273,6 +323,9 @@ class CloudFlare(object):
                 # API should always response; but if it doesn't; here's the default
                 response_type = 'application/octet-stream'
             response_code = response.status_code
+            if stream:
+                # the body is read by the caller; as it arrives
+                return [response_type, response_code, response]
             response_data = response.content
             if type(response_data) != str:
                 response_data = response_data.decode("utf-8")
@@ -323,11 +376,39 @@ class CloudFlare(object):
 
             return [response_type, response_code, response_data]
 
+        def _connections(self, url):
+            """ Cloudflare v4 API"""
+
+            # how many connections the session has opened (None if it's not known)
+            try:
+                pools = self.session.get_adapter(url).poolmanager.pools
+                return sum(pools[key].num_connections for key in pools.keys())
+            except Exception:
+                return None
+
+        def _time_network(self, url, connections, response, stream):
+            """ Cloudflare v4 API"""
+
+            # elapsed is from sending the request until the headers arrive
+            ttfb = response.elapsed.total_seconds()
+            if connections is not None and self._connections(url) != connections:
+                # a new connection was opened - so this includes the connect and TLS handshake
+                self.timings.add('network connect+ttfb', ttfb)
+            else:
+                self.timings.add('network ttfb', ttfb)
+            if not stream:
+                # the body hasn't been read yet (see read_later) - a streamed body is read by the caller
+                start = time.time()
+                _ = response.content
+                self.timings.since('network body', start)
+
         def _raw(self, method, headers, parts,
                  identifier1=None, identifier2=None, identifier3=None,
                  params=None, data=None, files=None):
             """ Cloudflare v4 API"""
 
+            import requests
+
             [response_type, response_code, response_data] = self._network(method,
                                                                           headers, parts,
                                                                           identifier1,
@@ -341,7 +422,10 @@ class CloudFlare(object):
                 if hasattr(response_data, 'decode'):
                     response_data = response_data.decode('utf-8')
                 try:
+                    start = time.time()
                     response_data = json.loads(response_data)
+                    if self.timings:
+                        self.timings.since('json parse', start)
                 except ValueError:
                     if response_data == '':
                         # This should really be 'null' but it isn't. Even then, it's wrong!
@@ -358,10 +442,13 @@ class CloudFlare(object):
                         # Lets see if it's NDJSON data
                         # NDJSON is a series of JSON elements with newlines between each element
                         try:
-                            r = []
-                            for l in response_data.splitlines():
-                                r.append(json.loads(l))
-                            response_data = r
+                            # parsed as one list - much quicker than a json.loads() per line
+                            lines = [l for l in response_data.splitlines() if l.strip()]
+                            records = json.loads('[' + ','.join(lines) + ']')
+                            if len(records) != len(lines):
+                                # i.e. "1,2" on one line - that's not NDJSON
+                                raise ValueError('not one JSON element per line')
+                            response_data = records
                         except:
                             # While this should not happen; it's always possible
                             if self.logger:
@@ -433,9 +520,12 @@ class CloudFlare(object):
 
         def _call(self, method, headers, parts,
                   identifier1=None, identifier2=None, identifier3=None,
-                  params=None, data=None, files=None):
+                  params=None, data=None, files=None, raw=None):
             """ Cloudflare v4 API"""
 
+            if raw is None:
+                raw = self.raw
+
             response_data = self._raw(method, headers, parts,
                                       identifier1, identifier2, identifier3,
                                       params, data, files)
@@ -489,7 +579,7 @@ class CloudFlare(object):
 
             if self.logger:
                 self.logger.debug('Response: %s', response_data['result'])
-            if self.raw:
+            if raw:
                 result = {}
                 # theres always a result value
                 result['result'] = response_data['result']
@@ -504,9 +594,13 @@ class CloudFlare(object):
 
         def _call_unwrapped(self, method, headers, parts,
                             identifier1=None, identifier2=None, identifier3=None,
-                            params=None, data=None, files=None):
+                            params=None, data=None, files=None, stream=False):
             """ Cloudflare v4 API"""
 
+            if stream:
+                return self._stream_lines(method, headers, parts,
+                                          identifier1, identifier2, identifier3,
+                                          params, data)
             response_data = self._raw(method, headers, parts,
                                       identifier1, identifier2, identifier3,
                                       params, data, files)
@@ -515,6 +609,43 @@ class CloudFlare(object):
             result = response_data
             return result
 
+        def _stream_lines(self, method, headers, parts,
+                          identifier1=None, identifier2=None, identifier3=None,
+                          params=None, data=None):
+            """ Cloudflare v4 API"""
+
+            # the response (i.e. NDJSON logs) is yielded a line at a time (as bytes); never all in memory
+            [response_type, response_code, response] = self._network(method, headers, parts,
+                                                                      identifier1, identifier2, identifier3,
+                                                                      params, data, stream=True)
+            if response_code >= 500 and response_code <= 599:
+                # the libary doesn't deal with these errors, just pass upwards!
+                response.close()
+                response.raise_for_status()
+            if response_code != 200:
+                response_data = response.content
+                response.close()
+                if hasattr(response_data, 'decode'):
+                    response_data = response_data.decode('utf-8')
+                try:
+                    errors = json.loads(response_data)['errors'][0]
+                    code, message = errors['code'], errors.get('message', errors.get('error', ''))
+                except (ValueError, KeyError, IndexError, TypeError):
+                    code, message = response_code, response_data.strip()
+                if self.logger:
+                    self.logger.debug('Response: error %d %s', code, message)
+                raise CloudFlareAPIError(code, message)
+
+            def lines():
+                """ Cloudflare v4 API"""
+                try:
+                    for line in response.iter_lines(chunk_size=STREAM_CHUNK):
+                        if line:
+                            yield line
+                finally:
+                    response.close()
+            return lines()
+
     class _add_unused(object):
         """ Cloudflare v4 API"""
 
@@ -587,6 +718,14 @@ class CloudFlare(object):
                                                 identifier1, identifier2, identifier3,
                                                 params, data)
 
+        def _get_raw(self, identifier1=None, identifier2=None, identifier3=None, params=None, data=None):
+            """ Cloudflare v4 API"""
+
+            # a get() that always includes result_info - used for paging
+            return self._base.call_with_no_auth('GET', self._parts,
+                                                identifier1, identifier2, identifier3,
+                                                params, data, raw=True)
+
         def patch(self, identifier1=None, identifier2=None, identifier3=None, params=None, data=None):
             """ Cloudflare v4 API"""
 
@@ -634,6 +773,14 @@ class CloudFlare(object):
                                              identifier1, identifier2, identifier3,
                                              params, data)
 
+        def _get_raw(self, identifier1=None, identifier2=None, identifier3=None, params=None, data=None):
+            """ Cloudflare v4 API"""
+
+            # a get() that always includes result_info - used for paging
+            return self._base.call_with_auth('GET', self._parts,
+                                             identifier1, identifier2, identifier3,
+                                             params, data, raw=True)
+
         def patch(self, identifier1=None, identifier2=None, identifier3=None, params=None, data=None):
             """ Cloudflare v4 API"""
 
@@ -689,6 +836,14 @@ class CloudFlare(object):
                                                        identifier1, identifier2, identifier3,
                                                        params, data)
 
+        def _get_stream(self, identifier1=None, identifier2=None, identifier3=None, params=None):
+            """ Cloudflare v4 API"""
+
+            # a get() that yields the response a line at a time (as bytes) - used for logs
+            return self._base.call_with_auth_unwrapped('GET', self._parts,
+                                                       identifier1, identifier2, identifier3,
+                                                       params, stream=True)
+
         def patch(self, identifier1=None, identifier2=None, identifier3=None, params=None, data=None):
             """ Cloudflare v4 API"""
 
@@ -744,6 +899,14 @@ class CloudFlare(object):
                                                  identifier1, identifier2, identifier3,
                                                  params, data)
 
+        def _get_raw(self, identifier1=None, identifier2=None, identifier3=None, params=None, data=None):
+            """ Cloudflare v4 API"""
+
+            # a get() that always includes result_info - used for paging
+            return self._base.call_with_certauth('GET', self._parts,
+                                                 identifier1, identifier2, identifier3,
+                                                 params, data, raw=True)
+
         def patch(self, identifier1=None, identifier2=None, identifier3=None, params=None, data=None):
             """ Cloudflare v4 API"""
 
@@ -800,6 +963,14 @@ class CloudFlare(object):
                                                  identifier1, identifier2, identifier3,
                                                  params, data)
 
+        def _get_raw(self, identifier1=None, identifier2=None, identifier3=None, params=None, data=None):
+            """ Cloudflare v4 API"""
+
+            # a get() that always includes result_info - used for paging
+            return self._base.call_with_bearer_auth('GET', self._parts,
+                                                    identifier1, identifier2, identifier3,
+                                                    params, data, raw=True)
+
         def patch(self, identifier1=None, identifier2=None, identifier3=None, params=None, data=None):
             """ Cloudflare v4 API"""
 
@@ -869,6 +1040,7 @@ class CloudFlare(object):
     def api_list(self, m=None, s=''):
         """recursive walk of the api tree returning a list of api calls"""
         if m is None:
+            self._load_api()
             m = self
         w = []
         for n in sorted(dir(m)):
@@ -889,13 +1061,17 @@ class CloudFlare(object):
                 w = w + self.api_list(a, s + '/' + n)
         return w
 
-    def __init__(self, email=None, token=None, certtoken=None, bearer=None, debug=False, raw=False, use_sessions=True):
+    def __init__(self, email=None, token=None, certtoken=None, bearer=None, debug=False, raw=False, use_sessions=True,
+                 profile=None, timings=None):
         """ Cloudflare v4 API"""
 
         base_url = BASE_URL
 
         # class creation values override configuration values
-        [conf_email, conf_token, conf_certtoken, conf_bearer, extras] = read_configs()
+        start = time.time()
+        [conf_email, conf_token, conf_certtoken, conf_bearer, extras] = read_configs(profile)
+        if timings:
+            timings.since('config', start)
 
         if email is None:
             email = conf_email
@@ -906,12 +1082,56 @@ class CloudFlare(object):
         if bearer is None:
             bearer = conf_bearer
 
-        self._base = self._v4base(email, token, certtoken, bearer, base_url, debug, raw, use_sessions)
+        self._base = self._v4base(email, token, certtoken, bearer, base_url, debug, raw, use_sessions, timings)
+
+        # the API calls are added on first use - see __getattr__()
+        self._extras = extras
+        self._api_loaded = False
+        self._api_loading = False
+        self._api_lock = threading.RLock()
+
+        # name to identifier lookups - i.e. cf.resolve.zone('example.com')
+        self.resolve = Resolver(self)
+
+    def resolve_many(self, kind, names, zone_id=None):
+        """ Cloudflare v4 API"""
+
+        # i.e. cf.resolve_many('dns_records', names, zone_id) - see Resolver.many()
+        return self.resolve.many(kind, names, zone_id)
+
+    def _load_api(self):
+        """ Cloudflare v4 API"""
+
+        with self._api_lock:
+            if self._api_loaded or self._api_loading:
+                # already built - or being built by this thread, in which case lookups fail normally
+                return
+            self._api_loading = True
+            try:
+                # the API calls are added to a copy; so a failed build never leaves part of a tree
+                start = time.time()
+                tree = object.__new__(self.__class__)
+                tree.__dict__.update(self.__dict__)
+                api_v4(tree)
+                if self._extras:
+                    api_extras(tree, self._extras)
+                for name, value in tree.__dict__.items():
+                    if name not in self.__dict__:
+                        setattr(self, name, value)
+                if self._base.timings:
+                    self._base.timings.since('api tree', start)
+                self._api_loaded = True
+            finally:
+                self._api_loading = False
+
+    def __getattr__(self, name):
+        """ Cloudflare v4 API"""
 
-        # add the API calls
-        api_v4(self)
-        if extras:
-            api_extras(self, extras)
+        # only called when an attribute isn't found; so the api tree may not be built yet
+        if name[0] == '_' or self._api_loaded:
+            raise AttributeError(name)
+        self._load_api()
+        return object.__getattribute__(self, name)
 
     def __call__(self):
         """ Cloudflare v4 API"""
@@ -0,0 +1,234 @@
+""" dynamic DNS updates for Cloudflare API"""
+from __future__ import absolute_import
+
+import json
+import os
+import threading
+import time
+
+from .exceptions import CloudFlareError, CloudFlareAPIError
+from .paging import all_pages
+from .parallel import imap_unordered, DEFAULT_WORKERS
+
+# how long (in seconds) the last-known state of a record is trusted before it's read again
+DEFAULT_MAX_AGE = 3600
+# a zone with this many records to find (or more) is listed; fewer are looked up by name
+LIST_RECORDS = 3
+# the largest page size allowed when listing dns records
+PER_PAGE = 5000
+
+def address_type(ip_address):
+    """ A or AAAA"""
+
+    if ':' in ip_address:
+        return 'AAAA'
+    return 'A'
+
+class Updater(object):
+    """ keep the A/AAAA records for many hostnames (in many zones) pointing at their addresses
+
+    The zone and record identifiers (and the address last written) are remembered in memory and,
+    if a state file is given, on disk. An update() only calls the API for hostnames whose address
+    has changed (or whose state is older than max_age); the rest cost nothing.
+    """
+
+    def __init__(self, cf, state=None, max_age=DEFAULT_MAX_AGE, workers=DEFAULT_WORKERS):
+        """ dynamic DNS updates for Cloudflare API"""
+
+        self._cf = cf
+        self._state_file = state
+        self.max_age = max_age
+        self.workers = workers
+        # dns name -> zone name (None means work it out)
+        self._hosts = {}
+        # (dns name, type) -> {'zone_id', 'ids', 'content', 'checked'} - there can be more than one record
+        self._state = {}
+        # number of API calls made to read and write records (zone lookups are counted by cf.resolve)
+        self.api_calls = 0
+        self._lock = threading.Lock()
+        if state:
+            self._load()
+
+    def _load(self):
+        """ the last-known state from disk; a missing or broken file is simply ignored"""
+
+        try:
+            with open(self._state_file, 'r') as f:
+                records = json.load(f)
+        except (IOError, OSError, ValueError):
+            return
+        for r in records:
+            try:
+                state = dict((k, r[k]) for k in ('zone_id', 'ids', 'content', 'checked'))
+                self._state[(r['name'], r['type'])] = state
+            except (KeyError, TypeError):
+                # not what we wrote; so it's read again from the API
+                continue
+
+    def _save(self):
+        """ write the state to disk - via a rename so it's never left half written"""
+
+        if not self._state_file:
+            return
+        records = [dict(state, name=name, type=record_type)
+                   for (name, record_type), state in sorted(self._state.items())]
+        tmp = self._state_file + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(records, f, indent=1, sort_keys=True)
+        os.rename(tmp, self._state_file)
+
+    def _api_call(self, n=1):
+        """ count API calls - they're made from many threads"""
+
+        with self._lock:
+            self.api_calls += n
+
+    def _results(self, r):
+        """ the results; even if the class was created with raw=True"""
+
+        if self._cf._base.raw:
+            return r['result']
+        return r
+
+    def add(self, dns_name, zone_name=None):
+        """ a hostname to keep up to date - the zone is worked out from the name if not given"""
+
+        self._hosts[dns_name.lower().rstrip('.')] = zone_name
+
+    def _zone_id(self, dns_name):
+        """ the zone a hostname is in - the shortest suffix that is a zone (cf.resolve remembers these)"""
+
+        zone_name = self._hosts.get(dns_name)
+        if zone_name:
+            return self._cf.resolve.zone(zone_name)
+        labels = dns_name.split('.')
+        for i in range(len(labels) - 2, -1, -1):
+            zone_id = self._cf.resolve.zone('.'.join(labels[i:]))
+            if zone_id:
+                return zone_id
+        return None
+
+    def _find(self, zone_id, wanted):
+        """ the current records for (dns name, type) pairs in one zone - {(dns name, type): [record, ...]}"""
+
+        found = {}
+        if len(wanted) >= LIST_RECORDS:
+            # one call per page (per type) finds them all
+            for record_type in sorted(set(record_type for _, record_type in wanted)):
+                records = list(all_pages(self._cf.zones.dns_records, zone_id,
+                                         params={'type': record_type}, per_page=PER_PAGE))
+                self._api_call(max((len(records) + PER_PAGE - 1) // PER_PAGE, 1))
+                for r in records:
+                    key = (r['name'], r['type'])
+                    if key in wanted:
+                        found.setdefault(key, []).append(r)
+            return found
+
+        def lookup(key):
+            """ one record by name and type"""
+            self._api_call()
+            return self._results(self._cf.zones.dns_records.get(zone_id, params={'name': key[0], 'type': key[1]}))
+
+        for key, records, error in imap_unordered(lookup, sorted(wanted), self.workers):
+            if error is not None:
+                raise error
+            if records:
+                found[key] = records
+        return found
+
+    def update(self, addresses):
+        """ make each hostname point at its address - returns a list of (dns name, type, action, old, new)
+
+        addresses is {dns name: ip address} or one ip address for every hostname added.
+        action is 'unchanged', 'updated', 'created' or 'failed' (and then new is the exception).
+        Every record of a hostname (of that type) is updated; there can be more than one.
+        """
+
+        if not isinstance(addresses, dict):
+            addresses = dict((dns_name, addresses) for dns_name in self._hosts)
+
+        now = time.time()
+        results = []
+        # the hostnames whose records have to be read before they can be written (or trusted)
+        unknown = {}
+        changes = []
+        for dns_name, ip_address in sorted(addresses.items()):
+            dns_name = dns_name.lower().rstrip('.')
+            self._hosts.setdefault(dns_name, None)
+            key = (dns_name, address_type(ip_address))
+            state = self._state.get(key)
+            if state is None or state['checked'] + self.max_age < now:
+                try:
+                    zone_id = state['zone_id'] if state else self._zone_id(dns_name)
+                except CloudFlareError as e:
+                    results.append((dns_name, key[1], 'failed', None, e))
+                    continue
+                if zone_id is None:
+                    results.append((dns_name, key[1], 'failed', None,
+                                    CloudFlareAPIError(0, '%s: zone not found' % (dns_name))))
+                    continue
+                unknown.setdefault(zone_id, {})[key] = ip_address
+            elif state['content'] == ip_address:
+                results.append((dns_name, key[1], 'unchanged', ip_address, ip_address))
+            else:
+                changes.append((key, ip_address, state, state['ids']))
+
+        for zone_id, wanted in sorted(unknown.items()):
+            try:
+                found = self._find(zone_id, wanted)
+            except CloudFlareError as e:
+                for (dns_name, record_type) in sorted(wanted):
+                    results.append((dns_name, record_type, 'failed', None, e))
+                continue
+            for key, ip_address in sorted(wanted.items()):
+                records = found.get(key) or []
+                # only the records that don't have the address are written
+                stale = [r for r in records if r['content'] != ip_address]
+                state = {'zone_id': zone_id, 'ids': [r['id'] for r in records], 'content': None, 'checked': now}
+                if records and not stale:
+                    state['content'] = ip_address
+                    self._state[key] = state
+                    results.append((key[0], key[1], 'unchanged', ip_address, ip_address))
+                    continue
+                if stale:
+                    state['content'] = stale[0]['content']
+                changes.append((key, ip_address, state, [r['id'] for r in stale]))
+
+        def write(item):
+            """ one record - only the content is changed; so ttl, proxied etc stay as they are"""
+            (dns_name, record_type), ip_address, state, record_id = item
+            self._api_call()
+            dns_records = self._cf.zones.dns_records
+            if record_id is None:
+                data = {'name': dns_name, 'type': record_type, 'content': ip_address}
+                return self._results(dns_records.post(state['zone_id'], data=data))
+            return self._results(dns_records.patch(state['zone_id'], record_id, data={'content': ip_address}))
+
+        # one write per record (or a create if there's none)
+        writes = []
+        for key, ip_address, state, record_ids in changes:
+            writes.extend((key, ip_address, state, record_id) for record_id in record_ids or [None])
+        written = {}
+        errors = {}
+        for (key, _, _, _), r, error in imap_unordered(write, writes, self.workers):
+            if error is not None:
+                if not isinstance(error, CloudFlareError):
+                    raise error
+                errors.setdefault(key, error)
+                continue
+            written.setdefault(key, []).append(r['id'])
+
+        for key, ip_address, state, _ in changes:
+            if key in errors:
+                # the records may have gone (or changed); so read them again next time
+                self._state.pop(key, None)
+                results.append((key[0], key[1], 'failed', state['content'], errors[key]))
+                continue
+            action = 'updated' if state['ids'] else 'created'
+            results.append((key[0], key[1], action, state['content'], ip_address))
+            self._state[key] = {'zone_id': state['zone_id'], 'ids': state['ids'] or written[key],
+                                'content': ip_address, 'checked': now}
+
+        if unknown or changes:
+            self._save()
+        return results
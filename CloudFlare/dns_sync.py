@@ -0,0 +1,455 @@
+""" declarative DNS zone sync for Cloudflare API"""
+from __future__ import absolute_import
+
+import json
+import shlex
+import socket
+
+from .exceptions import CloudFlareError
+from .paging import all_pages
+from .parallel import imap_unordered, DEFAULT_WORKERS
+from .uploads import IterStream
+
+# the largest page size allowed when listing dns records
+PER_PAGE = 5000
+# record types where the content is a host name (so case and a trailing dot don't matter)
+HOST_TYPES = ['CNAME', 'MX', 'NS', 'PTR', 'SRV']
+# attributes that can be changed without changing the record's value
+ATTRIBUTES = ['ttl', 'proxied']
+# TTL of 1 is automatic
+DEFAULT_TTL = 1
+# this many creates (or more) are sent as zone file uploads to dns_records/import rather than one POST each
+IMPORT_THRESHOLD = 100
+# the most records sent in one upload
+IMPORT_BATCH = 10000
+# the longest string within a TXT record
+TXT_STRING = 255
+
+def _fqdn(name, zone_name):
+    """ names can be relative to the zone, @ for the zone itself, or end with a dot"""
+
+    name = name.strip().lower()
+    zone_name = zone_name.lower()
+    if name in ('', '@'):
+        return zone_name
+    if name[-1] == '.':
+        return name[:-1]
+    if name == zone_name or name.endswith('.' + zone_name):
+        return name
+    return name + '.' + zone_name
+
+def _content(record_type, content):
+    """ content in the form the API returns it"""
+
+    content = content.strip()
+    if record_type == 'TXT':
+        if len(content) >= 2 and content[0] == '"' and content[-1] == '"':
+            # "one" "two" in a zone file is one string
+            content = ''.join(shlex.split(content))
+    elif record_type in HOST_TYPES:
+        # the host name is always absolute; case and the trailing dot don't matter
+        words = content.split()
+        if words and words[-1] != '.':
+            words[-1] = words[-1].lower().rstrip('.')
+        content = ' '.join(words)
+    elif record_type == 'AAAA':
+        try:
+            content = socket.inet_ntop(socket.AF_INET6, socket.inet_pton(socket.AF_INET6, content))
+        except (socket.error, ValueError, AttributeError):
+            pass
+    return content
+
+def normalize(record, zone_name):
+    """ a record (desired or from the API) in one form - so they can be compared"""
+
+    record_type = record['type'].upper()
+    r = {
+        'type': record_type,
+        'name': _fqdn(record['name'], zone_name),
+        'content': _content(record_type, str(record['content'])),
+    }
+    if record.get('priority') is not None:
+        r['priority'] = int(record['priority'])
+    for attribute in ATTRIBUTES:
+        if record.get(attribute) is not None:
+            r[attribute] = record[attribute]
+    return r
+
+def parse_bind(lines, zone_name):
+    """ records from a BIND zone file - $ORIGIN, $TTL, relative names, comments and ( ) are handled
+
+    SOA records are skipped; Cloudflare manages those. A record with no data raises ValueError.
+    """
+
+    records = []
+    origin = zone_name
+    ttl = None
+    name = None
+    pending = ''
+    depth = 0
+    for line_number, line in enumerate(lines, 1):
+        if not isinstance(line, str):
+            line = line.decode('utf-8')
+        if pending == '':
+            # where the record starts (for errors) and if it has a name
+            first_line = line_number
+            starts_with_space = line[0:1] in (' ', '\t')
+        # remove comments and the ( ) that join a record over many lines (but not within quotes)
+        quoted = False
+        kept = []
+        for i, c in enumerate(line):
+            if c == '"' and (i == 0 or line[i - 1] != '\\'):
+                quoted = not quoted
+            elif not quoted and c == ';':
+                break
+            elif not quoted and c in '()':
+                depth += 1 if c == '(' else -1
+                c = ' '
+            kept.append(c)
+        pending += ''.join(kept).rstrip('\r\n') + ' '
+        if depth > 0:
+            continue
+        line = pending
+        pending = ''
+        depth = 0
+        words = line.split()
+        if len(words) == 0:
+            continue
+
+        if words[0].upper() == '$ORIGIN':
+            origin = _fqdn(words[1], zone_name)
+            continue
+        if words[0].upper() == '$TTL':
+            ttl = int(words[1])
+            continue
+        if words[0][0] == '$':
+            continue
+
+        n_words = len(words)
+        if not starts_with_space:
+            name = _fqdn(words.pop(0), origin)
+        record_ttl = ttl
+        # the ttl and class can be in either order
+        while words and (words[0].isdigit() or words[0].upper() in ('IN', 'CH', 'HS')):
+            word = words.pop(0)
+            if word.isdigit():
+                record_ttl = int(word)
+        if len(words) == 0 or name is None:
+            continue
+
+        record_type = words[0].upper()
+        if record_type == 'SOA':
+            continue
+        record = {'type': record_type, 'name': name}
+        values = words[1:]
+        if record_type in ('MX', 'SRV') and values and values[0].isdigit():
+            record['priority'] = int(values.pop(0))
+        elif record_type in ('MX', 'SRV'):
+            raise ValueError('line %d: %s record with no priority' % (first_line, record_type))
+        if len(values) == 0:
+            raise ValueError('line %d: %s record with no data' % (first_line, record_type))
+        if record_type in HOST_TYPES and values[-1] != '.':
+            values[-1] = _fqdn(values[-1], origin)
+        if record_type == 'TXT':
+            # keep the spacing within the quoted strings
+            consumed = n_words - len(words) + 1
+            values = [line.split(None, consumed)[-1].strip()]
+        record['content'] = ' '.join(values)
+        if record_ttl is not None:
+            record['ttl'] = record_ttl
+        records.append(record)
+    return records
+
+def load_records(filename, zone_name):
+    """ desired records from a file - YAML (.yaml/.yml), JSON (.json) or a BIND zone file"""
+
+    with open(filename, 'r') as f:
+        if filename.endswith('.yaml') or filename.endswith('.yml'):
+            # yaml is slow to import; so it's only imported when it's used
+            import yaml
+            return yaml.safe_load(f) or []
+        if filename.endswith('.json'):
+            return json.load(f)
+        return parse_bind(f, zone_name)
+
+class Plan(object):
+    """ the changes needed to make a zone match the desired records
+
+    creates is a list of records, updates a list of (current record, desired record) and deletes
+    a list of current records. errors is a list of (action, record, exception) once applied.
+    If imports isn't empty the creates are sent as these batches to dns_records/import.
+    """
+
+    def __init__(self, zone_id, zone_name):
+        """ declarative DNS zone sync for Cloudflare API"""
+
+        self.zone_id = zone_id
+        self.zone_name = zone_name
+        self.creates = []
+        self.updates = []
+        self.deletes = []
+        self.imports = []
+        self.unchanged = 0
+        self.desired = 0
+        # API calls used to read the zone (and its records)
+        self.read_calls = 0
+        # records added by dns_records/import - and API calls used to fix what an import missed
+        self.imported = 0
+        self.fix_calls = 0
+        self.applied = False
+        self.errors = []
+
+    @property
+    def api_calls(self):
+        """ API calls used to read the zone and make the changes"""
+
+        creates = len(self.imports) if self.imports else len(self.creates)
+        return self.read_calls + creates + len(self.updates) + len(self.deletes) + self.fix_calls
+
+    @property
+    def saved(self):
+        """ API calls saved compared with looking up each desired record by name and then writing it"""
+
+        naive = self.desired * 2 + len(self.deletes)
+        return max(naive - self.api_calls, 0)
+
+    def summary(self):
+        """ the plan (and its results) as a dict"""
+
+        return {
+            'zone_id': self.zone_id,
+            'zone_name': self.zone_name,
+            'create': len(self.creates),
+            'update': len(self.updates),
+            'delete': len(self.deletes),
+            'unchanged': self.unchanged,
+            'import_uploads': len(self.imports),
+            'imported': self.imported,
+            'api_calls': self.api_calls,
+            'api_calls_saved': self.saved,
+            'applied': self.applied,
+            'errors': len(self.errors),
+        }
+
+def diff(current, desired, zone_name, delete=True):
+    """ compare records from the API with the desired records - returns (creates, updates, deletes, unchanged)
+
+    Records are matched by a hash of their value (type, name, content and priority); so this
+    is linear in the number of records. What's left of the same type and name is paired up as an
+    update (rather than a delete and a create). Anything else is created or deleted. With
+    delete=False nothing is paired up; records that aren't desired are left alone.
+    """
+
+    current_by_value = {}
+    for r in current:
+        n = normalize(r, zone_name)
+        key = (n['type'], n['name'], n['content'], n.get('priority'))
+        current_by_value.setdefault(key, []).append((r, n))
+
+    creates = []
+    updates = []
+    unchanged = 0
+    not_matched = []
+    for d in desired:
+        d = normalize(d, zone_name)
+        matches = current_by_value.get((d['type'], d['name'], d['content'], d.get('priority')))
+        if not matches:
+            not_matched.append(d)
+            continue
+        r, n = matches.pop()
+        if any(attribute in d and d[attribute] != n.get(attribute) for attribute in ATTRIBUTES):
+            updates.append((r, d))
+        else:
+            unchanged += 1
+
+    current_by_name = {}
+    for matches in current_by_value.values():
+        for r, n in matches:
+            current_by_name.setdefault((n['type'], n['name']), []).append(r)
+    for d in not_matched:
+        matches = current_by_name.get((d['type'], d['name'])) if delete else None
+        if matches:
+            updates.append((matches.pop(), d))
+        else:
+            creates.append(d)
+
+    deletes = []
+    if delete:
+        for matches in current_by_name.values():
+            deletes.extend(matches)
+    return creates, updates, deletes, unchanged
+
+def _results(cf, r):
+    """ the results; even if the class was created with raw=True"""
+
+    if cf._base.raw:
+        return r['result']
+    return r
+
+def _body(desired, current=None):
+    """ the data for a POST or PUT - a PUT needs every value; so anything not asked for stays as-is"""
+
+    body = {'type': desired['type'], 'name': desired['name'], 'content': desired['content']}
+    if desired.get('priority') is not None:
+        body['priority'] = desired['priority']
+    for attribute in ATTRIBUTES:
+        if attribute in desired:
+            body[attribute] = desired[attribute]
+        elif current is not None and current.get(attribute) is not None:
+            body[attribute] = current[attribute]
+    body.setdefault('ttl', DEFAULT_TTL)
+    return body
+
+def _bind_line(d):
+    """ a normalized record as a zone file line (as bytes)"""
+
+    content = d['content']
+    if d['type'] == 'TXT':
+        strings = [content[i:i + TXT_STRING] for i in range(0, len(content), TXT_STRING)] or ['']
+        content = ' '.join('"%s"' % (s.replace('\\', '\\\\').replace('"', '\\"')) for s in strings)
+    elif d['type'] in HOST_TYPES and content not in ('', '.'):
+        # host names are absolute
+        content += '.'
+    if d.get('priority') is not None:
+        content = '%d %s' % (d['priority'], content)
+    line = '%s. %d IN %s %s\n' % (d['name'], d.get('ttl', DEFAULT_TTL), d['type'], content)
+    return line.encode('utf-8')
+
+def _import_batches(creates, batch_size=IMPORT_BATCH):
+    """ creates split into uploads - proxied is set for a whole upload; so each value gets its own"""
+
+    by_proxied = {}
+    for d in creates:
+        by_proxied.setdefault(d.get('proxied'), []).append(d)
+    batches = []
+    for proxied in [None, False, True]:
+        records = by_proxied.get(proxied, [])
+        for i in range(0, len(records), batch_size):
+            batches.append(records[i:i + batch_size])
+    return batches
+
+def plan(cf, zone_id, records, zone_name=None, delete=True, workers=DEFAULT_WORKERS,
+         import_threshold=IMPORT_THRESHOLD):
+    """ work out the changes needed to make the zone's DNS records match records - nothing is changed
+
+    With import_threshold (or more) creates they're sent as zone file uploads; None never does that.
+    """
+
+    p = Plan(zone_id, zone_name)
+    if p.zone_name is None:
+        p.zone_name = _results(cf, cf.zones.get(zone_id))['name']
+        p.read_calls += 1
+    current = list(all_pages(cf.zones.dns_records, zone_id, per_page=PER_PAGE, workers=workers))
+    p.read_calls += max((len(current) + PER_PAGE - 1) // PER_PAGE, 1)
+
+    records = list(records)
+    p.desired = len(records)
+    p.creates, p.updates, p.deletes, p.unchanged = diff(current, records, p.zone_name, delete)
+    if import_threshold is not None and len(p.creates) >= import_threshold:
+        p.imports = _import_batches(p.creates)
+    return p
+
+def _import(cf, p, batch):
+    """ one zone file upload - the file is made as it's sent; returns the number of records added"""
+
+    # the length is worked out first; so the upload isn't chunked (and nothing is held in memory)
+    length = sum(len(_bind_line(d)) for d in batch)
+    f = IterStream((_bind_line(d) for d in batch), length)
+    data = None
+    if batch[0].get('proxied') is not None:
+        data = {'proxied': batch[0]['proxied']}
+    r = getattr(cf.zones.dns_records, 'import').post(p.zone_id,
+                                                     files={'file': ('dns_records.txt', f)},
+                                                     data=data)
+    return int(_results(cf, r).get('recs_added', 0))
+
+def _imports(cf, p, workers):
+    """ send the creates as uploads and then check each import summary against what was sent
+
+    Returns the creates still to be done one at a time. An upload that fails is done one
+    record at a time. If an import added fewer records than were sent the zone is listed
+    again and whatever is missing is created; records already there are left alone.
+    """
+
+    creates = []
+    short = []
+    for batch, added, error in imap_unordered(lambda batch: _import(cf, p, batch), p.imports, workers):
+        if error is not None:
+            if not isinstance(error, CloudFlareError):
+                raise error
+            creates.extend(batch)
+            continue
+        p.imported += added
+        if added != len(batch):
+            short.extend(batch)
+    p.fix_calls += len(creates)
+    if not short:
+        return creates
+
+    current = list(all_pages(cf.zones.dns_records, p.zone_id, per_page=PER_PAGE, workers=workers))
+    p.fix_calls += max((len(current) + PER_PAGE - 1) // PER_PAGE, 1)
+    found = set()
+    for r in current:
+        n = normalize(r, p.zone_name)
+        found.add((n['type'], n['name'], n['content'], n.get('priority')))
+    # only what's missing - pairing by name could change a record another desired record matched
+    missing = [d for d in short if (d['type'], d['name'], d['content'], d.get('priority')) not in found]
+    p.fix_calls += len(missing)
+    return creates + missing
+
+def apply(cf, p, workers=DEFAULT_WORKERS):
+    """ make the changes in a plan; workers at a time - failures are added to p.errors
+
+    Deletes are done first and creates last; so a name can change from one type to another
+    (i.e. a CNAME can't be added while the A record is still there).
+    """
+
+    dns_records = cf.zones.dns_records
+
+    def delete(r):
+        """ one delete"""
+        return dns_records.delete(p.zone_id, r['id'])
+
+    def update(item):
+        """ one update"""
+        r, d = item
+        return dns_records.put(p.zone_id, r['id'], data=_body(d, r))
+
+    def create(d):
+        """ one create"""
+        return dns_records.post(p.zone_id, data=_body(d))
+
+    def run(action, func, items):
+        """ workers at a time"""
+        for item, _, error in imap_unordered(func, items, workers):
+            if error is not None:
+                if not isinstance(error, CloudFlareError):
+                    raise error
+                if action == 'update':
+                    # report the record it was being changed to
+                    item = item[1]
+                p.errors.append((action, item, error))
+
+    run('delete', delete, p.deletes)
+    run('update', update, p.updates)
+    if p.imports:
+        run('create', create, _imports(cf, p, workers))
+    else:
+        run('create', create, p.creates)
+    p.applied = True
+    return p
+
+def sync(cf, zone_id, records, zone_name=None, delete=True, dry_run=False, workers=DEFAULT_WORKERS,
+         import_threshold=IMPORT_THRESHOLD):
+    """ make a zone's DNS records match records (a list of dicts with type, name, content and
+    optionally ttl, proxied and priority) - returns the Plan
+
+    With delete=False records that aren't in the list are left alone. With dry_run=True
+    the plan is worked out but nothing is changed. Large numbers of creates are sent as
+    zone file uploads (see plan()).
+    """
+
+    p = plan(cf, zone_id, records, zone_name, delete, workers, import_threshold)
+    if not dry_run:
+        apply(cf, p, workers)
+    return p
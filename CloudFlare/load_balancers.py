@@ -0,0 +1,161 @@
+""" load balancer snapshots for Cloudflare API"""
+from __future__ import absolute_import
+
+from .exceptions import CloudFlareError
+from .paging import all_pages
+from .parallel import imap_unordered, RateLimit, DEFAULT_WORKERS, DEFAULT_RATE
+
+# the largest page size allowed when listing zones
+PER_PAGE = 50
+
+def lb_pools(lb):
+    """ every pool a load balancer can send traffic to - default, fallback, region, pop and country pools"""
+
+    pools = list(lb.get('default_pools') or [])
+    if lb.get('fallback_pool'):
+        pools.append(lb['fallback_pool'])
+    for steering in ['region_pools', 'pop_pools', 'country_pools']:
+        for ids in (lb.get(steering) or {}).values():
+            pools.extend(ids)
+    return sorted(set(pools))
+
+class Snapshot(object):
+    """ the monitors, pools and load balancers of a user, organizations and zones - joined up
+
+    monitors and pools are indexed by id and load_balancers by (zone_id, id). Once taken, which load
+    balancers a pool, origin or monitor affects is answered from memory. errors is a list of
+    (what, exception) for lists that couldn't be read.
+    """
+
+    def __init__(self):
+        """ load balancer snapshots for Cloudflare API"""
+
+        self.monitors = {}
+        self.pools = {}
+        self.load_balancers = {}
+        self.errors = []
+        # the joins - pool id to load balancers, origin (name and address) to pools, monitor id to pools
+        self._pool_lbs = {}
+        self._origin_pools = {}
+        self._monitor_pools = {}
+
+    def _join(self):
+        """ index who uses what"""
+
+        self._pool_lbs = {}
+        self._origin_pools = {}
+        self._monitor_pools = {}
+        for key, lb in self.load_balancers.items():
+            for pool_id in lb_pools(lb):
+                self._pool_lbs.setdefault(pool_id, set()).add(key)
+        for pool_id, pool in self.pools.items():
+            for origin in pool.get('origins') or []:
+                for name in set([origin.get('name'), origin.get('address')]) - set([None]):
+                    self._origin_pools.setdefault(name, set()).add(pool_id)
+            if pool.get('monitor'):
+                self._monitor_pools.setdefault(pool['monitor'], set()).add(pool_id)
+
+    def affected_by_pool(self, pool_id):
+        """ the load balancers (as (zone_id, id)) that use a pool"""
+
+        return sorted(self._pool_lbs.get(pool_id, []))
+
+    def affected_by_origin(self, origin):
+        """ the load balancers (as (zone_id, id)) that use an origin - by its name or address"""
+
+        keys = set()
+        for pool_id in self._origin_pools.get(origin, []):
+            keys.update(self._pool_lbs.get(pool_id, []))
+        return sorted(keys)
+
+    def affected_by_monitor(self, monitor_id):
+        """ the load balancers (as (zone_id, id)) that use a pool checked by a monitor"""
+
+        keys = set()
+        for pool_id in self._monitor_pools.get(monitor_id, []):
+            keys.update(self._pool_lbs.get(pool_id, []))
+        return sorted(keys)
+
+    def pools_of(self, zone_id, lb_id):
+        """ the pools (dicts) of a load balancer - pools that aren't in the snapshot are left out"""
+
+        lb = self.load_balancers[(zone_id, lb_id)]
+        return [self.pools[pool_id] for pool_id in lb_pools(lb) if pool_id in self.pools]
+
+    def unhealthy(self):
+        """ the pools (as ids) that are disabled or say they aren't healthy"""
+
+        return sorted(pool_id for pool_id, pool in self.pools.items()
+                      if not pool.get('enabled', True) or pool.get('healthy') is False)
+
+    def summary(self):
+        """ the results as a dict"""
+
+        return {
+            'monitors': len(self.monitors),
+            'pools': len(self.pools),
+            'load_balancers': len(self.load_balancers),
+            'unhealthy_pools': len(self.unhealthy()),
+            'errors': len(self.errors),
+        }
+
+def snapshot(cf, zones=None, organizations=None, user=True, rate=DEFAULT_RATE, workers=DEFAULT_WORKERS):
+    """ read every monitor, pool and load balancer at once - returns a Snapshot
+
+    Monitors and pools come from the user (unless user=False) and from each organization
+    (a list of organization identifiers); load balancers from each zone. zones is a list of zones
+    (dicts with an id, as from cf.zones.get) or zone identifiers; None is every zone. All the lists
+    are fetched workers at a time and no faster than rate pages a second (None for no limit).
+    """
+
+    s = Snapshot()
+    if zones is None:
+        zones = list(all_pages(cf.zones, per_page=PER_PAGE, workers=workers))
+    rate_limit = RateLimit(rate)
+
+    lists = []
+    if user:
+        lists += [('monitors', None), ('pools', None)]
+    for organization_id in organizations or []:
+        lists += [('monitors', organization_id), ('pools', organization_id)]
+    lists += [('load_balancers', zone['id'] if isinstance(zone, dict) else zone) for zone in zones]
+
+    def fetch(item):
+        """ one list"""
+        kind, identifier = item
+        if kind == 'load_balancers':
+            m = cf.zones.load_balancers
+        elif identifier is None:
+            m = getattr(cf.user.load_balancers, kind)
+        else:
+            m = getattr(cf.organizations.load_balancers, kind)
+        return list(all_pages(_Limited(m, rate_limit), identifier))
+
+    for (kind, identifier), records, error in imap_unordered(fetch, lists, workers):
+        if error is not None:
+            if not isinstance(error, CloudFlareError):
+                raise error
+            s.errors.append(((kind, identifier), error))
+            continue
+        for record in records:
+            if kind == 'load_balancers':
+                s.load_balancers[(identifier, record['id'])] = record
+            else:
+                getattr(s, kind)[record['id']] = record
+    s._join()
+    return s
+
+class _Limited(object):
+    """ an endpoint for all_pages() - each page waits for the rate limit"""
+
+    def __init__(self, endpoint, rate_limit):
+        """ load balancer snapshots for Cloudflare API"""
+
+        self._endpoint = endpoint
+        self._rate_limit = rate_limit
+
+    def _get_raw(self, *args):
+        """ one page"""
+
+        self._rate_limit.wait()
+        return self._endpoint._get_raw(*args)
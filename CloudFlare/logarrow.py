@@ -0,0 +1,157 @@
+""" columnar (Parquet/Arrow) logs for Cloudflare API"""
+from __future__ import absolute_import
+
+import io
+
+from .exceptions import CloudFlareAPIError
+
+# NDJSON is converted this many bytes at a time
+CHUNK_BYTES = 32 * 1024 * 1024
+# the type of each field that isn't a string - logs are pulled with timestamps=unix (see logpull)
+# (RayID and ParentRayID are hex strings)
+INT_FIELDS = [
+    'CacheResponseBytes', 'CacheResponseStatus', 'ClientASN', 'ClientRequestBytes', 'ClientSrcPort',
+    'ClientTCPRTTMs', 'EdgeColoID', 'EdgeEndTimestamp', 'EdgeRateLimitID', 'EdgeResponseBodyBytes',
+    'EdgeResponseBytes', 'EdgeResponseStatus', 'EdgeStartTimestamp', 'EdgeTimeToFirstByteMs',
+    'OriginDNSResponseTimeMs', 'OriginRequestHeaderSendDurationMs', 'OriginResponseBytes',
+    'OriginResponseDurationMs', 'OriginResponseHeaderReceiveDurationMs', 'OriginResponseStatus',
+    'OriginResponseTime', 'OriginTCPHandshakeDurationMs', 'OriginTLSHandshakeDurationMs', 'WorkerCPUTime',
+    'WorkerSubrequestCount', 'WorkerWallTimeUs', 'ZoneID',
+]
+FLOAT_FIELDS = ['EdgeResponseCompressionRatio']
+BOOL_FIELDS = ['CacheTieredFill', 'WorkerSubrequest']
+LIST_FIELDS = ['FirewallMatchesActions', 'FirewallMatchesRuleIDs', 'FirewallMatchesSources']
+# fields whose values are objects (a different shape on every line) - these are left out
+OBJECT_FIELDS = ['Cookies', 'RequestHeaders', 'ResponseHeaders']
+# file formats - arrow is the Arrow IPC stream format (it allows a new dictionary for each batch)
+FORMATS = ['parquet', 'arrow']
+
+def _pyarrow():
+    """ pyarrow is optional (and slow to import); so it's only imported when it's used"""
+
+    try:
+        import pyarrow
+        import pyarrow.json
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        raise CloudFlareAPIError(0, 'pyarrow is needed for columnar logs - pip install pyarrow')
+    return pyarrow
+
+def schema(cf, zone_id, fields=None):
+    """ an Arrow schema from logs/received/fields - fields (a list) picks some of them (in that order)
+
+    Strings are dictionary encoded.
+    """
+
+    pa = _pyarrow()
+    available = cf.zones.logs.received.fields.get(zone_id)
+    if cf._base.raw:
+        available = available['result']
+    if fields is None:
+        fields = sorted(available)
+    else:
+        unknown = [field for field in fields if field not in available]
+        if unknown:
+            raise CloudFlareAPIError(0, '%s: unknown log fields' % (','.join(unknown)))
+    types = []
+    for field in fields:
+        if field in OBJECT_FIELDS:
+            continue
+        if field in INT_FIELDS:
+            field_type = pa.int64()
+        elif field in FLOAT_FIELDS:
+            field_type = pa.float64()
+        elif field in BOOL_FIELDS:
+            field_type = pa.bool_()
+        elif field in LIST_FIELDS:
+            field_type = pa.list_(pa.string())
+        else:
+            field_type = pa.dictionary(pa.int32(), pa.string())
+        types.append(pa.field(field, field_type))
+    return pa.schema(types)
+
+def _parse_schema(pa, target):
+    """ the schema the NDJSON is parsed with - strings are dictionary encoded afterwards"""
+
+    return pa.schema([pa.field(f.name, f.type.value_type if pa.types.is_dictionary(f.type) else f.type)
+                      for f in target])
+
+class Writer(object):
+    """ NDJSON log lines to a Parquet (or Arrow IPC stream) file - lines are never parsed into Python values
+
+    The lines are buffered up to chunk_bytes and each chunk is parsed by Arrow's own JSON reader
+    straight into columns; each chunk becomes a record batch (a row group in Parquet).
+    """
+
+    def __init__(self, filename, target, file_format='parquet', compression='zstd', chunk_bytes=CHUNK_BYTES):
+        """ columnar (Parquet/Arrow) logs for Cloudflare API"""
+
+        if file_format not in FORMATS:
+            raise CloudFlareAPIError(0, '%s: unknown format' % (file_format))
+        pa = _pyarrow()
+        self._pa = pa
+        self.schema = target
+        self._parse_options = pa.json.ParseOptions(explicit_schema=_parse_schema(pa, target),
+                                                   unexpected_field_behavior='ignore')
+        self._chunk_bytes = chunk_bytes
+        self._buffer = []
+        self._size = 0
+        self.rows = 0
+        if file_format == 'parquet':
+            self._writer = pa.parquet.ParquetWriter(filename, target, compression=compression)
+        else:
+            options = pa.ipc.IpcWriteOptions(compression=compression)
+            self._writer = pa.ipc.new_stream(filename, target, options=options)
+
+    def write(self, lines):
+        """ add log lines (bytes)"""
+
+        for line in lines:
+            self._buffer.append(line)
+            self._size += len(line) + 1
+            if self._size >= self._chunk_bytes:
+                self._flush()
+
+    def _flush(self):
+        """ parse and write what's buffered"""
+
+        if not self._buffer:
+            return
+        pa = self._pa
+        data = b'\n'.join(self._buffer) + b'\n'
+        self._buffer = []
+        self._size = 0
+        block_size = max(len(data) + 1, 1024 * 1024)
+        table = pa.json.read_json(io.BytesIO(data), parse_options=self._parse_options,
+                                  read_options=pa.json.ReadOptions(block_size=block_size))
+        # strings are dictionary encoded; lots of repeated values (hosts, paths, colos) become small
+        table = table.select(self.schema.names).cast(self.schema)
+        self._writer.write_table(table)
+        self.rows += table.num_rows
+
+    def close(self):
+        """ write what's left and finish the file"""
+
+        self._flush()
+        self._writer.close()
+
+    def __enter__(self):
+        """ columnar (Parquet/Arrow) logs for Cloudflare API"""
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """ columnar (Parquet/Arrow) logs for Cloudflare API"""
+
+        self.close()
+
+def write(cf, zone_id, lines, filename, fields=None, file_format='parquet', compression='zstd'):
+    """ log lines (i.e. from logpull.lines() or logpull.read()) to a Parquet or Arrow file - returns the rows written
+
+    The schema comes from logs/received/fields; fields picks some of them.
+    """
+
+    with Writer(filename, schema(cf, zone_id, fields), file_format, compression) as w:
+        w.write(lines)
+    return w.rows
@@ -0,0 +1,183 @@
+""" windowed log collection for Cloudflare API"""
+from __future__ import absolute_import
+
+import calendar
+import datetime
+import gzip
+import json
+import os
+import threading
+
+from .exceptions import CloudFlareError
+from .parallel import imap_unordered
+
+# logs are fetched this many seconds at a time (the API allows up to an hour per call)
+DEFAULT_WINDOW = 300
+# windows fetched at once
+DEFAULT_WORKERS = 4
+# the progress of a pull - within its directory
+CHECKPOINT = 'checkpoint.json'
+
+def timestamp(t):
+    """ unix time from a datetime (naive datetimes are UTC) or a number"""
+
+    if isinstance(t, datetime.datetime):
+        if t.tzinfo is not None:
+            t = t.astimezone(_utc()).replace(tzinfo=None)
+        return calendar.timegm(t.timetuple())
+    return int(t)
+
+def _utc():
+    """ the UTC timezone - python2 doesn't have datetime.timezone"""
+
+    try:
+        return datetime.timezone.utc
+    except AttributeError:
+        class UTC(datetime.tzinfo):
+            """ windowed log collection for Cloudflare API"""
+            def utcoffset(self, dt):
+                """ windowed log collection for Cloudflare API"""
+                return datetime.timedelta(0)
+            def dst(self, dt):
+                """ windowed log collection for Cloudflare API"""
+                return datetime.timedelta(0)
+        return UTC()
+
+def windows(start, end, window=DEFAULT_WINDOW):
+    """ split start to end (unix times or datetimes) into a list of (start, end) windows"""
+
+    start, end = timestamp(start), timestamp(end)
+    return [(t, min(t + window, end)) for t in range(start, end, window)]
+
+def _fields(fields):
+    """ fields can be a list or a comma separated string"""
+
+    if not fields or isinstance(fields, str):
+        return fields or None
+    return ','.join(fields)
+
+def params(start, end, fields=None, sample=None):
+    """ the query for one window of logs/received"""
+
+    p = {'start': start, 'end': end, 'timestamps': 'unix'}
+    if fields:
+        p['fields'] = _fields(fields)
+    if sample is not None:
+        p['sample'] = sample
+    return p
+
+def lines(cf, zone_id, start, end, fields=None, sample=None):
+    """ the log lines (NDJSON; as bytes) for start to end - yielded as they arrive"""
+
+    return cf.zones.logs.received._get_stream(zone_id, params=params(timestamp(start), timestamp(end),
+                                                                     fields, sample))
+
+class Pull(object):
+    """ what pull() did - files is the complete window files (in time order), done and skipped count
+    windows, lines the lines fetched and errors a list of ((start, end), exception)
+    """
+
+    def __init__(self):
+        """ windowed log collection for Cloudflare API"""
+
+        self.files = []
+        self.done = 0
+        self.skipped = 0
+        self.lines = 0
+        self.errors = []
+
+    def summary(self):
+        """ the results as a dict"""
+
+        return {
+            'windows': len(self.files),
+            'fetched': self.done,
+            'skipped': self.skipped,
+            'lines': self.lines,
+            'errors': len(self.errors),
+        }
+
+def window_file(directory, zone_id, w):
+    """ where a window's logs are kept"""
+
+    return os.path.join(directory, '%s-%d-%d.ndjson.gz' % (zone_id, w[0], w[1]))
+
+def pull(cf, zone_id, start, end, directory, window=DEFAULT_WINDOW, fields=None, sample=None,
+         workers=DEFAULT_WORKERS):
+    """ fetch the logs for start to end into directory; one gzipped NDJSON file per window - returns a Pull
+
+    Windows are fetched workers at a time; each is streamed to its file as it arrives and only
+    renamed into place once it's complete. A checkpoint file records the windows that are complete;
+    so running the same pull again (i.e. after a crash or an error) fetches only what's missing.
+    Changing the window, fields or sample starts again.
+    """
+
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    checkpoint_file = os.path.join(directory, CHECKPOINT)
+    query = {'zone_id': zone_id, 'window': window, 'fields': _fields(fields), 'sample': sample}
+    done = set()
+    try:
+        with open(checkpoint_file, 'r') as f:
+            checkpoint = json.load(f)
+        if checkpoint['query'] == query:
+            done = set(tuple(w) for w in checkpoint['done'])
+    except (IOError, OSError, ValueError, KeyError):
+        pass
+
+    p = Pull()
+    todo = []
+    for w in windows(start, end, window):
+        if w in done and os.path.exists(window_file(directory, zone_id, w)):
+            p.skipped += 1
+        else:
+            done.discard(w)
+            todo.append(w)
+
+    lock = threading.Lock()
+
+    def save():
+        """ the checkpoint - via a rename so it's never left half written"""
+        ordered = sorted(done)
+        first_incomplete = next((w[0] for w in windows(start, end, window) if w not in done), None)
+        with open(checkpoint_file + '.tmp', 'w') as f:
+            json.dump({'query': query, 'done': ordered, 'first_incomplete': first_incomplete}, f)
+        os.rename(checkpoint_file + '.tmp', checkpoint_file)
+
+    def fetch(w):
+        """ one window - returns the number of lines"""
+        filename = window_file(directory, zone_id, w)
+        n = 0
+        try:
+            with gzip.open(filename + '.tmp', 'wb') as f:
+                for line in lines(cf, zone_id, w[0], w[1], fields, sample):
+                    f.write(line + b'\n')
+                    n += 1
+        except Exception:
+            if os.path.exists(filename + '.tmp'):
+                os.remove(filename + '.tmp')
+            raise
+        os.rename(filename + '.tmp', filename)
+        with lock:
+            done.add(w)
+            save()
+        return n
+
+    for w, n, error in imap_unordered(fetch, todo, workers):
+        if error is not None:
+            if not isinstance(error, (CloudFlareError, IOError, OSError)):
+                raise error
+            p.errors.append((w, error))
+            continue
+        p.done += 1
+        p.lines += n
+    p.files = [window_file(directory, zone_id, w) for w in windows(start, end, window) if w in done]
+    return p
+
+def read(files):
+    """ the lines (as bytes) from window files - i.e. pull(...).files"""
+
+    for filename in files:
+        with gzip.open(filename, 'rb') as f:
+            for line in f:
+                yield line.rstrip(b'\n')
@@ -0,0 +1,186 @@
+""" streaming log aggregation for Cloudflare API"""
+from __future__ import absolute_import
+
+import bisect
+import collections
+import heapq
+import json
+
+# log lines are parsed this many at a time
+BATCH_SIZE = 10000
+# the fields used by LogStats - i.e. logpull.pull(..., fields=FIELDS)
+FIELDS = ['ClientIP', 'ClientRequestPath', 'EdgeColoCode', 'EdgeResponseStatus', 'EdgeResponseBytes',
+          'OriginResponseTime']
+# latency histogram bucket upper bounds (in milliseconds) - the last bucket is everything above
+LATENCY_BOUNDS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000]
+# OriginResponseTime is in nanoseconds
+NANOSECONDS = 1e-6
+
+def batches(lines, fields=None, size=BATCH_SIZE):
+    """ NDJSON lines (bytes or str) as batches of columns - yields {field: [value, ...]}
+
+    Each batch holds size lines; a line without a field has None in that column.
+    With fields None the fields of the first line are used.
+    """
+
+    batch = []
+    for line in lines:
+        batch.append(line if isinstance(line, bytes) else line.encode('utf-8'))
+        if len(batch) >= size:
+            rows = _parse(batch)
+            fields = fields or list(rows[0])
+            yield _columns(rows, fields)
+            batch = []
+    if batch:
+        rows = _parse(batch)
+        yield _columns(rows, fields or list(rows[0]))
+
+def _parse(lines):
+    """ many lines parsed as one JSON list - much quicker than one json.loads() a line"""
+
+    rows = json.loads((b'[' + b','.join(lines) + b']').decode('utf-8'))
+    if len(rows) != len(lines):
+        # i.e. "1,2" on one line - that's not NDJSON
+        raise ValueError('not one JSON element per line')
+    return rows
+
+def _columns(rows, fields):
+    """ rows (dicts) to columns (lists)"""
+
+    return dict((field, [row.get(field) for row in rows]) for field in fields)
+
+def _sum_by(totals, keys, values):
+    """ add each value to the total for its key"""
+
+    get = totals.get
+    for key, value in zip(keys, values):
+        totals[key] = get(key, 0) + (value or 0)
+
+class HeavyHitters(object):
+    """ approximate top counts over a stream (Misra-Gries) - only size keys are ever kept
+
+    A count is never more than error below the real count.
+    """
+
+    def __init__(self, size=1000):
+        """ streaming log aggregation for Cloudflare API"""
+
+        self.size = size
+        self.counts = {}
+        self.error = 0
+
+    def update(self, items):
+        """ count a batch of items"""
+
+        counts = self.counts
+        for item, n in collections.Counter(items).items():
+            counts[item] = counts.get(item, 0) + n
+        if len(counts) > self.size:
+            # take the (size+1)th largest count off everything; what drops to zero goes
+            cut = heapq.nlargest(self.size + 1, counts.values())[-1]
+            self.counts = dict((item, n - cut) for item, n in counts.items() if n > cut)
+            self.error += cut
+
+    def top(self, n=10):
+        """ a list of (item, count) - largest first"""
+
+        return heapq.nlargest(n, self.counts.items(), key=lambda item: item[1])
+
+class Histogram(object):
+    """ counts of values within fixed buckets - with approximate quantiles"""
+
+    def __init__(self, bounds=None):
+        """ streaming log aggregation for Cloudflare API"""
+
+        self.bounds = list(bounds or LATENCY_BOUNDS)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.total = 0
+
+    def update(self, values, scale=1.0):
+        """ count a batch of values (None is skipped) - each is multiplied by scale first"""
+
+        bounds = self.bounds
+        counts = self.counts
+        for i, n in collections.Counter(bisect.bisect_left(bounds, value * scale)
+                                        for value in values if value is not None).items():
+            counts[i] += n
+            self.total += n
+
+    def quantile(self, q):
+        """ the bucket bound that q (0 to 1) of the values are at or below (None for the last bucket)"""
+
+        if self.total == 0:
+            return None
+        wanted = q * self.total
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= wanted and n:
+                return self.bounds[i] if i < len(self.bounds) else None
+        return None
+
+class LogStats(object):
+    """ running totals over log batches (see batches()) - the lines themselves are never kept
+
+    Requests and bytes per status, per path prefix (the first prefix_depth parts of the path) and
+    per colo; the top client IPs and a histogram of origin response times (in milliseconds).
+    """
+
+    def __init__(self, prefix_depth=1, top_size=1000, latency_bounds=None):
+        """ streaming log aggregation for Cloudflare API"""
+
+        self.prefix_depth = prefix_depth
+        self.requests = 0
+        self.bytes = 0
+        self.by_status = {'requests': collections.Counter(), 'bytes': {}}
+        self.by_prefix = {'requests': collections.Counter(), 'bytes': {}}
+        self.by_colo = {'requests': collections.Counter(), 'bytes': {}}
+        self.clients = HeavyHitters(top_size)
+        self.latency = Histogram(latency_bounds)
+
+    def _prefix(self, path):
+        """ /api/v1/items?x=1 is /api (with prefix_depth 1)"""
+
+        if path is None:
+            return None
+        path = path.split('?', 1)[0]
+        return '/' + '/'.join(path.split('/')[1:self.prefix_depth + 1])
+
+    def add(self, batch):
+        """ add a batch of columns"""
+
+        n = len(next(iter(batch.values()))) if batch else 0
+        if n == 0:
+            return
+        sizes = batch.get('EdgeResponseBytes') or [0] * n
+        self.requests += n
+        self.bytes += sum(size or 0 for size in sizes)
+        for totals, keys in [(self.by_status, batch.get('EdgeResponseStatus')),
+                             (self.by_prefix, [self._prefix(path) for path in batch.get('ClientRequestPath') or []]),
+                             (self.by_colo, batch.get('EdgeColoCode'))]:
+            if keys:
+                totals['requests'].update(keys)
+                _sum_by(totals['bytes'], keys, sizes)
+        if batch.get('ClientIP'):
+            self.clients.update(batch['ClientIP'])
+        if batch.get('OriginResponseTime'):
+            self.latency.update(batch['OriginResponseTime'], NANOSECONDS)
+
+    def summary(self, top=10):
+        """ the totals as a dict"""
+
+        def table(totals):
+            """ {key: {'requests': n, 'bytes': n}} - largest first"""
+            return collections.OrderedDict((key, {'requests': n, 'bytes': totals['bytes'].get(key, 0)})
+                                           for key, n in totals['requests'].most_common(top))
+
+        return {
+            'requests': self.requests,
+            'bytes': self.bytes,
+            'status': table(self.by_status),
+            'prefix': table(self.by_prefix),
+            'colo': table(self.by_colo),
+            'clients': self.clients.top(top),
+            'latency_ms': dict((name, self.latency.quantile(q)) for name, q in [('p50', 0.5), ('p90', 0.9),
+                                                                                ('p99', 0.99)]),
+        }
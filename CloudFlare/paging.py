@@ -0,0 +1,50 @@
+""" paging thru list results for Cloudflare API"""
+from __future__ import absolute_import
+
+from .exceptions import CloudFlareAPIError
+from .parallel import imap
+
+def all_pages(m, identifier1=None, identifier2=None, identifier3=None, params=None,
+              per_page=None, workers=1):
+    """ yield every record from every page of a list API call - i.e. all_pages(cf.zones)
+
+    The first page says how many pages there are; the rest are then fetched
+    (workers at a time) and their records yielded in page order.
+    Only a few pages are ever held in memory.
+    """
+
+    if not hasattr(m, '_get_raw'):
+        # i.e. calls that don't return the usual {'result': ..., 'result_info': ...}
+        raise CloudFlareAPIError(0, 'paging not available for this API call')
+    if params is not None and not isinstance(params, dict):
+        raise CloudFlareAPIError(0, 'paging needs named params (not a list)')
+    params = dict(params or {})
+    if per_page:
+        params['per_page'] = per_page
+    if 'page' not in params:
+        params['page'] = 1
+
+    r = m._get_raw(identifier1, identifier2, identifier3, params)
+    result = r['result']
+    if not isinstance(result, list):
+        # not a list call; so there's only the one result
+        yield result
+        return
+    for record in result:
+        yield record
+
+    result_info = r.get('result_info')
+    if not result_info or 'total_pages' not in result_info:
+        # no paging information; so this was the only page
+        return
+
+    def get_page(page):
+        """ one page of records"""
+        page_params = dict(params)
+        page_params['page'] = page
+        return m._get_raw(identifier1, identifier2, identifier3, page_params)['result']
+
+    pages = range(int(params['page']) + 1, int(result_info['total_pages']) + 1)
+    for records in imap(get_page, pages, workers):
+        for record in records:
+            yield record
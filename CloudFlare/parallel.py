@@ -0,0 +1,107 @@
+""" bounded parallel calls for Cloudflare API"""
+from __future__ import absolute_import
+
+import collections
+import itertools
+import threading
+import time
+
+# keep below the requests connection pool size (10) so connections are reused
+DEFAULT_WORKERS = 8
+# API calls per second - the API allows 1200 calls every five minutes
+DEFAULT_RATE = 4.0
+
+class RateLimit(object):
+    """ no more than rate calls a second (None for no limit) - callers from any thread wait for their turn"""
+
+    def __init__(self, rate=DEFAULT_RATE):
+        """ bounded parallel calls for Cloudflare API"""
+
+        self._interval = 1.0 / rate if rate else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        """ block until the next call is allowed"""
+
+        with self._lock:
+            now = time.time()
+            when = max(self._next, now)
+            self._next = when + self._interval
+        if when > now:
+            time.sleep(when - now)
+
+def imap(func, items, workers=DEFAULT_WORKERS):
+    """ call func(item) for each item - results are yielded in the same order as items
+
+    No more than workers calls are in flight at once and items are only read as needed.
+    An exception from func() is raised when its result is reached.
+    """
+
+    if workers is None or workers <= 1:
+        for item in items:
+            yield func(item)
+        return
+
+    # concurrent.futures is slow to import; so only import it when threads are needed
+    from concurrent.futures import ThreadPoolExecutor
+
+    items = iter(items)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        queue = collections.deque(executor.submit(func, item)
+                                  for item in itertools.islice(items, workers))
+        try:
+            while queue:
+                future = queue.popleft()
+                # keep the pipeline full while we wait for the oldest call
+                for item in itertools.islice(items, 1):
+                    queue.append(executor.submit(func, item))
+                # future.result() returns None for an exception that's false - CloudFlareAPIError has a len()
+                error = future.exception()
+                if error is not None:
+                    raise error
+                yield future.result()
+        finally:
+            # the caller stopped early (or an error) - don't start anything else
+            for future in queue:
+                future.cancel()
+
+def imap_unordered(func, items, workers=DEFAULT_WORKERS):
+    """ call func(item) for each item - yield (item, result, error) as each call finishes
+
+    No more than workers calls are in flight at once and items are only read as needed.
+    Exceptions from func() are returned as error (with result None) and never raised.
+    """
+
+    if workers is None or workers <= 1:
+        for item in items:
+            try:
+                result = func(item)
+            except Exception as e:
+                yield item, None, e
+                continue
+            yield item, result, None
+        return
+
+    from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+    items = iter(items)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = {}
+        for item in itertools.islice(items, workers):
+            pending[executor.submit(func, item)] = item
+        try:
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    item = pending.pop(future)
+                    for next_item in itertools.islice(items, 1):
+                        pending[executor.submit(func, next_item)] = next_item
+                    error = future.exception()
+                    if error is None:
+                        yield item, future.result(), None
+                    else:
+                        yield item, None, error
+        finally:
+            for future in pending:
+                future.cancel()
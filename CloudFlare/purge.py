@@ -0,0 +1,197 @@
+""" coalescing cache purges for Cloudflare API"""
+from __future__ import absolute_import
+
+import collections
+import json
+import threading
+import time
+
+from .parallel import imap_unordered, RateLimit, DEFAULT_WORKERS, DEFAULT_RATE
+
+# what can be purged - each is sent in its own calls
+KINDS = ['files', 'tags', 'hosts', 'prefixes']
+# the most values (of one kind) allowed in one call
+BATCH_SIZE = 30
+# purges are held this long (in seconds) so duplicates can be dropped and the rest sent together
+DEFAULT_WINDOW = 1.0
+
+class _Waiter(object):
+    """ one purge() call - its future is done once every value it asked for has been sent"""
+
+    def __init__(self, future, count):
+        """ coalescing cache purges for Cloudflare API"""
+
+        self.future = future
+        self._count = count
+        self._error = None
+        self._lock = threading.Lock()
+
+    def done(self, error=None):
+        """ one value has been sent (or failed)"""
+
+        with self._lock:
+            if error is not None and self._error is None:
+                self._error = error
+            self._count -= 1
+            if self._count != 0:
+                return
+        if self._error is not None:
+            self.future.set_exception(self._error)
+        else:
+            self.future.set_result(None)
+
+class PurgeQueue(object):
+    """ cache purges from many threads sent as few /zones/:zone_id/purge_cache calls as possible
+
+    Each purge() returns a future. The values are held for window seconds (per zone); a value
+    that's already waiting to be sent isn't sent twice. Each zone's values are then sent in calls
+    of up to batch_size values of one kind, no faster than rate calls a second and workers at a time.
+    The future's result() is None once everything it asked for has been purged; or it raises the
+    API error.
+    """
+
+    def __init__(self, cf, window=DEFAULT_WINDOW, batch_size=BATCH_SIZE, rate=DEFAULT_RATE,
+                 workers=DEFAULT_WORKERS):
+        """ coalescing cache purges for Cloudflare API"""
+
+        self._cf = cf
+        self.window = window
+        self.batch_size = batch_size
+        self.workers = workers
+        self._rate_limit = RateLimit(rate)
+        # zone_id -> {(kind, key): (value, [waiters])} in the order they were added
+        self._pending = {}
+        # zone_id -> when its oldest value was added
+        self._oldest = {}
+        self._in_flight = 0
+        self._flush = False
+        self._closed = False
+        self._thread = None
+        self._cond = threading.Condition()
+        # values asked for, values dropped as duplicates and API calls made
+        self.requested = 0
+        self.coalesced = 0
+        self.api_calls = 0
+
+    def purge(self, zone_id, files=None, tags=None, hosts=None, prefixes=None):
+        """ queue purges for a zone - returns a concurrent.futures.Future"""
+
+        # concurrent.futures is slow to import; so only import it when it's used
+        from concurrent.futures import Future
+
+        values = []
+        for kind, items in zip(KINDS, [files, tags, hosts, prefixes]):
+            for value in items or []:
+                values.append((kind, value))
+        future = Future()
+        if len(values) == 0:
+            future.set_result(None)
+            return future
+
+        waiter = _Waiter(future, len(values))
+        with self._cond:
+            if self._closed:
+                raise ValueError('purge queue is closed')
+            pending = self._pending.setdefault(zone_id, collections.OrderedDict())
+            if zone_id not in self._oldest:
+                self._oldest[zone_id] = time.time()
+            for kind, value in values:
+                # files can be dicts (a url with headers)
+                key = (kind, json.dumps(value, sort_keys=True))
+                self.requested += 1
+                if key in pending:
+                    self.coalesced += 1
+                else:
+                    pending[key] = (value, [])
+                pending[key][1].append(waiter)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='purge-queue')
+                self._thread.daemon = True
+                self._thread.start()
+            self._cond.notify_all()
+        return future
+
+    def flush(self):
+        """ send everything that's waiting now - returns once it's all been sent"""
+
+        with self._cond:
+            self._flush = True
+            self._cond.notify_all()
+            while self._pending or self._in_flight:
+                self._cond.wait()
+            self._flush = False
+
+    def close(self):
+        """ send everything that's waiting and stop"""
+
+        self.flush()
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        """ coalescing cache purges for Cloudflare API"""
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """ coalescing cache purges for Cloudflare API"""
+
+        self.close()
+
+    def _ready(self, now):
+        """ take the batches that are due - called with the lock held"""
+
+        batches = []
+        for zone_id in list(self._pending):
+            pending = self._pending[zone_id]
+            kinds = collections.Counter(kind for kind, _ in pending)
+            if not self._flush and self._oldest[zone_id] + self.window > now \
+               and max(kinds.values()) < self.batch_size:
+                continue
+            del self._pending[zone_id]
+            del self._oldest[zone_id]
+            by_kind = collections.OrderedDict()
+            for (kind, _), (value, waiters) in pending.items():
+                by_kind.setdefault(kind, []).append((value, waiters))
+            for kind, items in by_kind.items():
+                for i in range(0, len(items), self.batch_size):
+                    batches.append((zone_id, kind, items[i:i + self.batch_size]))
+        return batches
+
+    def _send(self, batch):
+        """ one API call"""
+
+        zone_id, kind, items = batch
+        self._rate_limit.wait()
+        with self._cond:
+            self.api_calls += 1
+        return self._cf.zones.purge_cache.post(zone_id, data={kind: [value for value, _ in items]})
+
+    def _run(self):
+        """ the thread that sends the batches"""
+
+        while True:
+            with self._cond:
+                while True:
+                    now = time.time()
+                    batches = self._ready(now)
+                    if batches:
+                        self._in_flight += len(batches)
+                        break
+                    if self._closed and not self._pending:
+                        return
+                    timeout = None
+                    if self._oldest:
+                        timeout = max(min(self._oldest.values()) + self.window - now, 0.0)
+                    self._cond.wait(timeout)
+
+            for (_, _, items), _, error in imap_unordered(self._send, batches, self.workers):
+                for _, waiters in items:
+                    for waiter in waiters:
+                        waiter.done(error)
+                with self._cond:
+                    self._in_flight -= 1
+                    self._cond.notify_all()
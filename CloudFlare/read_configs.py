@@ -2,12 +2,73 @@
 
 import os
 import re
+import threading
 try:
     import ConfigParser  # py2
 except ImportError:
     import configparser as ConfigParser  # py3
 
-def read_configs():
+from .exceptions import CloudFlareAPIError
+
+CONFIG_FILES = [
+    '.cloudflare.cfg',
+    '~/.cloudflare.cfg',
+    '~/.cloudflare/cloudflare.cfg'
+]
+
+DEFAULT_PROFILE = 'CloudFlare'
+
+# the parsed config files are shared by every CloudFlare() instance in the process
+_config_lock = threading.Lock()
+_config_cache = {'stamp': None, 'profiles': {}}
+
+def _config_stamp(filenames):
+    """ the name, mtime and size of each config file present - any change invalidates the cache"""
+
+    stamp = []
+    for filename in filenames:
+        try:
+            st = os.stat(filename)
+        except OSError:
+            continue
+        stamp.append((os.path.abspath(filename), st.st_mtime, st.st_size))
+    return tuple(stamp)
+
+def _parse_configs(filenames):
+    """ parse the config files into a dict of profiles; each a dict of cleaned up values"""
+
+    config = ConfigParser.RawConfigParser()
+    config.read(filenames)
+
+    profiles = {}
+    for section in config.sections():
+        values = {}
+        for option in ['email', 'token', 'certtoken', 'bearer']:
+            try:
+                values[option] = re.sub(r"\s+", '', config.get(section, option))
+            except ConfigParser.NoOptionError:
+                pass
+        try:
+            extras = re.sub(r"\s+", ' ', config.get(section, 'extras'))
+        except ConfigParser.NoOptionError:
+            extras = None
+        if extras:
+            values['extras'] = extras.split(' ')
+        profiles[section] = values
+    return profiles
+
+def _read_config_files():
+    """ return the parsed config files; only re-read from disk when a file has changed"""
+
+    filenames = [os.path.expanduser(filename) for filename in CONFIG_FILES]
+    stamp = _config_stamp(filenames)
+    with _config_lock:
+        if _config_cache['stamp'] != stamp:
+            _config_cache['profiles'] = _parse_configs(filenames)
+            _config_cache['stamp'] = stamp
+        return _config_cache['profiles']
+
+def read_configs(profile=None):
     """ reading the config file for Cloudflare API"""
 
     # envioronment variables override config files
@@ -17,46 +78,29 @@ def read_configs():
     bearer = os.getenv('CF_API_BEARER')
     extras = os.getenv('CF_API_EXTRAS')
 
+    if profile is None:
+        profile = os.getenv('CF_API_PROFILE')
+
     # grab values from config files
-    config = ConfigParser.RawConfigParser()
-    config.read([
-        '.cloudflare.cfg',
-        os.path.expanduser('~/.cloudflare.cfg'),
-        os.path.expanduser('~/.cloudflare/cloudflare.cfg')
-    ])
+    profiles = _read_config_files()
 
-    if email is None:
-        try:
-            email = re.sub(r"\s+", '', config.get('CloudFlare', 'email'))
-        except (ConfigParser.NoOptionError, ConfigParser.NoSectionError):
-            email = None
+    if profile is None:
+        # the [CloudFlare] section is the default profile - it's fine if it does not exist
+        values = profiles.get(DEFAULT_PROFILE, {})
+    elif profile in profiles:
+        values = profiles[profile]
+    else:
+        raise CloudFlareAPIError(0, '%s: profile not found in configuration file' % (profile))
 
+    if email is None:
+        email = values.get('email')
     if token is None:
-        try:
-            token = re.sub(r"\s+", '', config.get('CloudFlare', 'token'))
-        except (ConfigParser.NoOptionError, ConfigParser.NoSectionError):
-            token = None
-
+        token = values.get('token')
     if certtoken is None:
-        try:
-            certtoken = re.sub(r"\s+", '', config.get('CloudFlare', 'certtoken'))
-        except (ConfigParser.NoOptionError, ConfigParser.NoSectionError):
-            certtoken = None
-            
+        certtoken = values.get('certtoken')
     if bearer is None:
-        try:
-            bearer = re.sub(r"\s+", '', config.get('CloudFlare', 'bearer'))
-        except (ConfigParser.NoOptionError, ConfigParser.NoSectionError):
-            bearer = None
-
+        bearer = values.get('bearer')
     if extras is None:
-        try:
-            extras = re.sub(r"\s+", ' ', config.get('CloudFlare', 'extras'))
-        except (ConfigParser.NoOptionError, ConfigParser.NoSectionError):
-            extras = None
-
-        if extras:
-            extras = extras.split(' ')
+        extras = values.get('extras')
 
     return [email, token, certtoken, bearer, extras]
-
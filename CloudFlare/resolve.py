@@ -0,0 +1,415 @@
+""" name to identifier resolution for Cloudflare API"""
+from __future__ import absolute_import
+
+import collections
+import hashlib
+import json
+import threading
+import time
+
+from .exceptions import CloudFlareAPIError
+from .parallel import imap, DEFAULT_WORKERS
+
+# how long a resolved identifier is trusted for (in seconds)
+DEFAULT_TTL = 3600
+# dns records come and go much more often than zones; so they are only remembered in memory
+DEFAULT_DNS_RECORD_TTL = 60
+# a name that was not found is only remembered in memory; it may be created at any time
+DEFAULT_NEGATIVE_TTL = 60
+DEFAULT_LRU_SIZE = 1024
+# resolve_many() looks up this many names (or fewer) one at a time without first checking the listing size
+FEW_NAMES = 2
+# the largest page size allowed when listing everything
+LIST_PER_PAGE = {'zones': 50, 'dns_records': 5000}
+# the other kinds are always resolved by listing everything - so one call resolves them all
+# (the endpoint that lists them and the field that has the name)
+LIST_KINDS = {
+    'organizations': ('user/organizations', 'name'),
+    'invites': ('user/invites', 'organization_name'),
+    'virtual_dns': ('user/virtual_dns', 'name'),
+    'load_balancers_pools': ('user/load_balancers/pools', 'description'),
+}
+
+class _LRU(object):
+    """ in-process least recently used cache with per entry expiry"""
+
+    def __init__(self, size):
+        """ in-process least recently used cache with per entry expiry"""
+
+        self._size = size
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """ return (found, value)"""
+
+        with self._lock:
+            try:
+                expires, value = self._entries.pop(key)
+            except KeyError:
+                return False, None
+            if expires < time.time():
+                return False, None
+            # put it back as the most recently used
+            self._entries[key] = (expires, value)
+            return True, value
+
+    def set(self, key, value, ttl):
+        """ add (or replace) an entry"""
+
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (time.time() + ttl, value)
+            while len(self._entries) > self._size:
+                self._entries.popitem(last=False)
+
+    def discard(self, key):
+        """ remove an entry (if present)"""
+
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def discard_prefix(self, prefix):
+        """ remove all entries whose key starts with prefix"""
+
+        with self._lock:
+            for key in [key for key in self._entries if key.startswith(prefix)]:
+                del self._entries[key]
+
+class _Store(object):
+    """ on-disk cache shared between processes - a sqlite file"""
+
+    def __init__(self, filename):
+        """ on-disk cache shared between processes - a sqlite file"""
+
+        self._filename = filename
+        self._db = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        """ open the file on first use; any failure simply disables the store"""
+
+        if self._db is None:
+            import sqlite3
+            self._db = sqlite3.connect(self._filename, timeout=1.0, check_same_thread=False)
+            self._db.execute('CREATE TABLE IF NOT EXISTS names '
+                             '(key TEXT PRIMARY KEY, value TEXT, expires REAL)')
+            self._db.commit()
+        return self._db
+
+    def get(self, key):
+        """ return (found, value)"""
+
+        with self._lock:
+            try:
+                row = self._connect().execute('SELECT value, expires FROM names WHERE key = ?',
+                                              (key,)).fetchone()
+            except Exception:
+                return False, None
+        if row is None or row[1] < time.time():
+            return False, None
+        return True, json.loads(row[0])
+
+    def set(self, key, value, ttl):
+        """ add (or replace) an entry"""
+
+        with self._lock:
+            try:
+                db = self._connect()
+                db.execute('INSERT OR REPLACE INTO names (key, value, expires) VALUES (?, ?, ?)',
+                           (key, json.dumps(value), time.time() + ttl))
+                db.commit()
+            except Exception:
+                pass
+
+    def discard(self, key):
+        """ remove an entry (if present)"""
+
+        with self._lock:
+            try:
+                db = self._connect()
+                db.execute('DELETE FROM names WHERE key = ?', (key,))
+                db.commit()
+            except Exception:
+                pass
+
+class Resolver(object):
+    """ name to identifier resolution for Cloudflare API
+
+    Lookups are remembered in an in-process LRU and (optionally) an on-disk store
+    that's shared between processes. Names that are not found return None.
+    """
+
+    def __init__(self, cf, store=None, ttl=DEFAULT_TTL, negative_ttl=DEFAULT_NEGATIVE_TTL,
+                 dns_record_ttl=DEFAULT_DNS_RECORD_TTL, size=DEFAULT_LRU_SIZE):
+        """ name to identifier resolution for Cloudflare API"""
+
+        self._cf = cf
+        self._lru = _LRU(size)
+        self._store = None
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.dns_record_ttl = dns_record_ttl
+        # number of API calls made to resolve names
+        self.api_calls = 0
+        self._lock = threading.Lock()
+        if store:
+            self.set_store(store)
+
+    def set_store(self, filename):
+        """ use (or stop using if None) an on-disk store shared between processes"""
+
+        if filename is None:
+            self._store = None
+        else:
+            self._store = _Store(filename)
+
+    def _account(self):
+        """ cached values are only valid for the credentials that looked them up"""
+
+        base = self._cf._base
+        h = hashlib.sha256()
+        for value in [base.base_url, base.email, base.token, base.certtoken, base.bearer]:
+            h.update(str(value).encode('utf-8') + b'\0')
+        return h.hexdigest()[0:16]
+
+    def _api_call(self):
+        """ count an API call - lookups can be made from many threads"""
+
+        with self._lock:
+            self.api_calls += 1
+
+    def _key(self, kind, *names):
+        """ a cache key for this account"""
+
+        return '/'.join([self._account(), kind] + list(names))
+
+    def _results(self, r):
+        """ the list of results; even if the class was created with raw=True"""
+
+        if self._cf._base.raw:
+            return r['result']
+        return r
+
+    def _cached(self, key):
+        """ return (found, value) from memory and then the on-disk store"""
+
+        found, value = self._lru.get(key)
+        if found:
+            return found, value
+        if self._store:
+            found, value = self._store.get(key)
+            if found:
+                self._lru.set(key, value, self.ttl)
+        return found, value
+
+    def _remember(self, key, value, ttl, persist=True):
+        """ save a value; names not found are only remembered in memory"""
+
+        if value is None:
+            self._lru.set(key, None, self.negative_ttl)
+            return
+        self._lru.set(key, value, ttl)
+        if persist and self._store:
+            self._store.set(key, value, ttl)
+
+    def _lookup_list(self, kind, name):
+        """ resolve a name by listing every item; all the names listed are remembered"""
+
+        results, _ = self._lookup_lists(kind, [name])
+        return results[name]
+
+    def _lookup_lists(self, kind, names):
+        """ resolve names by listing every item (once) - returns ({name: identifier}, api_calls)"""
+
+        results = {}
+        misses = []
+        for name in names:
+            found, value = self._cached(self._key(kind, name))
+            if found:
+                results[name] = value
+            else:
+                misses.append(name)
+        if not misses:
+            return results, 0
+
+        path, name_key = LIST_KINDS[kind]
+        api_call = self._cf
+        for element in path.split('/'):
+            api_call = getattr(api_call, element)
+        self._api_call()
+        listed = {}
+        for item in self._results(api_call.get()):
+            listed[item[name_key]] = item['id']
+            self._remember(self._key(kind, item[name_key]), item['id'], self.ttl)
+        for name in misses:
+            results[name] = listed.get(name)
+            if results[name] is None:
+                self._remember(self._key(kind, name), None, self.negative_ttl)
+        return results, 1
+
+    def zone(self, zone_name):
+        """ zone name to zone identifier"""
+
+        key = self._key('zones', zone_name)
+        found, value = self._cached(key)
+        if found:
+            return value
+
+        self._api_call()
+        zones = self._results(self._cf.zones.get(params={'name':zone_name, 'per_page':1}))
+        value = None
+        if len(zones) == 1:
+            value = zones[0]['id']
+        self._remember(key, value, self.ttl)
+        return value
+
+    def dns_records(self, zone_id, dns_name):
+        """ dns record name to a list of dns record identifiers (there can be more than one)"""
+
+        key = self._key('dns_records', zone_id, dns_name)
+        found, value = self._cached(key)
+        if found:
+            return value
+
+        self._api_call()
+        dns_records = self._results(self._cf.zones.dns_records.get(zone_id, params={'name':dns_name}))
+        value = [dns_record['id'] for dns_record in dns_records if dns_record['name'] == dns_name]
+        if len(value) == 0:
+            value = None
+        self._remember(key, value, self.dns_record_ttl, persist=False)
+        return value
+
+    def organization(self, organization_name):
+        """ organization name to organization identifier"""
+
+        return self._lookup_list('organizations', organization_name)
+
+    def invite(self, invite_name):
+        """ invite organization name to invite identifier"""
+
+        return self._lookup_list('invites', invite_name)
+
+    def virtual_dns(self, virtual_dns_name):
+        """ virtual dns name to virtual dns identifier"""
+
+        return self._lookup_list('virtual_dns', virtual_dns_name)
+
+    def load_balancers_pool(self, pool_name):
+        """ load balancer pool description to pool identifier"""
+
+        return self._lookup_list('load_balancers_pools', pool_name)
+
+    def many(self, kind, names, zone_id=None, workers=DEFAULT_WORKERS):
+        """ resolve many names with as few API calls as possible - returns ({name: identifier}, api_calls)
+
+        kind is 'zones', 'dns_records' (with zone_id) or one of the other kinds used by forget().
+        Cached names cost nothing. The rest can be looked up at one call per name, or found by
+        listing everything at one call per page. The first page of the listing says how many pages
+        there are; so it's fetched first and then the cheaper of the two is used for what's left.
+        """
+
+        if kind in LIST_KINDS:
+            return self._lookup_lists(kind, list(names))
+        if kind == 'zones':
+            lookup = self.zone
+        elif kind == 'dns_records':
+            if zone_id is None:
+                raise CloudFlareAPIError(0, 'dns_records needs a zone_id')
+            lookup = lambda name: self.dns_records(zone_id, name)
+        else:
+            raise CloudFlareAPIError(0, '%s: unknown kind' % (kind))
+
+        results = {}
+        misses = []
+        seen = set()
+        for name in names:
+            if name in seen:
+                continue
+            seen.add(name)
+            found, value = self._cached(self._listing_key(kind, zone_id, name))
+            if found:
+                results[name] = value
+            else:
+                misses.append(name)
+
+        api_calls = 0
+        if len(misses) > FEW_NAMES:
+            r = self._listing_page(kind, zone_id, 1)
+            api_calls += 1
+            listed = {}
+            self._listed(r['result'], misses, listed)
+            result_info = r.get('result_info') or {}
+            pages = list(range(2, int(result_info.get('total_pages', 1)) + 1))
+            if kind == 'zones':
+                # zone names are unique; so a name that's been listed is done with
+                left = [name for name in misses if name not in listed]
+            else:
+                # more records with the same name could be on a later page
+                left = misses
+            if len(left) > len(pages):
+                # listing the rest is cheaper than looking up each name that's left
+                get_page = lambda page: self._listing_page(kind, zone_id, page)['result']
+                for items in imap(get_page, pages, workers):
+                    api_calls += 1
+                    self._listed(items, misses, listed)
+                left = []
+            left_over = set(left)
+            for name in misses:
+                if name in left_over:
+                    continue
+                # everything has been listed for this name; so it's complete (or it doesn't exist)
+                value = listed.get(name)
+                if kind == 'zones':
+                    if value:
+                        value = value[0]
+                    self._remember(self._listing_key(kind, zone_id, name), value, self.ttl)
+                else:
+                    self._remember(self._listing_key(kind, zone_id, name), value,
+                                   self.dns_record_ttl, persist=False)
+                results[name] = value
+            misses = left
+
+        # what's left is looked up one name at a time
+        for name, value in zip(misses, imap(lookup, misses, workers)):
+            api_calls += 1
+            results[name] = value
+        return results, api_calls
+
+    def _listing_key(self, kind, zone_id, name):
+        """ the cache key used by zone() and dns_records()"""
+
+        if kind == 'dns_records':
+            return self._key(kind, zone_id, name)
+        return self._key(kind, name)
+
+    def _listing_page(self, kind, zone_id, page):
+        """ one page of everything - always the raw response so the paging info is there"""
+
+        self._api_call()
+        params = {'page':page, 'per_page':LIST_PER_PAGE[kind]}
+        if kind == 'dns_records':
+            return self._cf.zones.dns_records._get_raw(zone_id, params=params)
+        return self._cf.zones._get_raw(params=params)
+
+    def _listed(self, items, names, listed):
+        """ add the identifiers for the names we're after from a listing to listed"""
+
+        wanted = set(names)
+        for item in items:
+            if item['name'] in wanted:
+                listed.setdefault(item['name'], []).append(item['id'])
+
+    def forget(self, kind, *names):
+        """ drop a cached name; i.e. forget('zones', 'example.com') or forget('dns_records', zone_id)
+
+        For dns_records; passing only the zone identifier forgets every name in that zone.
+        """
+
+        key = self._key(kind, *names)
+        if kind == 'dns_records' and len(names) == 1:
+            self._lru.discard_prefix(key + '/')
+            return
+        self._lru.discard(key)
+        if self._store:
+            self._store.discard(key)
@@ -0,0 +1,47 @@
+""" per-phase timing for Cloudflare API"""
+from __future__ import absolute_import
+
+import collections
+import threading
+import time
+
+class Timings(object):
+    """ elapsed time (and count) for each phase of a run - i.e. CloudFlare(timings=Timings())
+
+    Phases are reported in the order they were first seen.
+    Calls made from many threads at once are added together; so phases can add up to more than the total.
+    """
+
+    def __init__(self, start=None):
+        """ per-phase timing for Cloudflare API"""
+
+        self.start = start or time.time()
+        self._phases = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, phase, seconds, count=1):
+        """ add to a phase"""
+
+        with self._lock:
+            total, n = self._phases.get(phase, (0.0, 0))
+            self._phases[phase] = (total + seconds, n + count)
+
+    def since(self, phase, start):
+        """ add the time since start to a phase"""
+
+        self.add(phase, time.time() - start)
+
+    def phases(self):
+        """ a list of (phase, seconds, count)"""
+
+        with self._lock:
+            return [(phase, total, n) for phase, (total, n) in self._phases.items()]
+
+    def report(self):
+        """ a human readable table - one phase per line with the total run time last"""
+
+        lines = []
+        for phase, total, n in self.phases():
+            lines.append('%-24s %10.1f ms %6d' % (phase, total * 1000.0, n))
+        lines.append('%-24s %10.1f ms' % ('total', (time.time() - self.start) * 1000.0))
+        return lines
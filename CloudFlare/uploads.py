@@ -0,0 +1,191 @@
+""" streamed uploads for Cloudflare API"""
+from __future__ import absolute_import
+
+import io
+import os
+import stat
+import uuid
+
+# how much of a file is read at a time
+CHUNK_SIZE = 64 * 1024
+
+def is_stream(data):
+    """ True if data is a file (or an iterator of chunks) to be sent as-is"""
+
+    if data is None or isinstance(data, (str, bytes, dict, list, tuple)):
+        return False
+    return hasattr(data, 'read') or hasattr(data, '__next__') or hasattr(data, 'next')
+
+def _to_bytes(s):
+    """ file contents can be text (i.e. sys.stdin) or bytes"""
+
+    if isinstance(s, bytes):
+        return s
+    return s.encode('utf-8')
+
+def _file_size(f):
+    """ the bytes left to read in a file - or None if that's not known (i.e. a pipe)"""
+
+    if isinstance(getattr(f, 'len', None), int):
+        # i.e. IterStream
+        return f.len
+    if isinstance(f, io.TextIOBase) or 'b' not in getattr(f, 'mode', 'b'):
+        # text is encoded as it's read; so its size in bytes isn't known
+        return None
+    try:
+        st = os.fstat(f.fileno())
+        if not stat.S_ISREG(st.st_mode):
+            # pipes, sockets, etc
+            return None
+        return st.st_size - f.tell()
+    except (AttributeError, OSError, IOError, ValueError, io.UnsupportedOperation):
+        pass
+    try:
+        # i.e. io.BytesIO
+        here = f.tell()
+        f.seek(0, 2)
+        end = f.tell()
+        f.seek(here)
+        return end - here
+    except (AttributeError, OSError, IOError, ValueError, io.UnsupportedOperation):
+        return None
+
+class IterStream(object):
+    """ a file-like object that reads from an iterator of strings (or bytes) - i.e. lines as they're made
+
+    If the length (in bytes) is known it can be given; so the upload isn't sent chunked.
+    """
+
+    def __init__(self, iterable, length=None):
+        """ streamed uploads for Cloudflare API"""
+
+        self._chunks = iter(iterable)
+        self._buffer = b''
+        self.len = length
+
+    def read(self, size=-1):
+        """ file-like reading"""
+
+        if size is None or size < 0:
+            data = self._buffer + b''.join(_to_bytes(chunk) for chunk in self._chunks)
+            self._buffer = b''
+            return data
+        while len(self._buffer) < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._buffer += _to_bytes(chunk)
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+class MultipartStream(object):
+    """ a multipart/form-data body that's read from the files as it's sent
+
+    files is {name: file} or {name: (filename, file[, content_type])} as used by requests;
+    fields is a dict of extra form values. The whole body is never held in memory.
+    If every file's size is known then so is len; otherwise len is None and it's sent chunked.
+    """
+
+    def __init__(self, files, fields=None):
+        """ streamed uploads for Cloudflare API"""
+
+        self.boundary = uuid.uuid4().hex
+        self.content_type = 'multipart/form-data; boundary=%s' % (self.boundary)
+        # a list of bytes (sent as-is) or files (read a chunk at a time)
+        self._parts = []
+        self.len = 0
+
+        for name, value in sorted((fields or {}).items()):
+            if value is None:
+                continue
+            if isinstance(value, bool):
+                value = 'true' if value else 'false'
+            self._add_bytes(self._header(name))
+            self._add_bytes(_to_bytes(str(value)) + b'\r\n')
+
+        for name, value in sorted(files.items()):
+            content_type = None
+            if isinstance(value, (tuple, list)):
+                filename, f = value[0], value[1]
+                if len(value) > 2:
+                    content_type = value[2]
+            else:
+                f = value
+                filename = os.path.basename(getattr(f, 'name', None) or name)
+                if filename[0:1] == '<':
+                    # i.e. <stdin>
+                    filename = name
+            self._add_bytes(self._header(name, filename, content_type))
+            if isinstance(f, (str, bytes)):
+                self._add_bytes(_to_bytes(f))
+            else:
+                self._add_file(f)
+            self._add_bytes(b'\r\n')
+
+        self._add_bytes(_to_bytes('--%s--\r\n' % (self.boundary)))
+        self._chunks = self._generate()
+        self._buffer = b''
+
+    def _header(self, name, filename=None, content_type=None):
+        """ the start of a part"""
+
+        header = '--%s\r\nContent-Disposition: form-data; name="%s"' % (self.boundary, name)
+        if filename:
+            header += '; filename="%s"' % (filename)
+        if content_type:
+            header += '\r\nContent-Type: %s' % (content_type)
+        return _to_bytes(header + '\r\n\r\n')
+
+    def _add_bytes(self, b):
+        """ a part that's already in memory"""
+
+        self._parts.append(b)
+        if self.len is not None:
+            self.len += len(b)
+
+    def _add_file(self, f):
+        """ a part that's read as it's sent"""
+
+        self._parts.append(f)
+        size = _file_size(f)
+        if size is None or self.len is None:
+            self.len = None
+        else:
+            self.len += size
+
+    def _generate(self):
+        """ yield the body a chunk at a time"""
+
+        for part in self._parts:
+            if isinstance(part, bytes):
+                yield part
+                continue
+            while True:
+                chunk = part.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield _to_bytes(chunk)
+
+    def __iter__(self):
+        """ streamed uploads for Cloudflare API"""
+
+        while True:
+            chunk = self.read(CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+    def read(self, size=-1):
+        """ file-like reading of the body"""
+
+        if size is None or size < 0:
+            data = self._buffer + b''.join(self._chunks)
+            self._buffer = b''
+            return data
+        while len(self._buffer) < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._buffer += chunk
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
@@ -2,12 +2,13 @@
 from __future__ import absolute_import
 
 import sys
-import requests
 
 from . import __version__
 
 def user_agent():
     """ misc utilities  for Cloudflare API"""
+    import requests
+
     # the default User-Agent is something like 'python-requests/2.11.1'
     # this additional data helps support @ Cloudflare help customers
     return ('python-cloudflare/' + __version__ + '/' +
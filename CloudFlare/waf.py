@@ -0,0 +1,194 @@
+""" WAF package, group and rule crawling for Cloudflare API"""
+from __future__ import absolute_import
+
+import threading
+
+from .exceptions import CloudFlareError, CloudFlareAPIError
+from .paging import all_pages
+from .parallel import imap_unordered, RateLimit, DEFAULT_WORKERS, DEFAULT_RATE
+
+# the largest page size allowed when listing zones
+ZONES_PER_PAGE = 50
+# the largest page size allowed when listing WAF packages, groups and rules
+PER_PAGE = 100
+
+class Tree(object):
+    """ every WAF package, group and rule of some zones - packages are indexed by (zone_id, package_id)
+    and groups and rules by (zone_id, package_id, id)
+
+    group_rules is the rule ids of each group (indexed by (zone_id, package_id, group_id)) and errors
+    a list of ((kind, zone_id, package_id), exception) for lists that couldn't be read.
+    """
+
+    def __init__(self):
+        """ WAF package, group and rule crawling for Cloudflare API"""
+
+        self.zones = []
+        self.packages = {}
+        self.groups = {}
+        self.rules = {}
+        self.group_rules = {}
+        self.errors = []
+        self.api_calls = 0
+
+    def summary(self):
+        """ the results as a dict"""
+
+        return {
+            'zones': len(self.zones),
+            'packages': len(self.packages),
+            'groups': len(self.groups),
+            'rules': len(self.rules),
+            'errors': len(self.errors),
+            'api_calls': self.api_calls,
+        }
+
+def _lists(cf, keys, rate_limit, workers, tree):
+    """ every page of many lists; yields (key, records) for each page
+
+    keys are (kind, zone_id, package_id). The first page of every list is fetched (workers at a time)
+    and then the rest of the pages of all of them; so the calls are never nested.
+    """
+
+    packages = cf.zones.firewall.waf.packages
+    endpoints = {'packages': packages, 'groups': packages.groups, 'rules': packages.rules}
+    lock = threading.Lock()
+
+    def get_page(item):
+        """ one page"""
+        key, page = item
+        kind, zone_id, package_id = key
+        rate_limit.wait()
+        with lock:
+            tree.api_calls += 1
+        return endpoints[kind]._get_raw(zone_id, package_id, None, {'page': page, 'per_page': PER_PAGE})
+
+    more = []
+    for (key, _), r, error in imap_unordered(get_page, [(key, 1) for key in keys], workers):
+        if error is not None:
+            if not isinstance(error, CloudFlareError):
+                raise error
+            tree.errors.append((key, error))
+            continue
+        yield key, r['result']
+        pages = int((r.get('result_info') or {}).get('total_pages') or 1)
+        more.extend((key, page) for page in range(2, pages + 1))
+    for (key, _), r, error in imap_unordered(get_page, more, workers):
+        if error is not None:
+            if not isinstance(error, CloudFlareError):
+                raise error
+            tree.errors.append((key, error))
+            continue
+        yield key, r['result']
+
+def crawl(cf, zones=None, rate=DEFAULT_RATE, workers=DEFAULT_WORKERS):
+    """ read the whole package -> group -> rule tree of the WAF of many zones - returns a Tree
+
+    zones is a list of zones (dicts with an id, as from cf.zones.get) or zone identifiers; None
+    is every zone. The packages of every zone are listed, then the groups and rules of every
+    package; each level is fetched workers at a time (pages too) and no faster than rate a second.
+    """
+
+    tree = Tree()
+    if zones is None:
+        zones = list(all_pages(cf.zones, per_page=ZONES_PER_PAGE, workers=workers))
+        tree.api_calls += max((len(zones) + ZONES_PER_PAGE - 1) // ZONES_PER_PAGE, 1)
+    tree.zones = [zone['id'] if isinstance(zone, dict) else zone for zone in zones]
+    rate_limit = RateLimit(rate)
+
+    keys = []
+    for (_, zone_id, _), records in _lists(cf, [('packages', zone_id, None) for zone_id in tree.zones],
+                                            rate_limit, workers, tree):
+        for package in records:
+            tree.packages[(zone_id, package['id'])] = package
+            keys.extend([('groups', zone_id, package['id']), ('rules', zone_id, package['id'])])
+
+    for (kind, zone_id, package_id), records in _lists(cf, keys, rate_limit, workers, tree):
+        for record in records:
+            if kind == 'groups':
+                tree.groups[(zone_id, package_id, record['id'])] = record
+            else:
+                tree.rules[(zone_id, package_id, record['id'])] = record
+                group_id = (record.get('group') or {}).get('id')
+                tree.group_rules.setdefault((zone_id, package_id, group_id), []).append(record['id'])
+    return tree
+
+def _changes(items, modes):
+    """ the (key, item, old mode, new mode) for items whose mode differs from modes ({id: mode})"""
+
+    changes = []
+    for key, item in sorted(items.items()):
+        mode = modes.get(key[2])
+        if mode is None or item.get('mode') == mode:
+            continue
+        allowed = item.get('allowed_modes')
+        if allowed and mode not in allowed:
+            raise CloudFlareAPIError(0, '%s: mode %s not allowed (%s)' % (key[2], mode, ','.join(allowed)))
+        changes.append((key, item, item.get('mode'), mode))
+    return changes
+
+class ModeChanges(object):
+    """ what set_modes() did (or would do) - changed is a list of (kind, zone_id, package_id, id,
+    old mode, new mode) and errors a list of ((kind, zone_id, package_id, id), exception)
+    """
+
+    def __init__(self):
+        """ WAF package, group and rule crawling for Cloudflare API"""
+
+        self.changed = []
+        self.unchanged = 0
+        self.errors = []
+        self.api_calls = 0
+        self.applied = False
+
+    def summary(self):
+        """ the results as a dict"""
+
+        return {
+            'changed': len(self.changed),
+            'unchanged': self.unchanged,
+            'errors': len(self.errors),
+            'api_calls': self.api_calls,
+            'applied': self.applied,
+        }
+
+def set_modes(cf, tree, rules=None, groups=None, dry_run=False, rate=DEFAULT_RATE, workers=DEFAULT_WORKERS):
+    """ set the mode of rules and groups in every zone of a Tree (see crawl()) - returns ModeChanges
+
+    rules and groups are {id: mode}. Only those whose mode differs are PATCHed (workers at a time
+    and no faster than rate a second); the tree is updated to match. A mode that a rule doesn't
+    allow raises CloudFlareAPIError before anything is changed. With dry_run=True nothing is changed.
+    """
+
+    packages = cf.zones.firewall.waf.packages
+    result = ModeChanges()
+    todo = [('groups', change) for change in _changes(tree.groups, groups or {})]
+    todo += [('rules', change) for change in _changes(tree.rules, rules or {})]
+    result.unchanged = (sum(1 for key in tree.groups if key[2] in (groups or {})) +
+                        sum(1 for key in tree.rules if key[2] in (rules or {})) - len(todo))
+    rate_limit = RateLimit(rate)
+    lock = threading.Lock()
+
+    def patch(item):
+        """ one mode change"""
+        kind, ((zone_id, package_id, item_id), _, _, mode) = item
+        endpoint = packages.groups if kind == 'groups' else packages.rules
+        rate_limit.wait()
+        with lock:
+            result.api_calls += 1
+        return endpoint.patch(zone_id, package_id, item_id, data={'mode': mode})
+
+    if dry_run:
+        result.changed = [(kind,) + key + (old, new) for kind, (key, _, old, new) in todo]
+        return result
+    for item, _, error in imap_unordered(patch, todo, workers):
+        kind, (key, record, old, new) = item
+        if error is not None:
+            if not isinstance(error, CloudFlareError):
+                raise error
+            result.errors.append(((kind,) + key, error))
+            continue
+        record['mode'] = new
+        result.changed.append((kind,) + key + (old, new))
+    result.applied = True
+    return result
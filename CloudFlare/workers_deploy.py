@@ -0,0 +1,275 @@
+""" Workers deployment for Cloudflare API"""
+from __future__ import absolute_import
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+from .exceptions import CloudFlareError
+from .paging import all_pages
+from .parallel import imap_unordered, RateLimit, DEFAULT_WORKERS, DEFAULT_RATE
+
+# how long (in seconds) the manifest is trusted before the deployed state is read again
+DEFAULT_MAX_AGE = 24 * 3600
+# the largest page size allowed when listing zones
+PER_PAGE = 50
+# the error code when there's no script yet (workers.api.error.script_not_found)
+SCRIPT_NOT_FOUND = 10007
+
+def script_hash(script):
+    """ the sha256 of a script (str or bytes)"""
+
+    if not isinstance(script, bytes):
+        script = script.encode('utf-8')
+    return hashlib.sha256(script).hexdigest()
+
+def routes_diff(current, desired, script_name=None):
+    """ compare routes from the API with the desired patterns - returns (adds, updates, removes)
+
+    adds is a list of patterns, updates and removes lists of current routes. Routes are matched
+    by pattern (a set diff); a route is updated if it's disabled or points at another script.
+    """
+
+    by_pattern = dict((route['pattern'], route) for route in current)
+    wanted = set(desired)
+    adds = sorted(wanted - set(by_pattern))
+    removes = [by_pattern[pattern] for pattern in sorted(set(by_pattern) - wanted)]
+    updates = []
+    for pattern in sorted(wanted & set(by_pattern)):
+        route = by_pattern[pattern]
+        if script_name is not None:
+            if route.get('script') != script_name:
+                updates.append(route)
+        elif route.get('enabled') is False:
+            updates.append(route)
+    return adds, updates, removes
+
+class Deploy(object):
+    """ what deploy() did (or would do) - uploaded and unchanged are lists of zone identifiers (or
+    the script name), routes counts the routes added, updated and removed and errors is a list of
+    (zone identifier, exception)
+    """
+
+    def __init__(self):
+        """ Workers deployment for Cloudflare API"""
+
+        self.uploaded = []
+        self.unchanged = []
+        self.routes = {'add': 0, 'update': 0, 'remove': 0}
+        self.errors = []
+        self.api_calls = 0
+        self.applied = False
+
+    def summary(self):
+        """ the results as a dict"""
+
+        return {
+            'uploaded': len(self.uploaded),
+            'unchanged': len(self.unchanged),
+            'routes_added': self.routes['add'],
+            'routes_updated': self.routes['update'],
+            'routes_removed': self.routes['remove'],
+            'errors': len(self.errors),
+            'api_calls': self.api_calls,
+            'applied': self.applied,
+        }
+
+class Manifest(object):
+    """ what was last deployed where - {key: {'sha256', 'sha256_checked', 'routes', 'routes_checked'}};
+    kept in a JSON file
+
+    A missing or broken file is simply ignored; so the worst that can happen is an extra read.
+    """
+
+    def __init__(self, filename=None):
+        """ Workers deployment for Cloudflare API"""
+
+        self.filename = filename
+        self.entries = {}
+        if filename:
+            try:
+                with open(filename, 'r') as f:
+                    self.entries = json.load(f)
+            except (IOError, OSError, ValueError):
+                pass
+
+    def save(self):
+        """ write the manifest to disk - via a rename so it's never left half written"""
+
+        if not self.filename:
+            return
+        tmp = self.filename + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.entries, f, indent=1, sort_keys=True)
+        os.rename(tmp, self.filename)
+
+def deploy(cf, script, zones=None, routes=None, script_name=None, manifest=None, max_age=DEFAULT_MAX_AGE,
+           dry_run=False, filters=False, rate=DEFAULT_RATE, workers=DEFAULT_WORKERS):
+    """ deploy a Worker script (str or bytes) to many zones - returns a Deploy
+
+    Without script_name the script is each zone's own (zones/:zone_id/workers/script); with one it's
+    uploaded once to user/workers/scripts/:script_name and the routes point at it. zones is a list of
+    zones (dicts with an id, as from cf.zones.get) or zone identifiers; None is every zone.
+
+    routes is a list of patterns for every zone or {zone_id: [pattern, ...]}; the zone's routes
+    (or filters with filters=True) are made to match by pattern. None leaves routes alone.
+
+    The sha256 of the script (and the routes) are kept in manifest (a filename); where they match
+    and are less than max_age seconds old nothing is called; where the manifest has another script
+    it's uploaded. Otherwise the deployed script is read and hashed and only uploaded if it's
+    different. Zones are done workers at a time and no faster than rate a second. With dry_run=True
+    nothing is changed.
+    """
+
+    result = Deploy()
+    if not isinstance(manifest, Manifest):
+        manifest = Manifest(manifest)
+    digest = script_hash(script)
+    rate_limit = RateLimit(rate)
+    lock = threading.Lock()
+    now = time.time()
+
+    def count():
+        """ count an API call - when it's allowed"""
+        rate_limit.wait()
+        with lock:
+            result.api_calls += 1
+
+    def call(func, *args, **kwargs):
+        """ one API call - when it's allowed"""
+        count()
+        r = func(*args, **kwargs)
+        if cf._base.raw:
+            return r['result']
+        return r
+
+    def known(key, field):
+        """ what the manifest says is deployed (or None if it's not known or too old)"""
+        entry = manifest.entries.get(key) or {}
+        if now - entry.get(field + '_checked', 0) < max_age:
+            return entry.get(field)
+        return None
+
+    def fresh(key, field, value):
+        """ the manifest says this is already deployed"""
+        return known(key, field) == value
+
+    def checked(key, field, value):
+        """ record what's now deployed"""
+        if dry_run:
+            return
+        with lock:
+            entry = manifest.entries.setdefault(key, {})
+            entry[field] = value
+            entry[field + '_checked'] = now
+
+    def upload(key, endpoint, *identifiers):
+        """ the script - if it's changed; returns True if uploaded (None if the manifest says it's there)"""
+        deployed_hash = known(key, 'sha256')
+        if deployed_hash == digest:
+            return None
+        if deployed_hash is None:
+            # the deployed script is read and hashed - so identical scripts aren't uploaded again
+            try:
+                deployed = call(endpoint.get, *identifiers)
+            except CloudFlareError as e:
+                if int(e) != SCRIPT_NOT_FOUND:
+                    raise
+                # no script yet
+                deployed = None
+            if deployed is not None and not isinstance(deployed, (dict, list)):
+                deployed_hash = script_hash(deployed)
+        uploaded = False
+        if deployed_hash != digest:
+            if not dry_run:
+                call(endpoint.put, *identifiers, data=script)
+            uploaded = True
+        checked(key, 'sha256', digest)
+        return uploaded
+
+    def reconcile(zone_id, desired):
+        """ the zone's routes - returns {'add': n, 'update': n, 'remove': n}"""
+        counts = {'add': 0, 'update': 0, 'remove': 0}
+        state = {'script': script_name, 'patterns': sorted(desired or [])}
+        if desired is None or fresh(zone_id, 'routes', state):
+            return counts
+        endpoint = cf.zones.workers.filters if filters else cf.zones.workers.routes
+        current = list(all_pages(_Counted(endpoint, count), zone_id))
+        adds, updates, removes = routes_diff(current, desired, script_name)
+        counts = {'add': len(adds), 'update': len(updates), 'remove': len(removes)}
+        if dry_run:
+            return counts
+        for route in removes:
+            call(endpoint.delete, zone_id, route['id'])
+        for route in updates:
+            call(endpoint.put, zone_id, route['id'], data=_route(route['pattern'], script_name))
+        for pattern in adds:
+            call(endpoint.post, zone_id, data=_route(pattern, script_name))
+        checked(zone_id, 'routes', state)
+        return counts
+
+    if zones is None:
+        zones = list(all_pages(cf.zones, per_page=PER_PAGE, workers=workers))
+        result.api_calls += max((len(zones) + PER_PAGE - 1) // PER_PAGE, 1)
+    zone_ids = [zone['id'] if isinstance(zone, dict) else zone for zone in zones]
+
+    if script_name is not None:
+        key = 'user/workers/scripts/%s' % (script_name)
+        try:
+            if upload(key, cf.user.workers.scripts, script_name):
+                result.uploaded.append(script_name)
+            else:
+                result.unchanged.append(script_name)
+        except CloudFlareError as e:
+            # the routes would point at the wrong script; so stop here
+            result.errors.append((script_name, e))
+            return result
+
+    def deploy_zone(zone_id):
+        """ one zone - returns (uploaded, route counts)"""
+        uploaded = None
+        if script_name is None:
+            uploaded = bool(upload(zone_id, cf.zones.workers.script, zone_id))
+        desired = routes.get(zone_id) if isinstance(routes, dict) else routes
+        return uploaded, reconcile(zone_id, desired)
+
+    for zone_id, r, error in imap_unordered(deploy_zone, zone_ids, workers):
+        if error is not None:
+            if not isinstance(error, CloudFlareError):
+                raise error
+            result.errors.append((zone_id, error))
+            continue
+        uploaded, counts = r
+        if uploaded:
+            result.uploaded.append(zone_id)
+        elif uploaded is not None:
+            result.unchanged.append(zone_id)
+        for action, n in counts.items():
+            result.routes[action] += n
+    manifest.save()
+    result.applied = not dry_run
+    return result
+
+class _Counted(object):
+    """ an endpoint for all_pages() - count() is called before each page is read"""
+
+    def __init__(self, endpoint, count):
+        """ Workers deployment for Cloudflare API"""
+
+        self._endpoint = endpoint
+        self._count = count
+
+    def _get_raw(self, *args):
+        """ one page"""
+
+        self._count()
+        return self._endpoint._get_raw(*args)
+
+def _route(pattern, script_name=None):
+    """ the data for a POST or PUT of a route"""
+
+    if script_name is not None:
+        return {'pattern': pattern, 'script': script_name}
+    return {'pattern': pattern, 'enabled': True}
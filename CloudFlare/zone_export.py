@@ -0,0 +1,162 @@
+""" incremental zone export for Cloudflare API"""
+from __future__ import absolute_import
+
+import hashlib
+import json
+import os
+import time
+
+from .exceptions import CloudFlareError
+from .paging import all_pages
+from .parallel import imap_unordered, DEFAULT_WORKERS
+
+# the largest page size allowed when listing zones
+PER_PAGE = 50
+# the index of what's been exported - within the archive directory
+INDEX = 'index.json'
+
+class Archive(object):
+    """ a directory of zone exports - each export is stored once under the sha256 of its contents
+    (in objects/) and index.json says which export is the latest for each zone
+    """
+
+    def __init__(self, directory):
+        """ incremental zone export for Cloudflare API"""
+
+        self.directory = directory
+        self.index = {}
+        try:
+            with open(os.path.join(directory, INDEX), 'r') as f:
+                self.index = json.load(f)
+        except (IOError, OSError, ValueError):
+            pass
+
+    def _path(self, digest):
+        """ where an export is stored"""
+
+        return os.path.join(self.directory, 'objects', digest[0:2], digest)
+
+    def put(self, content):
+        """ store an export (if it's not already there) - returns its sha256"""
+
+        if not isinstance(content, bytes):
+            content = content.encode('utf-8')
+        digest = hashlib.sha256(content).hexdigest()
+        path = self._path(digest)
+        if not os.path.exists(path):
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            # via a rename so an export is never left half written
+            tmp = '%s.%d.tmp' % (path, os.getpid())
+            with open(tmp, 'wb') as f:
+                f.write(content)
+            os.rename(tmp, path)
+        return digest
+
+    def get(self, zone_name):
+        """ the latest export of a zone (or None)"""
+
+        for entry in self.index.values():
+            if entry['name'] == zone_name:
+                with open(self._path(entry['sha256']), 'rb') as f:
+                    return f.read().decode('utf-8')
+        return None
+
+    def save(self):
+        """ write the index - via a rename so it's never left half written"""
+
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+        path = os.path.join(self.directory, INDEX)
+        tmp = path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.index, f, indent=1, sort_keys=True)
+        os.rename(tmp, path)
+
+class Export(object):
+    """ what an export_zones() run did - exported, unchanged and removed are lists of zone names and
+    errors a list of (zone name, exception)
+    """
+
+    def __init__(self):
+        """ incremental zone export for Cloudflare API"""
+
+        self.exported = []
+        self.unchanged = []
+        self.removed = []
+        self.errors = []
+        self.api_calls = 0
+
+    def summary(self):
+        """ the results as a dict"""
+
+        return {
+            'exported': len(self.exported),
+            'unchanged': len(self.unchanged),
+            'removed': len(self.removed),
+            'errors': len(self.errors),
+            'api_calls': self.api_calls,
+        }
+
+def _results(cf, r):
+    """ the results; even if the class was created with raw=True"""
+
+    if cf._base.raw:
+        return r['result']
+    return r
+
+def export_zones(cf, directory, params=None, max_age=None, workers=DEFAULT_WORKERS):
+    """ export every zone (params can filter the zones listing) into the archive in directory
+
+    Zones whose modified_on is the same as when they were last exported are skipped; so a run
+    costs the zones listing plus one export per changed zone. The zone's modified_on may not
+    change when only its DNS records do; use max_age (in seconds) to export each zone again
+    once its last export is that old. Zones that have gone are dropped from the index (their
+    exports stay in the archive).
+    """
+
+    archive = Archive(directory)
+    e = Export()
+    zones = list(all_pages(cf.zones, params=params, per_page=PER_PAGE, workers=workers))
+    e.api_calls += max((len(zones) + PER_PAGE - 1) // PER_PAGE, 1)
+
+    now = time.time()
+    todo = []
+    for zone in zones:
+        entry = archive.index.get(zone['id'])
+        if entry and entry['modified_on'] == zone.get('modified_on') and entry['name'] == zone['name'] \
+           and (max_age is None or entry['exported'] + max_age > now):
+            e.unchanged.append(zone['name'])
+        else:
+            todo.append(zone)
+
+    if params is None:
+        # only a listing of every zone says which have gone
+        listed = set(zone['id'] for zone in zones)
+        for zone_id in sorted(archive.index):
+            if zone_id not in listed:
+                e.removed.append(archive.index.pop(zone_id)['name'])
+
+    def export(zone):
+        """ one zone"""
+        return archive.put(_results(cf, cf.zones.dns_records.export.get(zone['id'])))
+
+    try:
+        for zone, digest, error in imap_unordered(export, todo, workers):
+            e.api_calls += 1
+            if error is not None:
+                if not isinstance(error, CloudFlareError):
+                    raise error
+                e.errors.append((zone['name'], error))
+                continue
+            archive.index[zone['id']] = {
+                'name': zone['name'],
+                'modified_on': zone.get('modified_on'),
+                'sha256': digest,
+                'exported': now,
+            }
+            e.exported.append(zone['name'])
+    finally:
+        # whatever was exported is kept; even if the run is interrupted
+        archive.save()
+    return e
@@ -0,0 +1,108 @@
+""" bulk zone settings for Cloudflare API"""
+from __future__ import absolute_import
+
+import threading
+
+from .exceptions import CloudFlareError, CloudFlareAPIError
+from .paging import all_pages
+from .parallel import imap_unordered, RateLimit, DEFAULT_WORKERS, DEFAULT_RATE
+
+# the largest page size allowed when listing zones
+PER_PAGE = 50
+
+def diff(current, desired):
+    """ the settings (from a zones/settings listing) that differ from desired - returns {id: (old, new)}
+
+    A dict value (i.e. minify) only needs the keys that matter; the rest are kept as they are.
+    Settings that don't exist, or can't be changed, raise CloudFlareAPIError.
+    """
+
+    by_id = dict((setting['id'], setting) for setting in current)
+    changes = {}
+    for setting_id, value in sorted(desired.items()):
+        setting = by_id.get(setting_id)
+        if setting is None:
+            raise CloudFlareAPIError(0, '%s: unknown setting' % (setting_id))
+        old = setting['value']
+        if isinstance(value, dict) and isinstance(old, dict):
+            value = dict(old, **value)
+        if value == old:
+            continue
+        if not setting.get('editable', True):
+            raise CloudFlareAPIError(0, '%s: setting is not editable' % (setting_id))
+        changes[setting_id] = (old, value)
+    return changes
+
+class Rollout(object):
+    """ what apply_settings() did (or would do) - changed is {zone name: {setting: (old, new)}},
+    unchanged a list of zone names and errors a list of (zone name, exception)
+    """
+
+    def __init__(self):
+        """ bulk zone settings for Cloudflare API"""
+
+        self.changed = {}
+        self.unchanged = []
+        self.errors = []
+        self.api_calls = 0
+        self.applied = False
+
+    def summary(self):
+        """ the results as a dict"""
+
+        return {
+            'changed': len(self.changed),
+            'settings_changed': sum(len(changes) for changes in self.changed.values()),
+            'unchanged': len(self.unchanged),
+            'errors': len(self.errors),
+            'api_calls': self.api_calls,
+            'applied': self.applied,
+        }
+
+def apply_settings(cf, desired, zones=None, dry_run=False, rate=DEFAULT_RATE, workers=DEFAULT_WORKERS):
+    """ make every zone's settings match desired ({setting: value}) - returns a Rollout
+
+    zones is a list of zones (dicts with id and name, as from cf.zones.get) or zone identifiers;
+    None is every zone. Each zone costs one call to read all its settings and, only if something
+    differs, one PATCH with just the settings that differ. Calls are made workers at a time and no
+    faster than rate a second. With dry_run=True nothing is changed.
+    """
+
+    rollout = Rollout()
+    if zones is None:
+        zones = list(all_pages(cf.zones, per_page=PER_PAGE, workers=workers))
+        rollout.api_calls += max((len(zones) + PER_PAGE - 1) // PER_PAGE, 1)
+    rate_limit = RateLimit(rate)
+    lock = threading.Lock()
+
+    def call(func, *args, **kwargs):
+        """ one API call - when it's allowed"""
+        rate_limit.wait()
+        with lock:
+            rollout.api_calls += 1
+        r = func(*args, **kwargs)
+        if cf._base.raw:
+            return r['result']
+        return r
+
+    def apply_zone(zone):
+        """ one zone - returns its changes"""
+        zone_id = zone['id'] if isinstance(zone, dict) else zone
+        changes = diff(call(cf.zones.settings.get, zone_id), desired)
+        if changes and not dry_run:
+            items = [{'id': setting_id, 'value': new} for setting_id, (_, new) in sorted(changes.items())]
+            call(cf.zones.settings.patch, zone_id, data={'items': items})
+        return changes
+
+    for zone, changes, error in imap_unordered(apply_zone, zones, workers):
+        zone_name = zone.get('name', zone['id']) if isinstance(zone, dict) else zone
+        if error is not None:
+            if not isinstance(error, CloudFlareError):
+                raise error
+            rollout.errors.append((zone_name, error))
+        elif changes:
+            rollout.changed[zone_name] = changes
+        else:
+            rollout.unchanged.append(zone_name)
+    rollout.applied = not dry_run
+    return rollout
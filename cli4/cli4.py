@@ -1,31 +1,58 @@
 #!/usr/bin/env python
 """Cloudflare API via command line"""
 
+import time
+# for --timing
+IMPORT_START = time.time()
+
+import os
 import sys
 import re
 import getopt
 import json
-try:
-    import yaml
-except ImportError:
-    yaml = None
-try:
-    import jsonlines
-except ImportError:
-    jsonlines = None
+import shlex
+import threading
 
 from . import converters
+from .writers import import_yaml, write_results, write_list
 
 import CloudFlare
+from CloudFlare.parallel import imap, imap_unordered, DEFAULT_WORKERS
+from CloudFlare.paging import all_pages as paging_all_pages
+from CloudFlare.timing import Timings
+
+IMPORT_TIME = time.time() - IMPORT_START
+
+# name to identifier lookups are remembered between runs in this file
+CACHE_FILE = '~/.cloudflare/cli4_cache.db'
+
+def use_resolve_cache(cf):
+    """share name lookups between cli4 runs - CF_API_CACHE can move the file or (if empty) disable it"""
+    filename = os.getenv('CF_API_CACHE')
+    if filename is None:
+        filename = os.path.expanduser(CACHE_FILE)
+    if filename == '':
+        return
+    directory = os.path.dirname(filename)
+    if directory and not os.path.isdir(directory):
+        try:
+            os.makedirs(directory, 0o700)
+        except OSError:
+            # no cache; but that's not a problem
+            return
+    cf.resolve.set_store(filename)
 
-def dump_commands():
+def dump_commands(stream=None, timings=None):
     """dump a tree of all the known API commands"""
-    cf = CloudFlare.CloudFlare()
+    if stream is None:
+        stream = sys.stdout
+    cf = CloudFlare.CloudFlare(timings=timings)
     w = cf.api_list()
-    sys.stdout.write('\n'.join(w) + '\n')
+    stream.write('\n'.join(w) + '\n')
 
-def run_command(cf, method, command, params=None, content=None, files=None):
-    """run the command line"""
+def run_command(cf, method, command, params=None, content=None, files=None, parallel=None,
+                all_pages=False, per_page=None):
+    """run the command line - returns an iterator of results (or records if all_pages)"""
     # remove leading and trailing /'s
     if command[0] == '/':
         command = command[1:]
@@ -45,6 +72,15 @@ def run_command(cf, method, command, params=None, content=None, files=None):
     hex_only = re.compile('^[0-9a-fA-F]+$')
     waf_rules = re.compile('^[0-9]+[A-Z]*$')
 
+    # the cached name lookup used for identifier1 (if any)
+    resolved1 = None
+
+    timings = cf._base.timings
+    if timings:
+        # build the api tree now; so it's not counted as name resolution
+        cf._load_api()
+    start = time.time()
+
     m = cf
     for element in parts:
         if element[0] == ':':
@@ -59,20 +95,27 @@ def run_command(cf, method, command, params=None, content=None, files=None):
                 elif cmd[0] == 'certificates':
                     # identifier1 = convert_certificates_to_identifier(cf, element)
                     identifier1 = converters.convert_zones_to_identifier(cf, element)
+                    resolved1 = ('zones', element)
                 elif cmd[0] == 'zones':
                     identifier1 = converters.convert_zones_to_identifier(cf, element)
+                    resolved1 = ('zones', element)
                 elif cmd[0] == 'organizations':
                     identifier1 = converters.convert_organizations_to_identifier(cf, element)
+                    resolved1 = ('organizations', element)
                 elif (cmd[0] == 'user') and (cmd[1] == 'organizations'):
                     identifier1 = converters.convert_organizations_to_identifier(cf, element)
+                    resolved1 = ('organizations', element)
                 elif (cmd[0] == 'user') and (cmd[1] == 'invites'):
                     identifier1 = converters.convert_invites_to_identifier(cf, element)
+                    resolved1 = ('invites', element)
                 elif (cmd[0] == 'user') and (cmd[1] == 'virtual_dns'):
                     identifier1 = converters.convert_virtual_dns_to_identifier(cf, element)
+                    resolved1 = ('virtual_dns', element)
                 elif (cmd[0] == 'user') and (cmd[1] == 'load_balancers') and (cmd[2] == 'pools'):
                     identifier1 = converters.convert_load_balancers_pool_to_identifier(cf, element)
+                    resolved1 = ('load_balancers_pools', element)
                 else:
-                    exit("/%s/%s :NOT CODED YET 1" % ('/'.join(cmd), element))
+                    sys.exit("/%s/%s :NOT CODED YET 1" % ('/'.join(cmd), element))
                 cmd.append(':' + identifier1)
             elif identifier2 is None:
                 if len(element) in [32, 40, 48] and hex_only.match(element):
@@ -86,7 +129,7 @@ def run_command(cf, method, command, params=None, content=None, files=None):
                                                                               identifier1,
                                                                               element)
                 else:
-                    exit("/%s/%s :NOT CODED YET 2" % ('/'.join(cmd), element))
+                    sys.exit("/%s/%s :NOT CODED YET 2" % ('/'.join(cmd), element))
                 # identifier2 may be an array - this needs to be dealt with later
                 if isinstance(identifier2, list):
                     cmd.append(':' + '[' + ','.join(identifier2) + ']')
@@ -100,7 +143,7 @@ def run_command(cf, method, command, params=None, content=None, files=None):
                 elif waf_rules.match(element):
                     identifier3 = element
                 else:
-                    exit("/%s/%s :NOT CODED YET 3" % ('/'.join(cmd), element))
+                    sys.exit("/%s/%s :NOT CODED YET 3" % ('/'.join(cmd), element))
         else:
             try:
                 m = getattr(m, element)
@@ -108,106 +151,341 @@ def run_command(cf, method, command, params=None, content=None, files=None):
             except AttributeError:
                 # the verb/element was not found
                 if len(cmd) == 0:
-                    exit('cli4: /%s - not found' % (element))
+                    sys.exit('cli4: /%s - not found' % (element))
                 else:
-                    exit('cli4: /%s/%s - not found' % ('/'.join(cmd), element))
+                    sys.exit('cli4: /%s/%s - not found' % ('/'.join(cmd), element))
+    if timings:
+        # this includes any API calls made to look up names
+        timings.since('name resolution', start)
 
     if content and params:
-        exit('cli4: /%s - content and params not allowed together' % (command))
+        sys.exit('cli4: /%s - content and params not allowed together' % (command))
     if content:
         params = content
 
-    results = []
     if identifier2 is None:
         identifier2 = [None]
-    for i2 in identifier2:
-        try:
-            if method is 'GET':
-                r = m.get(identifier1=identifier1,
+    elif content and len(identifier2) > 1:
+        # the same content goes to each call; so it can't be streamed from the file
+        params = content = content.read()
+
+    def api_call(i2):
+        """one API call - there's more than one if identifier2 has a list of values"""
+        if method == 'GET':
+            return m.get(identifier1=identifier1,
+                         identifier2=i2,
+                         identifier3=identifier3,
+                         params=params)
+        elif method == 'PATCH':
+            return m.patch(identifier1=identifier1,
+                           identifier2=i2,
+                           identifier3=identifier3,
+                           data=params)
+        elif method == 'POST':
+            return m.post(identifier1=identifier1,
                           identifier2=i2,
                           identifier3=identifier3,
-                          params=params)
-            elif method is 'PATCH':
-                r = m.patch(identifier1=identifier1,
+                          data=params, files=files)
+        elif method == 'PUT':
+            return m.put(identifier1=identifier1,
+                         identifier2=i2,
+                         identifier3=identifier3,
+                         data=params)
+        elif method == 'DELETE':
+            return m.delete(identifier1=identifier1,
                             identifier2=i2,
                             identifier3=identifier3,
                             data=params)
-            elif method is 'POST':
-                r = m.post(identifier1=identifier1,
-                           identifier2=i2,
-                           identifier3=identifier3,
-                           data=params, files=files)
-            elif method is 'PUT':
-                r = m.put(identifier1=identifier1,
-                          identifier2=i2,
-                          identifier3=identifier3,
-                          data=params)
-            elif method is 'DELETE':
-                r = m.delete(identifier1=identifier1,
-                             identifier2=i2,
-                             identifier3=identifier3,
-                             data=params)
+        return None
+
+    def api_records():
+        """walk every page of a list call - each record is yielded as soon as it's returned"""
+        for i2 in identifier2:
+            try:
+                for record in paging_all_pages(m, identifier1, i2, identifier3, params,
+                                               per_page, parallel or 1):
+                    yield record
+            except Exception as e:
+                api_error(cf, command, e, resolved1)
+
+    def api_results():
+        """run the API calls (in parallel) - results are yielded in the same order as identifier2"""
+        workers = parallel
+        if workers is None:
+            # one call needs no threads (concurrent.futures is slow to import)
+            workers = DEFAULT_WORKERS if len(identifier2) > 1 else 1
+        results = imap(api_call, identifier2, workers)
+        while True:
+            try:
+                r = next(results)
+            except StopIteration:
+                break
+            except Exception as e:
+                api_error(cf, command, e, resolved1)
+            yield r
+
+        if method != 'GET':
+            # changes can make cached name lookups wrong
+            if len(cmd) > 2 and cmd[0] == 'zones' and cmd[2] == 'dns_records':
+                cf.resolve.forget('dns_records', identifier1)
+            elif method == 'DELETE' and resolved1 and len(cmd) == 2:
+                cf.resolve.forget(*resolved1)
+
+    if all_pages:
+        return api_records()
+    return api_results()
+
+def until_error(results, errors):
+    """pass results thru until one fails - the sys.exit() is kept in errors; so the output can be finished first"""
+    try:
+        for r in results:
+            yield r
+    except SystemExit as e:
+        errors.append(e)
+
+def api_error(cf, command, e, resolved1=None):
+    """report an API call failure and exit"""
+    try:
+        raise e
+    except CloudFlare.exceptions.CloudFlareAPIError as e:
+        if resolved1:
+            # the cached identifier may be stale - look it up again next time
+            cf.resolve.forget(*resolved1)
+        # more than one error can be returned by the API - they all go in the exit message;
+        # so with --connect they are sent back to the client (not written on the server)
+        lines = ['cli4: /%s - %d %s' % (command, x, x) for x in (e if len(e) > 0 else [])]
+        lines.append('cli4: /%s - %d %s' % (command, e, e))
+        sys.exit('\n'.join(lines))
+    except CloudFlare.exceptions.CloudFlareInternalError as e:
+        sys.exit('cli4: InternalError: /%s - %d %s' % (command, e, e))
+    except Exception as e:
+        sys.exit('cli4: /%s - %s - api error' % (command, e))
+
+def parse_params(method, args):
+    """grab the params from the front of args - returns params, content, files and what's left of args"""
+
+    digits_only = re.compile('^-?[0-9]+$')
+    floats_only = re.compile('^-?[0-9.]+$')
+
+    # These are in the form of tag=value or =value or @filename
+    params = None
+    content = None
+    files = None
+    try:
+        while len(args) > 0 and ('=' in args[0] or args[0][0] == '@'):
+            arg = args.pop(0)
+            if arg[0] == '@':
+                # a file to be uploaded - used in workers/script - only via PUT
+                filename = arg[1:]
+                if method != 'PUT':
+                    sys.exit('cli4: %s - raw file upload only with PUT' % (filename))
+                # only the last file is uploaded
+                close_files(None, content)
+                try:
+                    # the file is streamed as it's uploaded; not read into memory
+                    if filename == '-':
+                        content = getattr(sys.stdin, 'buffer', sys.stdin)
+                    else:
+                        content = open(filename, 'rb')
+                except IOError:
+                    sys.exit('cli4: %s - file open failure' % (filename))
+                continue
+            tag_string, value_string = arg.split('=', 1)
+            if value_string.lower() == 'true':
+                value = True
+            elif value_string.lower() == 'false':
+                value = False
+            elif value_string == '' or value_string.lower() == 'none':
+                value = None
+            elif value_string[0] is '=' and value_string[1:] == '':
+                sys.exit('cli4: %s== - no number value passed' % (tag_string))
+            elif value_string[0] is '=' and digits_only.match(value_string[1:]):
+                value = int(value_string[1:])
+            elif value_string[0] is '=' and floats_only.match(value_string[1:]):
+                value = float(value_string[1:])
+            elif value_string[0] is '=':
+                sys.exit('cli4: %s== - invalid number value passed' % (tag_string))
+            elif value_string[0] in '[{' and value_string[-1] in '}]':
+                # a json structure - used in pagerules
+                try:
+                    #value = json.loads(value) - changed to yaml code to remove unicode string issues
+                    value = import_yaml().safe_load(value_string)
+                except ValueError:
+                    sys.exit('cli4: %s="%s" - can\'t parse json value' % (tag_string, value_string))
+            elif value_string[0] is '@':
+                # a file to be uploaded - used in dns_records/import - only via POST
+                filename = value_string[1:]
+                if method != 'POST':
+                    sys.exit('cli4: %s=%s - file upload only with POST' % (tag_string, filename))
+                # only the last file is uploaded
+                close_files(files)
+                files = {}
+                try:
+                    if filename == '-':
+                        files[tag_string] = sys.stdin
+                    else:
+                        files[tag_string] = open(filename, 'rb')
+                except IOError:
+                    sys.exit('cli4: %s=%s - file open failure' % (tag_string, filename))
+                # no need for param code below
+                continue
             else:
-                pass
-        except CloudFlare.exceptions.CloudFlareAPIError as e:
-            if len(e) > 0:
-                # more than one error returned by the API
-                for x in e:
-                    sys.stderr.write('cli4: /%s - %d %s\n' % (command, x, x))
-            exit('cli4: /%s - %d %s' % (command, e, e))
-        except CloudFlare.exceptions.CloudFlareInternalError as e:
-            exit('cli4: InternalError: /%s - %d %s' % (command, e, e))
-        except Exception as e:
-            exit('cli4: /%s - %s - api error' % (command, e))
+                value = value_string
 
-        results.append(r)
-    return results
+            if tag_string == '':
+                # There's no tag; it's just an unnamed list
+                if params is None:
+                    params = []
+                try:
+                    params.append(value)
+                except AttributeError:
+                    sys.exit('cli4: %s=%s - param error. Can\'t mix unnamed and named list' %
+                         (tag_string, value_string))
+            else:
+                if params is None:
+                    params = {}
+                tag = tag_string
+                try:
+                    params[tag] = value
+                except TypeError:
+                    sys.exit('cli4: %s=%s - param error. Can\'t mix unnamed and named list' %
+                         (tag_string, value_string))
+    except BaseException:
+        # a bad param after a file - the file is not going to be used
+        close_files(files, content)
+        raise
+
+    return params, content, files, args
+
+def close_files(files, content=None):
+    """close the files opened by parse_params() - with --serve and --batch they would otherwise be left open"""
+    for f in list((files or {}).values()) + [content]:
+        if f is not None and f is not sys.stdin and f is not getattr(sys.stdin, 'buffer', None):
+            f.close()
+
+BATCH_METHODS = {
+    'GET': 'GET', '--GET': 'GET', '-G': 'GET',
+    'PATCH': 'PATCH', '--PATCH': 'PATCH', '-P': 'PATCH',
+    'POST': 'POST', '--POST': 'POST', '-O': 'POST',
+    'PUT': 'PUT', '--PUT': 'PUT', '-U': 'PUT',
+    'DELETE': 'DELETE', '--DELETE': 'DELETE', '-D': 'DELETE',
+}
+
+def run_batch_line(cf, line, parallel=None):
+    """run one batch line - [method] [item=value ...] /command - returns the results"""
 
-def write_results(results, output):
-    """dump the results"""
+    words = shlex.split(line)
+    method = 'GET'
+    if words and words[0].upper() in BATCH_METHODS:
+        method = BATCH_METHODS[words.pop(0).upper()]
+
+    # the command is the only word starting with a / - everything else is a param
+    commands = [word for word in words if word[:1] == '/']
+    if len(commands) != 1:
+        sys.exit('cli4: %s - batch line needs one /command' % (line))
+    params, content, files, args = parse_params(method,
+                                                [word for word in words if word[:1] != '/'])
+    if len(args) != 0:
+        sys.exit('cli4: %s - batch line has unknown values %s' % (line, ' '.join(args)))
 
+    try:
+        results = list(run_command(cf, method, commands[0], params, content, files, parallel))
+    finally:
+        close_files(files, content)
     if len(results) == 1:
         results = results[0]
+    return results
 
-    if isinstance(results, str):
-        # if the results are a simple string, then it should be dumped directly
-        # this is only used for /zones/:id/dns_records/export presently
-        pass
-    else:
-        # anything more complex (dict, list, etc) should be dumped as JSON/YAML
-        if output == 'json':
-            try:
-                results = json.dumps(results,
-                                     indent=4,
-                                     sort_keys=True,
-                                     ensure_ascii=False,
-                                     encoding='utf8')
-            except TypeError as e:
-                results = json.dumps(results,
-                                     indent=4,
-                                     sort_keys=True,
-                                     ensure_ascii=False)
-        if output == 'yaml':
-            results = yaml.safe_dump(results)
-        if output == 'ndjson':
-            # NDJSON support seems like a hack. There has to be a better way
-            writer = jsonlines.Writer(sys.stdout)
-            writer.write_all(results)
-            writer.close()
-            return
+def run_batch(cf, filename, output, parallel):
+    """run a file of commands (one per line) thru one CloudFlare instance; writing NDJSON results"""
+
+    try:
+        if filename == '-':
+            f = sys.stdin
+        else:
+            f = open(filename, 'r')
+    except IOError:
+        sys.exit('cli4: %s - file open failure' % (filename))
 
-    sys.stdout.write(results)
-    if not results.endswith('\n'):
-        sys.stdout.write('\n')
+    def batch_lines():
+        """number the lines; skipping blank and comment lines"""
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if line == '' or line[0] == '#':
+                continue
+            yield line_number, line
 
-def do_it(args):
-    """Cloudflare API via command line"""
+    def batch_command(item):
+        """errors are reported via sys.exit() - so catch them and return them with the line"""
+        line_number, line = item
+        try:
+            return {'line': line_number, 'command': line, 'result': run_batch_line(cf, line, parallel)}
+        except SystemExit as e:
+            return {'line': line_number, 'command': line, 'error': str(e.code)}
+        except Exception as e:
+            # i.e. a line that can't be parsed - it fails; the other lines are still run
+            return {'line': line_number, 'command': line, 'error': 'cli4: %s - %s' % (line, e)}
+
+    failed = 0
+    # batch lines are run one at a time unless asked otherwise
+    for (line_number, line), r, e in imap_unordered(batch_command, batch_lines(), parallel or 1):
+        if e is not None:
+            r = {'line': line_number, 'command': line, 'error': 'cli4: %s - %s' % (line, e)}
+        if 'error' in r:
+            failed += 1
+        elif output is None:
+            continue
+        sys.stdout.write(json.dumps(r, ensure_ascii=False) + '\n')
+        sys.stdout.flush()
+
+    if f is not sys.stdin:
+        f.close()
+    if failed > 0:
+        sys.exit('cli4: --batch=%s - %d commands failed' % (filename, failed))
+
+def serve(path, verbose, raw):
+    """keep a CloudFlare instance (and it's connections and name lookups) for --connect commands"""
+
+    from . import server
+
+    cfs = {}
+    lock = threading.Lock()
+
+    def get_cf(raw):
+        """one CloudFlare instance per --raw setting - created on first use"""
+        with lock:
+            if raw not in cfs:
+                cfs[raw] = CloudFlare.CloudFlare(debug=verbose, raw=raw)
+                use_resolve_cache(cfs[raw])
+            return cfs[raw]
+
+    def handler(args, stream):
+        """one cli4 command line"""
+        do_it(args, get_cf, stream)
+
+    server.serve(path, handler)
+
+def do_it(args, get_cf=None, stream=None):
+    """Cloudflare API via command line
+
+    When run by --serve; get_cf() returns the long lived CloudFlare instance and output goes to stream.
+    """
 
     verbose = False
     output = 'json'
     raw = False
     dump = False
     method = 'GET'
+    batch = None
+    parallel = None
+    all_pages = False
+    per_page = None
+    serve_path = None
+    connect_path = None
+    timing = False
+    timings = None
+    profile_file = None
+    profiler = None
 
     usage = ('usage: cli4 '
              + '[-V|--version] [-h|--help] [-v|--verbose] [-q|--quiet] '
@@ -215,26 +493,35 @@ def do_it(args):
              + '[-r|--raw] '
              + '[-d|--dump] '
              + '[--get|--patch|--post|--put|--delete] '
+             + '[--batch=FILE|-] [--parallel=N] '
+             + '[--all-pages] [--per-page=N] '
+             + '[--serve=SOCKET|--connect=SOCKET] '
+             + '[--timing] [--profile=FILE] '
              + '[item=value|item=@filename|@filename ...] '
              + '/command...')
 
+    args_all = list(args)
     try:
         opts, args = getopt.getopt(args,
-                                   'VhvqjyrdGPOUD',
+                                   'VhvqjynrdGPOUD',
                                    [
                                        'version',
                                        'help', 'verbose', 'quiet', 'json', 'yaml', 'ndjson',
                                        'raw',
                                        'dump',
-                                       'get', 'patch', 'post', 'put', 'delete'
+                                       'get', 'patch', 'post', 'put', 'delete',
+                                       'batch=', 'parallel=',
+                                       'all-pages', 'per-page=',
+                                       'serve=', 'connect=',
+                                       'timing', 'profile='
                                    ])
     except getopt.GetoptError:
-        exit(usage)
+        sys.exit(usage)
     for opt, arg in opts:
         if opt in ('-V', '--version'):
-            exit('Cloudflare library version: %s' % (CloudFlare.__version__))
+            sys.exit('Cloudflare library version: %s' % (CloudFlare.__version__))
         if opt in ('-h', '--help'):
-            exit(usage)
+            sys.exit(usage)
         elif opt in ('-v', '--verbose'):
             verbose = True
         elif opt in ('-q', '--quiet'):
@@ -242,12 +529,9 @@ def do_it(args):
         elif opt in ('-j', '--json'):
             output = 'json'
         elif opt in ('-y', '--yaml'):
-            if yaml is None:
-                exit('cli4: install yaml support')
+            import_yaml()
             output = 'yaml'
         elif opt in ('-n', '--ndjson'):
-            if jsonlines is None:
-                exit('cli4: install jsonlines support')
             output = 'ndjson'
         elif opt in ('-r', '--raw'):
             raw = True
@@ -263,107 +547,123 @@ def do_it(args):
             method = 'PUT'
         elif opt in ('-D', '--delete'):
             method = 'DELETE'
+        elif opt == '--batch':
+            batch = arg
+        elif opt == '--parallel':
+            try:
+                parallel = int(arg)
+            except ValueError:
+                sys.exit('cli4: --parallel=%s - must be a number' % (arg))
+        elif opt == '--all-pages':
+            all_pages = True
+        elif opt == '--per-page':
+            try:
+                per_page = int(arg)
+            except ValueError:
+                sys.exit('cli4: --per-page=%s - must be a number' % (arg))
+        elif opt == '--serve':
+            serve_path = arg
+        elif opt == '--connect':
+            connect_path = arg
+        elif opt == '--timing':
+            timing = True
+        elif opt == '--profile':
+            profile_file = arg
 
-    if dump:
-        dump_commands()
-        exit(0)
+    if get_cf:
+        # this command line came from --connect; the server already has a CloudFlare instance
+        if verbose or batch or serve_path or timing or profile_file:
+            sys.exit('cli4: --verbose, --batch, --serve, --timing and --profile not available with --connect')
+    elif connect_path:
+        # the server runs the full command line (the --connect is ignored there)
+        from . import server
+        sys.exit(server.connect(connect_path, args_all))
+    else:
+        def get_cf(raw):
+            """a CloudFlare instance for just this run"""
+            cf = CloudFlare.CloudFlare(debug=verbose, raw=raw, timings=timings)
+            use_resolve_cache(cf)
+            return cf
 
-    digits_only = re.compile('^-?[0-9]+$')
-    floats_only = re.compile('^-?[0-9.]+$')
+    if timing:
+        timings = Timings(IMPORT_START)
+        timings.add('import', IMPORT_TIME)
+    if profile_file:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
 
-    # next grab the params. These are in the form of tag=value or =value or @filename
-    params = None
-    content = None
     files = None
-    while len(args) > 0 and ('=' in args[0] or args[0][0] == '@'):
-        arg = args.pop(0)
-        if arg[0] == '@':
-            # a file to be uploaded - used in workers/script - only via PUT
-            filename = arg[1:]
-            if method != 'PUT':
-                exit('cli4: %s - raw file upload only with PUT' % (filename))
-            try:
-                if filename == '-':
-                    content = sys.stdin.read()
-                else:
-                    with open(filename, 'r') as f:
-                        content = f.read()
-            except IOError:
-                exit('cli4: %s - file open failure' % (filename))
-            continue
-        tag_string, value_string = arg.split('=', 1)
-        if value_string.lower() == 'true':
-            value = True
-        elif value_string.lower() == 'false':
-            value = False
-        elif value_string == '' or value_string.lower() == 'none':
-            value = None
-        elif value_string[0] is '=' and value_string[1:] == '':
-            exit('cli4: %s== - no number value passed' % (tag_string))
-        elif value_string[0] is '=' and digits_only.match(value_string[1:]):
-            value = int(value_string[1:])
-        elif value_string[0] is '=' and floats_only.match(value_string[1:]):
-            value = float(value_string[1:])
-        elif value_string[0] is '=':
-            exit('cli4: %s== - invalid number value passed' % (tag_string))
-        elif value_string[0] in '[{' and value_string[-1] in '}]':
-            # a json structure - used in pagerules
-            try:
-                #value = json.loads(value) - changed to yaml code to remove unicode string issues
-                if yaml is None:
-                    exit('cli4: install yaml support')
-                value = yaml.safe_load(value_string)
-            except ValueError:
-                exit('cli4: %s="%s" - can\'t parse json value' % (tag_string, value_string))
-        elif value_string[0] is '@':
-            # a file to be uploaded - used in dns_records/import - only via POST
-            filename = value_string[1:]
-            if method != 'POST':
-                exit('cli4: %s=%s - file upload only with POST' % (tag_string, filename))
-            files = {}
-            try:
-                if filename == '-':
-                    files[tag_string] = sys.stdin
-                else:
-                    files[tag_string] = open(filename, 'rb')
-            except IOError:
-                exit('cli4: %s=%s - file open failure' % (tag_string, filename))
-            # no need for param code below
-            continue
-        else:
-            value = value_string
+    content = None
+    try:
+        if dump:
+            dump_commands(stream, timings)
+            sys.exit(0)
 
-        if tag_string == '':
-            # There's no tag; it's just an unnamed list
-            if params is None:
-                params = []
-            try:
-                params.append(value)
-            except AttributeError:
-                exit('cli4: %s=%s - param error. Can\'t mix unnamed and named list' %
-                     (tag_string, value_string))
-        else:
-            if params is None:
-                params = {}
-            tag = tag_string
-            try:
-                params[tag] = value
-            except TypeError:
-                exit('cli4: %s=%s - param error. Can\'t mix unnamed and named list' %
-                     (tag_string, value_string))
+        if serve_path:
+            if len(args) != 0:
+                sys.exit(usage)
+            serve(serve_path, verbose, raw)
+            return
+
+        if batch:
+            # the commands come from the batch file; not the command line
+            if len(args) != 0:
+                sys.exit(usage)
+            cf = get_cf(raw)
+            run_batch(cf, batch, output, parallel)
+            return
 
-    # what's left is the command itself
-    if len(args) != 1:
-        exit(usage)
-    command = args[0]
+        # next grab the params. These are in the form of tag=value or =value or @filename
+        params, content, files, args = parse_params(method, args)
+
+        # what's left is the command itself
+        if len(args) != 1:
+            sys.exit(usage)
+        command = args[0]
+
+        cf = get_cf(raw)
+        if all_pages:
+            if method != 'GET':
+                sys.exit('cli4: %s - --all-pages only with GET' % (command))
+            records = run_command(cf, method, command, params, content, files, parallel,
+                                  all_pages, per_page)
+            errors = []
+            records = until_error(records, errors)
+            if timings:
+                # collect everything first; so the output is timed on its own
+                records = list(records)
+            start = time.time()
+            # what arrived before an error is still written as a complete list
+            write_list(records, output, stream)
+            if timings:
+                timings.since('output', start)
+            if errors:
+                raise errors[0]
+            return
 
-    cf = CloudFlare.CloudFlare(debug=verbose, raw=raw)
-    results = run_command(cf, method, command, params, content, files)
-    write_results(results, output)
+        results = run_command(cf, method, command, params, content, files, parallel)
+        errors = []
+        results = until_error(results, errors)
+        if timings:
+            results = list(results)
+        start = time.time()
+        write_results(results, output, stream)
+        if timings:
+            timings.since('output', start)
+        if errors:
+            raise errors[0]
+    finally:
+        close_files(files, content)
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(profile_file)
+        if timings:
+            sys.stderr.write('cli4: timing\n' + '\n'.join(timings.report()) + '\n')
 
 def cli4(args):
     """Cloudflare API via command line"""
 
     do_it(args)
-    exit(0)
+    sys.exit(0)
 
@@ -0,0 +1,173 @@
+"""Cloudflare API via command line - a resident cli4 listening on a Unix socket"""
+from __future__ import absolute_import
+
+import os
+import sys
+import json
+import signal
+import socket
+
+# output is sent back in frames - 'O' output text or 'X' the exit status; each is followed by a
+# length and a newline and then the data
+FRAME_OUTPUT = b'O'
+FRAME_EXIT = b'X'
+# output is buffered up to this size before it's sent
+OUTPUT_BUFFER = 64 * 1024
+
+def _send_frame(wfile, kind, data):
+    """one frame to the client"""
+    wfile.write(kind + str(len(data)).encode('ascii') + b'\n' + data)
+
+def _recv_frame(rfile):
+    """one frame from the server - returns (kind, data) or (None, None) when the server has gone"""
+    header = rfile.readline()
+    if not header:
+        return None, None
+    kind, length = header[0:1], int(header[1:])
+    data = rfile.read(length)
+    if len(data) != length:
+        return None, None
+    return kind, data
+
+class SocketStream(object):
+    """a file-like stream for the cli4 writers that sends output to the client"""
+
+    def __init__(self, wfile):
+        """a file-like stream for the cli4 writers that sends output to the client"""
+        self._wfile = wfile
+        self._buffer = []
+        self._size = 0
+
+    def write(self, s):
+        """buffer some output"""
+        if not isinstance(s, bytes):
+            s = s.encode('utf-8')
+        self._buffer.append(s)
+        self._size += len(s)
+        if self._size >= OUTPUT_BUFFER:
+            self.flush()
+
+    def flush(self):
+        """send the buffered output"""
+        if self._size > 0:
+            _send_frame(self._wfile, FRAME_OUTPUT, b''.join(self._buffer))
+            self._buffer = []
+            self._size = 0
+        self._wfile.flush()
+
+def absolute_args(args):
+    """files named on the command line are opened by the server; so make their paths absolute"""
+    results = []
+    for arg in args:
+        if arg[0:1] == '@' or '=@' in arg:
+            prefix, filename = arg.split('@', 1)
+            if filename == '-':
+                sys.exit('cli4: %s - stdin not available with --connect' % (arg))
+            arg = prefix + '@' + os.path.abspath(filename)
+        results.append(arg)
+    return results
+
+def connect(path, args):
+    """send a cli4 command line to a --serve process - returns the exit status"""
+
+    s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        s.connect(path)
+    except socket.error as e:
+        sys.exit('cli4: --connect=%s - %s' % (path, e))
+
+    rfile = s.makefile('rb')
+    wfile = s.makefile('wb')
+    request = {'args': absolute_args(args)}
+    wfile.write(json.dumps(request).encode('utf-8') + b'\n')
+    wfile.flush()
+
+    try:
+        stdout = sys.stdout.buffer
+    except AttributeError:
+        # python2
+        stdout = sys.stdout
+    while True:
+        kind, data = _recv_frame(rfile)
+        if kind == FRAME_OUTPUT:
+            stdout.write(data)
+            stdout.flush()
+        elif kind == FRAME_EXIT:
+            s.close()
+            return json.loads(data.decode('utf-8'))['exit']
+        else:
+            s.close()
+            return 'cli4: --connect=%s - server closed the connection' % (path)
+
+def serve(path, handler):
+    """run handler(args, stream) for each command line sent to the Unix socket path"""
+
+    try:
+        import socketserver
+    except ImportError:
+        # python2
+        import SocketServer as socketserver
+
+    class Handler(socketserver.StreamRequestHandler):
+        """one cli4 command line"""
+
+        def handle(self):
+            """run the command - anything it writes (and its exit status) is sent back"""
+            line = self.rfile.readline()
+            if not line:
+                return
+            stream = SocketStream(self.wfile)
+            status = 0
+            try:
+                request = json.loads(line.decode('utf-8'))
+                handler(request['args'], stream)
+            except SystemExit as e:
+                status = e.code
+            except Exception as e:
+                status = 'cli4: %s - %s' % (type(e).__name__, e)
+            try:
+                stream.flush()
+                _send_frame(self.wfile, FRAME_EXIT, json.dumps({'exit': status}).encode('utf-8'))
+                self.wfile.flush()
+            except socket.error:
+                # the client went away
+                pass
+
+    class Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        """each connection runs in it's own thread"""
+        daemon_threads = True
+
+    if os.path.exists(path):
+        # only remove the socket if nothing is listening on it
+        s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            s.connect(path)
+        except socket.error:
+            os.remove(path)
+        else:
+            sys.exit('cli4: --serve=%s - already running' % (path))
+        finally:
+            s.close()
+
+    # the server holds credentials - so only the owner can connect
+    old_umask = os.umask(0o077)
+    try:
+        server = Server(path, Handler)
+    except socket.error as e:
+        sys.exit('cli4: --serve=%s - %s' % (path, e))
+    finally:
+        os.umask(old_umask)
+
+    # a kill (i.e. from a service manager) should still remove the socket
+    try:
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    except ValueError:
+        # not the main thread
+        pass
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.remove(path)
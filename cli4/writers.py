@@ -0,0 +1,154 @@
+"""Cloudflare API via command line"""
+from __future__ import absolute_import
+
+import sys
+import json
+import itertools
+
+# iterencode() produces many small pieces; write them out in larger chunks
+JSON_CHUNK = 1024
+# list elements are encoded this many at a time
+JSON_BATCH = 100
+
+def import_yaml():
+    """yaml is slow to import; so it's only imported when it's used"""
+    try:
+        import yaml
+    except ImportError:
+        sys.exit('cli4: install yaml support')
+    return yaml
+
+def yaml_dumper(yaml):
+    """the libyaml C based dumper is much faster - if it's installed"""
+    try:
+        return yaml.CSafeDumper
+    except AttributeError:
+        return yaml.SafeDumper
+
+# JSON output is human readable; NDJSON output is the same as the jsonlines package produces
+json_encoder = json.JSONEncoder(indent=4, sort_keys=True, ensure_ascii=False)
+ndjson_encoder = json.JSONEncoder(ensure_ascii=False)
+
+def json_dumps(results):
+    """JSON output is human readable"""
+    return json_encoder.encode(results)
+
+def write_json(results, stream, indent=''):
+    """write JSON as it's encoded - the full string is never built"""
+    chunk = []
+    for s in json_encoder.iterencode(results):
+        chunk.append(s)
+        if len(chunk) >= JSON_CHUNK:
+            stream.write(''.join(chunk).replace('\n', '\n' + indent))
+            chunk = []
+    stream.write(''.join(chunk).replace('\n', '\n' + indent))
+
+def write_json_list(results, stream, flush):
+    """write a JSON list a few elements at a time"""
+    count = 0
+    stream.write('[')
+    # results that are already in memory are encoded in batches (which is quicker);
+    # results that are still arriving are written one element at a time
+    batch_size = 1 if flush else JSON_BATCH
+    results = iter(results)
+    while True:
+        batch = list(itertools.islice(results, batch_size))
+        if len(batch) == 0:
+            break
+        if count > 0:
+            stream.write(',')
+        # encoding a list indents the elements exactly as needed; just drop the brackets
+        stream.write(json_encoder.encode(batch)[1:-2])
+        if flush:
+            stream.flush()
+        count += len(batch)
+    if count > 0:
+        stream.write('\n')
+    stream.write(']\n')
+
+def write_yaml_list(results, stream, flush):
+    """write a YAML list one element at a time"""
+    yaml = import_yaml()
+    dumper = yaml_dumper(yaml)
+    count = 0
+    for r in results:
+        yaml.dump([r], stream, Dumper=dumper)
+        if flush:
+            stream.flush()
+        count += 1
+    if count == 0:
+        stream.write('[]\n')
+
+def write_ndjson_list(results, stream, flush):
+    """write one line per element"""
+    for r in results:
+        stream.write(ndjson_encoder.encode(r) + '\n')
+        if flush:
+            stream.flush()
+
+def write_list(results, output, stream=None, flush=True):
+    """dump a list of results - one element at a time
+
+    results can be a generator; in which case each element is flushed as soon as it arrives.
+    """
+
+    if stream is None:
+        stream = sys.stdout
+
+    if output == 'json':
+        write_json_list(results, stream, flush)
+    elif output == 'yaml':
+        write_yaml_list(results, stream, flush)
+    elif output == 'ndjson':
+        write_ndjson_list(results, stream, flush)
+    else:
+        # quiet - but the API calls still need to be made
+        for r in results:
+            pass
+
+def write_result(results, output, stream=None):
+    """dump one result"""
+
+    if output is None:
+        return
+
+    if stream is None:
+        stream = sys.stdout
+
+    if isinstance(results, str):
+        # if the results are a simple string, then it should be dumped directly
+        # this is only used for /zones/:id/dns_records/export presently
+        stream.write(results)
+        if not results.endswith('\n'):
+            stream.write('\n')
+    elif isinstance(results, list):
+        # lists can be very large (dns_records, logs/received, etc) - so write one element at a time
+        write_list(results, output, stream, flush=False)
+    elif output == 'json':
+        write_json(results, stream)
+        stream.write('\n')
+    elif output == 'yaml':
+        yaml = import_yaml()
+        yaml.dump(results, stream, Dumper=yaml_dumper(yaml))
+    elif output == 'ndjson':
+        stream.write(ndjson_encoder.encode(results) + '\n')
+    stream.flush()
+
+def write_results(results, output, stream=None):
+    """dump the results - results are written as they arrive"""
+
+    results = iter(results)
+    try:
+        first = next(results)
+    except StopIteration:
+        # nothing to write - i.e. the first call failed
+        return
+    try:
+        second = next(results)
+    except StopIteration:
+        # just one result; which is the majority of commands
+        write_result(first, output, stream)
+        return
+
+    # more than one result; these are written as a list; one element at a time
+    write_list(itertools.chain([first, second], results), output, stream)
@@ -0,0 +1,40 @@
+#!/usr/bin/env python
+"""Cloudflare API code - example"""
+
+from __future__ import print_function
+
+import os
+import sys
+sys.path.insert(0, os.path.abspath('..'))
+
+import CloudFlare
+from CloudFlare.zone_export import export_zones
+
+def main():
+    """Cloudflare API code - example"""
+
+    try:
+        directory = sys.argv[1]
+    except IndexError:
+        exit('usage: example_dns_export_archive.py directory')
+
+    cf = CloudFlare.CloudFlare()
+
+    # every zone is exported; but only if it's changed since the last run
+    try:
+        e = export_zones(cf, directory)
+    except CloudFlare.exceptions.CloudFlareAPIError as e:
+        exit('/zones %d %s - api call failed' % (e, e))
+
+    for zone_name in e.exported:
+        print('EXPORTED: %s' % (zone_name))
+    for zone_name in e.removed:
+        print('REMOVED: %s' % (zone_name))
+    for zone_name, error in e.errors:
+        print('FAILED: %s - %d %s' % (zone_name, error, error), file=sys.stderr)
+    print(e.summary())
+
+    exit(0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+"""Cloudflare API code - example"""
+
+from __future__ import print_function
+
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath('..'))
+import CloudFlare
+from CloudFlare import dns_sync
+
+def main():
+    """Cloudflare API code - example"""
+
+    dry_run = False
+    if len(sys.argv) > 1 and sys.argv[1] == '--dry-run':
+        dry_run = True
+        del sys.argv[1]
+    try:
+        zone_name = sys.argv[1]
+        filename = sys.argv[2]
+    except IndexError:
+        exit('usage: [--dry-run] zone-name records-file (BIND, .yaml or .json)')
+
+    cf = CloudFlare.CloudFlare()
+
+    zone_id = cf.resolve.zone(zone_name)
+    if zone_id is None:
+        exit('%s - zone not found' % (zone_name))
+
+    try:
+        records = dns_sync.load_records(filename, zone_name)
+    except (IOError, ValueError) as e:
+        exit('%s - %s' % (filename, e))
+
+    try:
+        plan = dns_sync.sync(cf, zone_id, records, zone_name=zone_name, dry_run=dry_run)
+    except CloudFlare.exceptions.CloudFlareAPIError as e:
+        exit('/zones/dns_records %s - %d %s' % (zone_name, e, e))
+
+    for dns_record in plan.deletes:
+        print('delete\t%s %s %s' % (dns_record['type'], dns_record['name'], dns_record['content']))
+    for dns_record, new_dns_record in plan.updates:
+        print('update\t%s %s %s -> %s' % (dns_record['type'], dns_record['name'], dns_record['content'],
+                                          new_dns_record['content']))
+    for dns_record in plan.creates:
+        print('create\t%s %s %s' % (dns_record['type'], dns_record['name'], dns_record['content']))
+    for action, dns_record, e in plan.errors:
+        print('error\t%s %s %s - %d %s' % (action, dns_record.get('type'), dns_record.get('name'), e, e))
+
+    print('%(create)d created, %(update)d updated, %(delete)d deleted, %(unchanged)d unchanged; '
+          '%(api_calls)d api calls (%(api_calls_saved)d saved)' % plan.summary())
+    exit(0)
+
+if __name__ == '__main__':
+    main()
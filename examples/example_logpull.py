@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+"""Cloudflare API code - example"""
+
+from __future__ import print_function
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath('..'))
+import CloudFlare
+from CloudFlare import logpull
+
+def main():
+    """Cloudflare API code - example"""
+
+    try:
+        zone_name = sys.argv[1]
+        minutes = int(sys.argv[2])
+        directory = sys.argv[3]
+    except (IndexError, ValueError):
+        exit('usage: example_logpull.py zone minutes directory [field,field,...]')
+    fields = sys.argv[4] if len(sys.argv) > 4 else None
+
+    cf = CloudFlare.CloudFlare()
+    zone_id = cf.resolve.zone(zone_name)
+    if zone_id is None:
+        exit('/zones.get - %s - zone not found' % (zone_name))
+
+    # logs are only available once they're at least a minute old
+    end = int(time.time()) // 60 * 60 - 60
+    start = end - minutes * 60
+
+    # run it again with the same arguments (after a failure) and only what's missing is fetched
+    p = logpull.pull(cf, zone_id, start, end, directory, fields=fields)
+    for (window_start, window_end), e in p.errors:
+        print('FAILED: %d-%d - %s' % (window_start, window_end, e), file=sys.stderr)
+    for filename in p.files:
+        print(filename)
+    print(p.summary())
+
+    exit(0)
+
+if __name__ == '__main__':
+    main()
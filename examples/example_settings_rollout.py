@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+"""Cloudflare API code - example"""
+
+from __future__ import print_function
+
+import os
+import sys
+import json
+
+sys.path.insert(0, os.path.abspath('..'))
+import CloudFlare
+from CloudFlare.zone_settings import apply_settings
+
+def main():
+    """Cloudflare API code - example"""
+
+    usage = 'usage: example_settings_rollout.py [--dry-run] setting=value [setting=value ...]'
+    args = sys.argv[1:]
+    dry_run = False
+    if args and args[0] == '--dry-run':
+        dry_run = True
+        args = args[1:]
+    if len(args) == 0:
+        exit(usage)
+
+    desired = {}
+    for arg in args:
+        try:
+            setting, value = arg.split('=', 1)
+        except ValueError:
+            exit(usage)
+        try:
+            # i.e. 10 or {"css":"on"}
+            desired[setting] = json.loads(value)
+        except ValueError:
+            desired[setting] = value
+
+    cf = CloudFlare.CloudFlare()
+
+    # every zone - with one call to read its settings and a PATCH only if something differs
+    try:
+        rollout = apply_settings(cf, desired, dry_run=dry_run)
+    except CloudFlare.exceptions.CloudFlareAPIError as e:
+        exit('/zones %d %s - api call failed' % (e, e))
+
+    for zone_name, changes in sorted(rollout.changed.items()):
+        for setting, (old, new) in sorted(changes.items()):
+            print('%s: %s %s -> %s' % (zone_name, setting, json.dumps(old), json.dumps(new)))
+    for zone_name, error in rollout.errors:
+        print('FAILED: %s - %d %s' % (zone_name, error, error), file=sys.stderr)
+    print(rollout.summary())
+
+    exit(0)
+
+if __name__ == '__main__':
+    main()
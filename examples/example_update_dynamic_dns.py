@@ -5,12 +5,13 @@ from __future__ import print_function
 
 import os
 import sys
-import re
-import json
+import time
+import getopt
 import requests
 
 sys.path.insert(0, os.path.abspath('..'))
 import CloudFlare
+from CloudFlare.ddns import Updater
 
 def my_ip_address():
     """Cloudflare API code - example"""
@@ -21,119 +22,57 @@ def my_ip_address():
     # url = 'http://myexternalip.com/raw'
     url = 'https://api.ipify.org'
     try:
-        ip_address = requests.get(url).text
+        ip_address = requests.get(url).text.strip()
     except:
-        exit('%s: failed' % (url))
+        return None
     if ip_address == '':
-        exit('%s: failed' % (url))
-
-    if ':' in ip_address:
-        ip_address_type = 'AAAA'
-    else:
-        ip_address_type = 'A'
-
-    return ip_address, ip_address_type
-
-def do_dns_update(cf, zone_name, zone_id, dns_name, ip_address, ip_address_type):
-    """Cloudflare API code - example"""
-
-    try:
-        params = {'name':dns_name, 'match':'all', 'type':ip_address_type}
-        dns_records = cf.zones.dns_records.get(zone_id, params=params)
-    except CloudFlare.exceptions.CloudFlareAPIError as e:
-        exit('/zones/dns_records %s - %d %s - api call failed' % (dns_name, e, e))
-
-    updated = False
-
-    # update the record - unless it's already correct
-    for dns_record in dns_records:
-        old_ip_address = dns_record['content']
-        old_ip_address_type = dns_record['type']
-
-        if ip_address_type not in ['A', 'AAAA']:
-            # we only deal with A / AAAA records
-            continue
-
-        if ip_address_type != old_ip_address_type:
-            # only update the correct address type (A or AAAA)
-            # we don't see this becuase of the search params above
-            print('IGNORED: %s %s ; wrong address family' % (dns_name, old_ip_address))
-            continue
-
-        if ip_address == old_ip_address:
-            print('UNCHANGED: %s %s' % (dns_name, ip_address))
-            updated = True
-            continue
-
-        # Yes, we need to update this record - we know it's the same address type
-
-        dns_record_id = dns_record['id']
-        dns_record = {
-            'name':dns_name,
-            'type':ip_address_type,
-            'content':ip_address
-        }
-        try:
-            dns_record = cf.zones.dns_records.put(zone_id, dns_record_id, data=dns_record)
-        except CloudFlare.exceptions.CloudFlareAPIError as e:
-            exit('/zones.dns_records.put %s - %d %s - api call failed' % (dns_name, e, e))
-        print('UPDATED: %s %s -> %s' % (dns_name, old_ip_address, ip_address))
-        updated = True
-
-    if updated:
-        return
-
-    # no exsiting dns record to update - so create dns record
-    dns_record = {
-        'name':dns_name,
-        'type':ip_address_type,
-        'content':ip_address
-    }
-    try:
-        dns_record = cf.zones.dns_records.post(zone_id, data=dns_record)
-    except CloudFlare.exceptions.CloudFlareAPIError as e:
-        exit('/zones.dns_records.post %s - %d %s - api call failed' % (dns_name, e, e))
-    print('CREATED: %s %s' % (dns_name, ip_address))
+        return None
+    return ip_address
 
 def main():
     """Cloudflare API code - example"""
 
+    usage = 'usage: example-update-dynamic-dns.py [--interval=seconds] [--state=file] fqdn-hostname [fqdn-hostname ...]'
     try:
-        dns_name = sys.argv[1]
-    except IndexError:
-        exit('usage: example-update-dynamic-dns.py fqdn-hostname')
-
-    host_name, zone_name = '.'.join(dns_name.split('.')[:2]), '.'.join(dns_name.split('.')[-2:])
-
-    ip_address, ip_address_type = my_ip_address()
-
-    print('MY IP: %s %s' % (dns_name, ip_address))
+        opts, dns_names = getopt.getopt(sys.argv[1:], '', ['interval=', 'state='])
+    except getopt.GetoptError:
+        exit(usage)
+    interval = None
+    state = None
+    for opt, arg in opts:
+        if opt == '--interval':
+            interval = int(arg)
+        elif opt == '--state':
+            state = arg
+    if len(dns_names) == 0:
+        exit(usage)
 
     cf = CloudFlare.CloudFlare()
 
-    # grab the zone identifier
-    try:
-        params = {'name':zone_name}
-        zones = cf.zones.get(params=params)
-    except CloudFlare.exceptions.CloudFlareAPIError as e:
-        exit('/zones %d %s - api call failed' % (e, e))
-    except Exception as e:
-        exit('/zones.get - %s - api call failed' % (e))
-
-    if len(zones) == 0:
-        exit('/zones.get - %s - zone not found' % (zone_name))
-
-    if len(zones) != 1:
-        exit('/zones.get - %s - api call returned %d items' % (zone_name, len(zones)))
-
-    zone = zones[0]
-
-    zone_name = zone['name']
-    zone_id = zone['id']
-
-    do_dns_update(cf, zone_name, zone_id, dns_name, ip_address, ip_address_type)
+    # the zone and record identifiers (and the last address written) are remembered between
+    # runs in the state file; so most runs make no API calls at all
+    updater = Updater(cf, state=state)
+    for dns_name in dns_names:
+        updater.add(dns_name)
+
+    while True:
+        ip_address = my_ip_address()
+        if ip_address is None:
+            print('MY IP: failed', file=sys.stderr)
+        else:
+            print('MY IP: %s' % (ip_address))
+            for dns_name, ip_address_type, action, old, new in updater.update(ip_address):
+                if action == 'failed':
+                    print('FAILED: %s %s - %s' % (dns_name, ip_address_type, new), file=sys.stderr)
+                elif action == 'updated':
+                    print('UPDATED: %s %s -> %s' % (dns_name, old, new))
+                else:
+                    print('%s: %s %s' % (action.upper(), dns_name, new))
+            print('API CALLS: %d' % (updater.api_calls))
+        if interval is None:
+            break
+        time.sleep(interval)
     exit(0)
 
 if __name__ == '__main__':
     main()
-
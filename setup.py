@@ -32,7 +32,8 @@ def main():
         #package_data={'cloudflare-examples': ["examples/*"]},
         include_package_data=True,
         #data_files = [('man/man1', ['cli4/cli4.man'])],
-        install_requires=['requests', 'future', 'pyyaml', 'jsonlines'],
+        install_requires=['requests', 'future', 'pyyaml', 'futures; python_version < "3.2"'],
+        extras_require={'arrow': ['pyarrow']},
         keywords='cloudflare',
         entry_points={
             'console_scripts': [
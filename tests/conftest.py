@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+"""a fake API tree for the tests - cf.zones.dns_records etc are made as they are used"""
+
+import pytest
+
+class FakeBase(object):
+    def __init__(self, raw=False):
+        self.raw = raw
+        self.timings = None
+        self.base_url = 'https://api.example.com/client/v4'
+        self.email = 'user@example.com'
+        self.token = '00000000000000000000000000000000'
+        self.certtoken = None
+        self.bearer = None
+
+class FakeEndpoint(object):
+    """one API endpoint - set _records ({identifiers: [record, ...]}), _handlers ({method: func})
+    or _errors ({identifiers: exception}); every call is kept in _calls
+
+    API names are made on first use; so only names starting with _ are the fake's own.
+    """
+
+    def __init__(self, path=''):
+        self._path = path
+        self._records = {}
+        self._handlers = {}
+        self._errors = {}
+        self._per_page = None
+        self._calls = []
+
+    def __getattr__(self, name):
+        if name[0] == '_':
+            raise AttributeError(name)
+        endpoint = FakeEndpoint(self._path + '/' + name)
+        setattr(self, name, endpoint)
+        return endpoint
+
+    def _call(self, method, args, kwargs, default):
+        """record the call - then raise its error, run its handler or return the default"""
+        identifiers = list(args)
+        for n in range(len(identifiers), 3):
+            identifiers.append(kwargs.pop('identifier%d' % (n + 1), None))
+        while identifiers and identifiers[-1] is None:
+            identifiers.pop()
+        identifiers = tuple(identifiers)
+        self._calls.append((method, identifiers, kwargs.get('params', kwargs.get('data'))))
+        if identifiers in self._errors:
+            raise self._errors[identifiers]
+        if method in self._handlers:
+            return self._handlers[method](*identifiers, **kwargs)
+        return default(identifiers, **kwargs)
+
+    def _calls_of(self, method):
+        """the identifiers and params (or data) of each call of one method"""
+        return [(identifiers, value) for m, identifiers, value in self._calls if m == method]
+
+    def __call__(self, *args, **kwargs):
+        # a method that isn't an API call - i.e. cf.resolve.zone(name)
+        return self._call('call', args, kwargs, lambda identifiers, **kwargs: None)
+
+    def get(self, *args, **kwargs):
+        return self._call('get', args, kwargs, lambda identifiers, **kwargs: list(self._records.get(identifiers, [])))
+
+    def _get_raw(self, *args, **kwargs):
+        if len(args) > 3:
+            args, kwargs['params'] = args[:3], args[3]
+        return self._call('_get_raw', args, kwargs, self._page)
+
+    def _page(self, identifiers, params=None, **kwargs):
+        """one page of the records - by page and per_page; or all of them"""
+        records = self._records.get(identifiers, [])
+        per_page = self._per_page or (params or {}).get('per_page') or max(len(records), 1)
+        page = int((params or {}).get('page', 1))
+        return {'result': records[(page - 1) * per_page:page * per_page],
+                'result_info': {'page': page, 'per_page': per_page,
+                                'total_pages': max((len(records) + per_page - 1) // per_page, 1)}}
+
+    def _get_stream(self, *args, **kwargs):
+        return self._call('_get_stream', args, kwargs,
+                          lambda identifiers, **kwargs: iter(self._records.get(identifiers, [])))
+
+    def post(self, *args, **kwargs):
+        return self._call('post', args, kwargs, lambda identifiers, data=None, **kwargs: data)
+
+    def put(self, *args, **kwargs):
+        return self._call('put', args, kwargs, lambda identifiers, data=None, **kwargs: data)
+
+    def patch(self, *args, **kwargs):
+        return self._call('patch', args, kwargs, lambda identifiers, data=None, **kwargs: data)
+
+    def delete(self, *args, **kwargs):
+        return self._call('delete', args, kwargs, lambda identifiers, **kwargs: {'id': identifiers[-1]})
+
+class FakeCloudFlare(FakeEndpoint):
+    """the top of the tree - like CloudFlare.CloudFlare()"""
+
+    def __init__(self, raw=False):
+        FakeEndpoint.__init__(self)
+        self._base = FakeBase(raw)
+
+@pytest.fixture
+def cf():
+    """a new fake API tree"""
+    return FakeCloudFlare()
@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+
+import os
+import sys
+sys.path.insert(0, os.path.abspath('..'))
+from CloudFlare import access_rules
+
+import pytest
+
+def rule(rule_id, value, mode='block', notes='abuse', scope='zone'):
+    rule_target, value = access_rules.target(value)
+    return {'id': rule_id, 'mode': mode, 'notes': notes, 'scope': {'type': scope},
+            'configuration': {'target': rule_target, 'value': value}}
+
+def test_target():
+    assert access_rules.target('192.0.2.1') == ('ip', '192.0.2.1')
+    assert access_rules.target('2001:DB8::1') == ('ip6', '2001:db8::1')
+    assert access_rules.target('192.0.2.0/24') == ('ip_range', '192.0.2.0/24')
+    assert access_rules.target(13335) == ('asn', 'AS13335')
+    assert access_rules.target('as13335') == ('asn', 'AS13335')
+    assert access_rules.target('gb') == ('country', 'GB')
+    assert access_rules.target({'target': 'ip', 'value': '192.0.2.1'}) == ('ip', '192.0.2.1')
+
+def test_sync(cf):
+    rules = cf.zones.firewall.access_rules.rules
+    rules._records[('z',)] = [rule('1', '192.0.2.1'), rule('2', '192.0.2.2'), rule('3', 'GB', notes='by hand'),
+                              rule('4', '192.0.2.3', mode='whitelist'), rule('5', '192.0.2.4', scope='user')]
+    p = access_rules.sync(cf, ['192.0.2.1', '192.0.2.1', '192.0.2.3', 'AS64496'], zone_id='z', notes='abuse',
+                          rate=None, workers=1)
+    assert p.summary()['unchanged'] == 1
+    assert p.adds == [('asn', 'AS64496')]
+    assert [r['id'] for r in p.conflicts] == ['4']
+    # rules made by hand and rules from the user aren't removed
+    assert rules._calls_of('delete') == [(('z', '2'), None)]
+    assert rules._calls_of('post') == [(('z',), {'mode': 'block', 'notes': 'abuse',
+                                                 'configuration': {'target': 'asn', 'value': 'AS64496'}})]
+    assert p.api_calls == 3
+
+def test_unknown_mode(cf):
+    with pytest.raises(access_rules.CloudFlareAPIError):
+        access_rules.plan(cf, ['192.0.2.1'], mode='nope', zone_id='z')
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+
+import os
+import sys
+sys.path.insert(0, os.path.abspath('..'))
+from CloudFlare import analytics
+
+import pytest
+
+DAY = 86400
+
+def dashboard(zone_id, params=None):
+    return {'totals': {'requests': {'all': 2}, 'since': params['since'], 'until': params['until']},
+            'timeseries': [{'since': params['since'], 'until': params['until'], 'requests': {'all': 2}}]}
+
+@pytest.fixture
+def cf(cf):
+    """ two requests in every chunk"""
+    cf.zones.analytics.dashboard._handlers['get'] = dashboard
+    return cf
+
+def test_chunks():
+    assert analytics.chunks(DAY + 10, 3 * DAY + 5) == [(DAY + 10, 2 * DAY), (2 * DAY, 3 * DAY), (3 * DAY, 3 * DAY + 5)]
+    assert analytics.chunks(DAY + 10, DAY + 20) == [(DAY + 10, DAY + 20)]
+    assert analytics.chunks(DAY, DAY) == []
+    assert analytics.iso(DAY) == '1970-01-02T00:00:00Z'
+
+def test_fetch_cached(cf, tmpdir, monkeypatch):
+    monkeypatch.setattr(analytics.time, 'time', lambda: 100 * DAY + DAY / 2)
+    since = 90 * DAY
+    r = analytics.fetch(cf, 'dashboard', 'z', since, cache=str(tmpdir), rate=None, workers=3)
+    assert r.summary() == {'chunks': 11, 'api_calls': 11, 'cached': 0}
+    assert r.result['totals']['requests']['all'] == 22
+    assert [t['since'] for t in r.result['timeseries']] == sorted(t['since'] for t in r.result['timeseries'])
+    assert r.result['totals']['since'] == analytics.iso(since)
+    assert cf.zones.analytics.dashboard._calls_of('get')[0][1]['continuous'] == 'false'
+    # only the newest chunk isn't settled
+    r = analytics.fetch(cf, 'dashboard', 'z', since, cache=str(tmpdir), rate=None)
+    assert r.summary() == {'chunks': 11, 'api_calls': 1, 'cached': 10}
+
+def test_fetch_not_aligned(cf, monkeypatch):
+    monkeypatch.setattr(analytics.time, 'time', lambda: 100 * DAY)
+    since = 90 * DAY + 3600
+    r = analytics.fetch(cf, 'dashboard', 'z', since, 92 * DAY + 60, rate=None)
+    assert r.summary() == {'chunks': 3, 'api_calls': 3, 'cached': 0}
+    # nothing from outside since to until is fetched
+    assert r.result['totals']['since'] == analytics.iso(since)
+    assert r.result['totals']['until'] == analytics.iso(92 * DAY + 60)
+    calls = cf.zones.analytics.dashboard._calls_of('get')
+    assert sorted(params['since'] for _, params in calls)[0] == analytics.iso(since)
+
+def test_merge_dns():
+    def chunk(since, rows):
+        return {'data': [{'dimensions': [d], 'metrics': [[n, n]]} for d, n in rows],
+                'time_intervals': [[since, 1], [since, 2]], 'query': {'metrics': ['queryCount'], 'since': since},
+                'totals': {'queryCount': 2 * sum(n for _, n in rows)}, 'max': {'queryCount': max(n for _, n in rows)}}
+    result = analytics._merge_dns([chunk('a', [('A', 1)]), chunk('b', [('A', 2), ('AAAA', 3)])])
+    assert result['rows'] == 2
+    assert result['data'][0]['metrics'] == [[1, 1, 2, 2]]
+    assert result['data'][1]['metrics'] == [[0, 0, 3, 3]]
+    assert result['totals'] == {'queryCount': 12}
+    assert result['max'] == {'queryCount': 3}
+    assert result['query']['since'] == 'a'
+
+def test_unknown_endpoint(cf):
+    with pytest.raises(analytics.CloudFlareAPIError):
+        analytics.fetch(cf, 'nope', 'z', 0, DAY)
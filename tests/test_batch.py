@@ -0,0 +1,25 @@
+#!/usr/bin/env python
+
+import os
+import sys
+import json
+sys.path.insert(0, os.path.abspath('..'))
+from cli4 import cli4
+
+import pytest
+
+def test_malformed_lines(cf, tmp_path, capsys):
+    filename = str(tmp_path / 'batch.txt')
+    with open(filename, 'w') as f:
+        f.write('GET /zones "unbalanced\n')
+        f.write('GET /zones a=[}\n')
+        f.write('GET /zones ""\n')
+        f.write('GET /zones\n')
+    cf.zones._records[()] = [{'id': 'z1', 'name': 'example.com'}]
+    with pytest.raises(SystemExit) as e:
+        cli4.run_batch(cf, filename, 'json', None)
+    assert str(e.value.code) == 'cli4: --batch=%s - 3 commands failed' % (filename)
+    records = [json.loads(l) for l in capsys.readouterr().out.splitlines()]
+    assert [r['line'] for r in records] == [1, 2, 3, 4]
+    assert all('error' in r for r in records[:3])
+    assert records[3]['result'] == [{'id': 'z1', 'name': 'example.com'}]
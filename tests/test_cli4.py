@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+
+import os
+import sys
+import io
+import json
+import time
+import threading
+sys.path.insert(0, os.path.abspath('..'))
+from cli4 import cli4
+from CloudFlare.exceptions import CloudFlareAPIError
+
+import pytest
+
+ZONE_ID = '023e105f4ecef8ad9ca31a8372d0c353'
+RECORD_IDS = ['%032x' % i for i in range(6)]
+
+def get(zone_id, record_id, params=None):
+    # later records come back first
+    time.sleep(0.01 * (len(RECORD_IDS) - RECORD_IDS.index(record_id)))
+    return {'id': record_id}
+
+@pytest.fixture
+def cf(cf):
+    """ example.com has six records called www.example.com"""
+    cf.resolve.zone._handlers['call'] = lambda name: ZONE_ID
+    cf.resolve.dns_records._handlers['call'] = lambda zone_id, name: RECORD_IDS
+    cf.zones.dns_records._handlers['get'] = get
+    return cf
+
+def run(cf, args):
+    stream = io.StringIO()
+    try:
+        cli4.do_it(args, get_cf=lambda raw: cf, stream=stream)
+        code = None
+    except SystemExit as e:
+        code = e.code
+    return stream.getvalue(), code
+
+def test_results_in_order(cf):
+    output, code = run(cf, ['--parallel=6', '/zones/:example.com/dns_records/:www.example.com'])
+    assert code is None
+    assert json.loads(output) == [{'id': i} for i in RECORD_IDS]
+
+def test_error_part_way(cf):
+    cf.zones.dns_records._errors[(ZONE_ID, RECORD_IDS[3])] = CloudFlareAPIError(81044, 'Record does not exist.')
+    output, code = run(cf, ['--parallel=6', '/zones/:example.com/dns_records/:www.example.com'])
+    assert code == 'cli4: /zones/:example.com/dns_records/:www.example.com - 81044 Record does not exist.'
+    # what came before the error is still a complete list
+    assert json.loads(output) == [{'id': i} for i in RECORD_IDS[:3]]
+
+def test_error_first(cf):
+    cf.zones.dns_records._errors[(ZONE_ID, RECORD_IDS[0])] = CloudFlareAPIError(81044, 'Record does not exist.')
+    output, code = run(cf, ['/zones/:example.com/dns_records/:www.example.com'])
+    assert code.endswith('81044 Record does not exist.')
+    assert output == ''
+
+def test_one_call_no_threads(cf):
+    threads = []
+    def get(zone_id, record_id, params=None):
+        threads.append(threading.current_thread())
+        return {'id': record_id}
+    cf.zones.dns_records._handlers['get'] = get
+    output, code = run(cf, ['/zones/:example.com/dns_records/:' + RECORD_IDS[0]])
+    assert json.loads(output) == {'id': RECORD_IDS[0]}
+    assert threads == [threading.current_thread()]
+
+def test_files_closed(cf, tmp_path):
+    filename = str(tmp_path / 'zone.txt')
+    with open(filename, 'w') as f:
+        f.write('www.example.com. 300 IN A 10.0.0.1\n')
+    sent = []
+    def post(zone_id, data=None, files=None):
+        sent.append(files)
+        return {'recs_added': 1}
+    cf.zones.dns_records._handlers['post'] = post
+    output, code = run(cf, ['--post', 'file=@' + filename, '/zones/:example.com/dns_records'])
+    assert json.loads(output) == {'recs_added': 1}
+    assert sent[0]['file'].closed
+
+def test_content_closed(cf, tmp_path):
+    filename = str(tmp_path / 'record.json')
+    with open(filename, 'w') as f:
+        f.write('{"type": "A"}')
+    cf.zones.dns_records._handlers['put'] = lambda zone_id, record_id, data=None: {'id': record_id}
+    output, code = run(cf, ['--put', '@' + filename, '/zones/:example.com/dns_records/:' + RECORD_IDS[0]])
+    assert json.loads(output) == {'id': RECORD_IDS[0]}
+    assert cf.zones.dns_records._calls_of('put')[0][1].closed
+
+def test_files_closed_bad_param(tmp_path, monkeypatch):
+    filename = str(tmp_path / 'zone.txt')
+    with open(filename, 'w') as f:
+        f.write('')
+    opened = []
+    real_open = open
+    def fake_open(name, mode='r'):
+        opened.append(real_open(name, mode))
+        return opened[-1]
+    monkeypatch.setattr(cli4, 'open', fake_open, raising=False)
+    with pytest.raises(SystemExit):
+        cli4.parse_params('POST', ['file=@' + filename, 'ttl=='])
+    assert opened[0].closed
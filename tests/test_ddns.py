@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+
+import os
+import sys
+sys.path.insert(0, os.path.abspath('..'))
+from CloudFlare.ddns import Updater
+from CloudFlare.exceptions import CloudFlareAPIError
+
+import pytest
+
+def zone(zone_name):
+    if zone_name == 'example.org':
+        raise CloudFlareAPIError(9109, 'Invalid access token')
+    return {'example.com': 'zone1'}.get(zone_name)
+
+@pytest.fixture
+def cf(cf):
+    """ example.com with one record; looking up example.org fails"""
+    cf.resolve.zone._handlers['call'] = zone
+    dns_records = cf.zones.dns_records
+    dns_records._records[('zone1',)] = [{'id': 'r1', 'name': 'www.example.com', 'type': 'A', 'content': '10.0.0.1'}]
+    dns_records._handlers['get'] = lambda zone_id, params=None: [
+        r for r in dns_records._records[(zone_id,)] if r['name'] == params['name'] and r['type'] == params['type']]
+    dns_records._handlers['patch'] = lambda zone_id, record_id, data=None: {'id': record_id}
+    dns_records._handlers['post'] = lambda zone_id, data=None: {'id': 'r2'}
+    return cf
+
+def writes(cf):
+    """ (method, record id, data) of each record written"""
+    return [(method, identifiers[1] if len(identifiers) > 1 else None, data)
+            for method, identifiers, data in cf.zones.dns_records._calls if method in ('patch', 'post')]
+
+def test_update(cf, tmp_path):
+    state = str(tmp_path / 'ddns.json')
+    updater = Updater(cf, state=state)
+    results = updater.update({'www.example.com': '10.0.0.1', 'new.example.com': '10.0.0.2',
+                              'www.example.net': '10.0.0.3'})
+    assert sorted(r[0:4] for r in results) == [
+        ('new.example.com', 'A', 'created', None),
+        ('www.example.com', 'A', 'unchanged', '10.0.0.1'),
+        ('www.example.net', 'A', 'failed', None),
+    ]
+    assert updater.api_calls == 3
+
+    # the state file means nothing is read again - and only the change is written
+    updater = Updater(cf, state=state)
+    results = updater.update({'www.example.com': '10.0.0.9', 'new.example.com': '10.0.0.2'})
+    assert sorted(r[2] for r in results) == ['unchanged', 'updated']
+    assert updater.api_calls == 1
+    assert writes(cf)[-1] == ('patch', 'r1', {'content': '10.0.0.9'})
+
+def test_zone_lookup_fails(cf):
+    results = Updater(cf).update({'www.example.org': '10.0.0.1', 'www.example.com': '10.0.0.1'})
+    # the failed lookup is reported; the other hostnames are still done
+    assert sorted(r[0:3] for r in results) == [
+        ('www.example.com', 'A', 'unchanged'),
+        ('www.example.org', 'A', 'failed'),
+    ]
+    assert [int(r[4]) for r in results if r[2] == 'failed'] == [9109]
+
+def test_every_record_updated(cf):
+    cf.zones.dns_records._records[('zone1',)] += [
+        {'id': 'r3', 'name': 'www.example.com', 'type': 'A', 'content': '10.0.0.5'},
+        {'id': 'r4', 'name': 'www.example.com', 'type': 'A', 'content': '10.0.0.9'},
+    ]
+    updater = Updater(cf, workers=1)
+    results = updater.update({'www.example.com': '10.0.0.9'})
+    assert [r[0:4] for r in results] == [('www.example.com', 'A', 'updated', '10.0.0.1')]
+    # the record that already has the address is left alone
+    assert sorted(writes(cf)) == [
+        ('patch', 'r1', {'content': '10.0.0.9'}),
+        ('patch', 'r3', {'content': '10.0.0.9'}),
+    ]
+    # and all of them are written the next time
+    results = updater.update({'www.example.com': '10.0.0.7'})
+    assert [r[0:4] for r in results] == [('www.example.com', 'A', 'updated', '10.0.0.9')]
+    assert sorted(w[1] for w in writes(cf)[2:]) == ['r1', 'r3', 'r4']
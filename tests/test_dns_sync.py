@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+
+import os
+import sys
+sys.path.insert(0, os.path.abspath('..'))
+from CloudFlare.dns_sync import parse_bind, diff, normalize, sync, _bind_line
+
+import pytest
+
+ZONE = '''$ORIGIN example.com.
+$TTL 3600
+@       IN  SOA   ns1.example.com. admin.example.com. (
+                  2020010101 ; serial
+                  7200 3600 1209600 3600 )
+@       IN  A     10.0.0.1
+        IN  MX    10 mail          ; the zone's mail server
+www 300 IN  CNAME @
+mail    IN  A     10.0.0.2
+txt     IN  TXT   "v=spf1  -all; x" "more"
+'''
+
+def test_parse_bind():
+    assert parse_bind(ZONE.splitlines(True), 'example.com') == [
+        {'type': 'A', 'name': 'example.com', 'content': '10.0.0.1', 'ttl': 3600},
+        {'type': 'MX', 'name': 'example.com', 'priority': 10, 'content': 'mail.example.com', 'ttl': 3600},
+        {'type': 'CNAME', 'name': 'www.example.com', 'content': 'example.com', 'ttl': 300},
+        {'type': 'A', 'name': 'mail.example.com', 'content': '10.0.0.2', 'ttl': 3600},
+        {'type': 'TXT', 'name': 'txt.example.com', 'content': '"v=spf1  -all; x" "more"', 'ttl': 3600},
+    ]
+
+def test_parse_bind_quoted_parens():
+    lines = ['txt IN TXT "a (b" ( "c)"\n', '    "d" )\n', 'www IN A 10.0.0.1\n']
+    assert parse_bind(lines, 'example.com') == [
+        {'type': 'TXT', 'name': 'txt.example.com', 'content': '"a (b"   "c)"     "d"'},
+        {'type': 'A', 'name': 'www.example.com', 'content': '10.0.0.1'},
+    ]
+
+def test_parse_bind_no_data():
+    with pytest.raises(ValueError) as e:
+        parse_bind(['www IN A 10.0.0.1\n', 'ftp IN CNAME\n'], 'example.com')
+    assert str(e.value) == 'line 2: CNAME record with no data'
+    with pytest.raises(ValueError) as e:
+        parse_bind(['@ IN MX 10\n'], 'example.com')
+    assert str(e.value) == 'line 1: MX record with no data'
+
+def test_diff():
+    current = [
+        {'id': '1', 'type': 'A', 'name': 'www.example.com', 'content': '10.0.0.1', 'ttl': 1},
+        {'id': '2', 'type': 'A', 'name': 'www.example.com', 'content': '10.0.0.2', 'ttl': 1},
+        {'id': '3', 'type': 'A', 'name': 'old.example.com', 'content': '10.0.0.3', 'ttl': 1},
+        {'id': '4', 'type': 'TXT', 'name': 'example.com', 'content': 'hello', 'ttl': 1},
+        {'id': '5', 'type': 'CNAME', 'name': 'ftp.example.com', 'content': 'www.example.com', 'ttl': 1},
+    ]
+    desired = [
+        {'type': 'A', 'name': 'www', 'content': '10.0.0.2'},
+        {'type': 'A', 'name': 'www', 'content': '10.0.0.9'},
+        {'type': 'TXT', 'name': '@', 'content': '"hello"', 'ttl': 300},
+        {'type': 'CNAME', 'name': 'FTP', 'content': 'WWW.example.com.'},
+        {'type': 'A', 'name': 'new.example.com', 'content': '10.0.0.4'},
+    ]
+    creates, updates, deletes, unchanged = diff(current, desired, 'example.com')
+    assert unchanged == 2
+    assert [(r['id'], d['content']) for r, d in updates] == [('4', 'hello'), ('1', '10.0.0.9')]
+    assert [d['name'] for d in creates] == ['new.example.com']
+    assert [r['id'] for r in deletes] == ['3']
+
+    # records that aren't in the list are left alone - not changed into the ones that are
+    creates, updates, deletes, unchanged = diff(current, desired, 'example.com', delete=False)
+    assert [(r['id'], d['content']) for r, d in updates] == [('4', 'hello')]
+    assert sorted(d['content'] for d in creates) == ['10.0.0.4', '10.0.0.9']
+    assert deletes == []
+
+def test_bind_line():
+    lines = [_bind_line(normalize(r, 'example.com')) for r in [
+        {'type': 'TXT', 'name': 'txt', 'content': 'say "hi"', 'ttl': 300},
+        {'type': 'MX', 'name': '@', 'content': 'mail.example.com', 'priority': 10},
+    ]]
+    assert lines == [
+        b'txt.example.com. 300 IN TXT "say \\"hi\\""\n',
+        b'example.com. 1 IN MX 10 mail.example.com.\n',
+    ]
+    assert parse_bind(lines, 'example.com')[1]['content'] == 'mail.example.com'
+
+def dns_records(cf):
+    """ an empty zone - an import adds every record it's sent but lost.example.com"""
+    records = cf.zones.dns_records._records.setdefault(('zone',), [])
+    def post(zone_id, data=None):
+        records.append(dict(data, id=str(len(records))))
+        return records[-1]
+    def post_import(zone_id, files=None, data=None):
+        lines = files['file'][1].read().splitlines(True)
+        added = [r for r in parse_bind(lines, 'example.com') if r['name'] != 'lost.example.com']
+        for r in added:
+            records.append(dict(r, id=str(len(records))))
+        return {'recs_added': len(added), 'total_records_parsed': len(lines)}
+    cf.zones.dns_records._handlers['post'] = post
+    getattr(cf.zones.dns_records, 'import')._handlers['post'] = post_import
+    return cf
+
+def posts(cf):
+    return len(cf.zones.dns_records._calls_of('post'))
+
+def test_sync_import(cf):
+    dns_records(cf)
+    desired = [{'type': 'A', 'name': 'h%d' % i, 'content': '10.0.0.%d' % i} for i in range(5)]
+    desired.append({'type': 'A', 'name': 'lost', 'content': '10.0.1.1', 'proxied': True})
+    p = sync(cf, 'zone', desired, 'example.com', import_threshold=5)
+    uploads = getattr(cf.zones.dns_records, 'import')._calls_of('post')
+    assert [data for _, data in uploads] == [None, {'proxied': True}]
+    # the import summary said 5 of the 6 were added; so the one missing was created on its own
+    assert p.imported == 5
+    assert posts(cf) == 1
+    assert p.api_calls == 1 + 2 + 1 + 1
+    assert sync(cf, 'zone', desired, 'example.com', dry_run=True).summary()['create'] == 0
+
+    p = sync(cf, 'zone', desired + [{'type': 'A', 'name': 'one', 'content': '10.0.2.1'}], 'example.com',
+             import_threshold=5)
+    assert p.imports == [] and posts(cf) == 2
+
+def test_sync_import_same_name(cf):
+    dns_records(cf)
+    cf.zones.dns_records._records[('zone',)].append(
+        {'id': 'keep', 'type': 'A', 'name': 'lost.example.com', 'content': '10.9.9.9', 'ttl': 1})
+    desired = [{'type': 'A', 'name': 'h%d' % i, 'content': '10.0.0.%d' % i} for i in range(5)]
+    desired += [{'type': 'A', 'name': 'lost', 'content': '10.9.9.9'},
+                {'type': 'A', 'name': 'lost', 'content': '10.0.1.1'}]
+    p = sync(cf, 'zone', desired, 'example.com', import_threshold=5)
+    # the record the import missed is created; the one with the same name that's wanted is left alone
+    assert p.errors == [] and cf.zones.dns_records._calls_of('put') == []
+    assert [d['content'] for _, d in cf.zones.dns_records._calls_of('post')] == ['10.0.1.1']
+    records = cf.zones.dns_records._records[('zone',)]
+    assert sorted(r['content'] for r in records if r['name'] == 'lost.example.com') == ['10.0.1.1', '10.9.9.9']
@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+
+import os
+import sys
+sys.path.insert(0, os.path.abspath('..'))
+from CloudFlare import load_balancers
+
+import pytest
+
+def setup_load_balancers(cf):
+    """ a pool of the user's, one of an organization's and load balancers in two zones"""
+    cf.user.load_balancers.monitors._records[()] = [{'id': 'm1'}]
+    cf.user.load_balancers.pools._records[()] = [
+        {'id': 'p1', 'monitor': 'm1', 'origins': [{'name': 'web1', 'address': '192.0.2.1'}]},
+        {'id': 'p2', 'enabled': False, 'origins': [{'name': 'web2', 'address': '192.0.2.2'}]}]
+    cf.organizations.load_balancers.monitors._records[('o1',)] = [{'id': 'm2'}]
+    cf.organizations.load_balancers.pools._records[('o1',)] = [
+        {'id': 'p3', 'monitor': 'm2', 'origins': [{'name': 'web1', 'address': '192.0.2.1'}]}]
+    cf.zones.load_balancers._records[('z1',)] = [{'id': 'lb1', 'default_pools': ['p1'], 'fallback_pool': 'p2'}]
+    cf.zones.load_balancers._records[('z2',)] = [{'id': 'lb2', 'default_pools': ['p2'], 'fallback_pool': 'p2',
+                                                  'region_pools': {'WNAM': ['p3']}}]
+    return cf
+
+def test_snapshot(cf):
+    s = load_balancers.snapshot(setup_load_balancers(cf), zones=['z1', {'id': 'z2'}], organizations=['o1'], rate=None)
+    assert s.summary() == {'monitors': 2, 'pools': 3, 'load_balancers': 2, 'unhealthy_pools': 1, 'errors': 0}
+    assert s.affected_by_pool('p2') == [('z1', 'lb1'), ('z2', 'lb2')]
+    assert s.affected_by_pool('p3') == [('z2', 'lb2')]
+    assert s.affected_by_origin('192.0.2.1') == [('z1', 'lb1'), ('z2', 'lb2')]
+    assert s.affected_by_origin('web2') == s.affected_by_pool('p2')
+    assert s.affected_by_monitor('m1') == [('z1', 'lb1')]
+    assert [pool['id'] for pool in s.pools_of('z2', 'lb2')] == ['p2', 'p3']
+    assert s.unhealthy() == ['p2']
+
+class CountingRateLimit(object):
+    def __init__(self, rate):
+        self.rate = rate
+        self.waits = 0
+    def wait(self):
+        self.waits += 1
+
+def test_snapshot_rate(cf, monkeypatch):
+    limits = []
+    def rate_limit(rate):
+        limits.append(CountingRateLimit(rate))
+        return limits[-1]
+    monkeypatch.setattr(load_balancers, 'RateLimit', rate_limit)
+    setup_load_balancers(cf)
+    cf.zones.load_balancers._records[('z1',)].append({'id': 'lb3', 'default_pools': ['p1'], 'fallback_pool': 'p1'})
+    cf.zones.load_balancers._per_page = 1
+    s = load_balancers.snapshot(cf, zones=['z1', 'z2'], organizations=['o1'])
+    assert s.summary()['load_balancers'] == 3
+    # every page waits its turn - not just the first page of each list
+    assert limits[0].rate == load_balancers.DEFAULT_RATE
+    assert limits[0].waits == 4 + 3
@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+
+import os
+import sys
+import json
+sys.path.insert(0, os.path.abspath('..'))
+from CloudFlare import logarrow
+
+import pytest
+
+pa = pytest.importorskip('pyarrow')
+import pyarrow.parquet
+
+FIELDS = {'ClientIP': 'ip', 'ClientRequestPath': 'path', 'EdgeResponseStatus': 'status',
+          'EdgeResponseBytes': 'bytes', 'RequestHeaders': 'headers'}
+
+@pytest.fixture
+def cf(cf):
+    """ the fields of the logs"""
+    cf.zones.logs.received.fields._handlers['get'] = lambda zone_id: FIELDS
+    return cf
+
+def lines(n):
+    return [json.dumps({'ClientIP': '10.0.0.%d' % (i % 3), 'ClientRequestPath': '/%d' % i,
+                        'EdgeResponseStatus': 200, 'EdgeResponseBytes': i,
+                        'RequestHeaders': {'x': str(i)}, 'RayID': 'r%d' % i}).encode('utf-8')
+            for i in range(n)]
+
+def test_schema(cf):
+    schema = logarrow.schema(cf, 'z', ['EdgeResponseBytes', 'ClientIP', 'RequestHeaders'])
+    assert schema.names == ['EdgeResponseBytes', 'ClientIP']
+    assert schema.field('EdgeResponseBytes').type == pa.int64()
+    assert pa.types.is_dictionary(schema.field('ClientIP').type)
+    with pytest.raises(logarrow.CloudFlareAPIError):
+        logarrow.schema(cf, 'z', ['RayID'])
+
+def test_write_parquet(cf, tmpdir):
+    filename = str(tmpdir.join('logs.parquet'))
+    schema = logarrow.schema(cf, 'z')
+    with logarrow.Writer(filename, schema, chunk_bytes=1000) as w:
+        w.write(lines(50))
+    assert w.rows == 50
+    f = pa.parquet.ParquetFile(filename)
+    assert f.metadata.num_row_groups > 1
+    table = f.read()
+    assert table.column('EdgeResponseBytes').to_pylist() == list(range(50))
+    assert table.column('ClientIP').to_pylist()[:4] == ['10.0.0.0', '10.0.0.1', '10.0.0.2', '10.0.0.0']
+
+def test_write_arrow(cf, tmpdir):
+    filename = str(tmpdir.join('logs.arrows'))
+    assert logarrow.write(cf, 'z', lines(20), filename, file_format='arrow') == 20
+    table = pa.ipc.open_stream(filename).read_all()
+    assert table.num_rows == 20
+    assert table.column('ClientRequestPath').to_pylist()[-1] == '/19'
+
+def test_write_log_line(cf, tmpdir):
+    # a line as Logpull returns it - the ray ids are hex
+    line = {'CacheCacheStatus': 'hit', 'ClientASN': 13335, 'ClientIP': '192.0.2.1', 'EdgeColoID': 14,
+            'EdgeResponseBytes': 1024, 'EdgeStartTimestamp': 1600000000000000000,
+            'FirewallMatchesActions': [], 'ParentRayID': '5e7b1f7b9d0a1234', 'RayID': '5e7b1f7b9d0a5678',
+            'RequestHeaders': {}, 'WorkerSubrequest': False}
+    cf.zones.logs.received.fields._handlers['get'] = lambda zone_id: dict((field, '') for field in line)
+    filename = str(tmpdir.join('logs.parquet'))
+    lines = [json.dumps(line).encode('utf-8'), json.dumps(dict(line, ParentRayID='00')).encode('utf-8')]
+    assert logarrow.write(cf, 'z', lines, filename) == 2
+    table = pa.parquet.read_table(filename)
+    assert table.column('ParentRayID').to_pylist() == ['5e7b1f7b9d0a1234', '00']
+    assert table.column('EdgeStartTimestamp').to_pylist() == [1600000000000000000] * 2
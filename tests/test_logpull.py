@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+
+import os
+import sys
+import json
+import datetime
+sys.path.insert(0, os.path.abspath('..'))
+from CloudFlare import logpull
+from CloudFlare.exceptions import CloudFlareAPIError
+
+import pytest
+
+def received(fail):
+    """ the logs for each second of the window - a start in fail raises (once)"""
+    def get_stream(zone_id, params=None):
+        if params['start'] in fail:
+            fail.discard(params['start'])
+            raise CloudFlareAPIError(1002, 'failed')
+        return (json.dumps({'t': t}).encode('utf-8') for t in range(params['start'], params['end']))
+    return get_stream
+
+def test_windows():
+    assert logpull.windows(datetime.datetime(1970, 1, 1, 0, 0, 10), 35, 10) == [(10, 20), (20, 30), (30, 35)]
+
+def test_pull_resume(cf, tmp_path):
+    directory = str(tmp_path / 'logs')
+    cf.zones.logs.received._handlers['_get_stream'] = received(set([20]))
+    p = logpull.pull(cf, 'zone', 0, 50, directory, window=10, fields=['ClientIP', 'RayID'], sample=0.1)
+    assert p.summary() == {'windows': 4, 'fetched': 4, 'skipped': 0, 'lines': 40, 'errors': 1}
+    params = cf.zones.logs.received._calls_of('_get_stream')[0][1]
+    assert params['fields'] == 'ClientIP,RayID'
+    assert params['sample'] == 0.1
+
+    # only the window that failed is fetched again
+    p = logpull.pull(cf, 'zone', 0, 50, directory, window=10, fields=['ClientIP', 'RayID'], sample=0.1)
+    assert p.summary() == {'windows': 5, 'fetched': 1, 'skipped': 4, 'lines': 10, 'errors': 0}
+    assert [json.loads(line)['t'] for line in logpull.read(p.files)] == list(range(50))
+
+    # a different query starts again
+    p = logpull.pull(cf, 'zone', 0, 50, directory, window=10)
+    assert p.summary()['fetched'] == 5
@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+
+import os
+import sys
+import json
+sys.path.insert(0, os.path.abspath('..'))
+import CloudFlare
+from CloudFlare.exceptions import CloudFlareAPIError
+from CloudFlare.logstats import batches, HeavyHitters, LogStats
+
+import pytest
+
+def line(ip, path, status, size, colo='SJC', origin_ms=3):
+    return json.dumps({'ClientIP': ip, 'ClientRequestPath': path, 'EdgeResponseStatus': status,
+                       'EdgeResponseBytes': size, 'EdgeColoCode': colo,
+                       'OriginResponseTime': origin_ms * 1000000}).encode('utf-8')
+
+def test_batches():
+    lines = [line('10.0.0.%d' % i, '/', 200, i) for i in range(5)]
+    result = list(batches(lines, ['ClientIP', 'EdgeResponseBytes', 'RayID'], size=2))
+    assert [len(b['ClientIP']) for b in result] == [2, 2, 1]
+    assert result[0]['EdgeResponseBytes'] == [0, 1]
+    assert result[2]['RayID'] == [None]
+
+def test_batches_not_ndjson():
+    with pytest.raises(ValueError):
+        list(batches([b'{"ClientIP": "10.0.0.1"}', b'1,2']))
+
+def raw_response(monkeypatch, data):
+    cf = CloudFlare.CloudFlare()
+    monkeypatch.setattr(cf._base, '_network', lambda *args: ['application/json', 200, data])
+    return cf._base._raw('GET', {}, ['zones', 'logs/received', None, None])
+
+def test_raw_ndjson(monkeypatch):
+    assert raw_response(monkeypatch, b'{"RayID": "a"}\n\n{"RayID": "b"}\n') == [{'RayID': 'a'}, {'RayID': 'b'}]
+    # more than one element on a line isn't NDJSON
+    with pytest.raises(CloudFlareAPIError):
+        raw_response(monkeypatch, b'{"RayID": "a"}\n1,2\n')
+
+def test_heavy_hitters():
+    hh = HeavyHitters(size=3)
+    for _ in range(10):
+        hh.update(['a'] * 50 + ['b'] * 20 + ['c%d' % i for i in range(40)])
+    top = hh.top(2)
+    assert [item for item, _ in top] == ['a', 'b']
+    # counts are never more than error too low
+    assert 500 - hh.error <= top[0][1] <= 500
+
+def test_log_stats():
+    stats = LogStats()
+    lines = [line('10.0.0.1', '/api/v1/x', 200, 100, 'SJC', 3)] * 6 + \
+            [line('10.0.0.2', '/img/a.png?x=1', 404, 10, 'LHR', 700)] * 4
+    for batch in batches(lines, size=3):
+        stats.add(batch)
+    r = stats.summary()
+    assert (r['requests'], r['bytes']) == (10, 640)
+    assert r['status'][200] == {'requests': 6, 'bytes': 600}
+    assert list(r['prefix']) == ['/api', '/img']
+    assert r['colo']['LHR'] == {'requests': 4, 'bytes': 40}
+    assert r['clients'] == [('10.0.0.1', 6), ('10.0.0.2', 4)]
+    assert r['latency_ms'] == {'p50': 5, 'p90': 1000, 'p99': 1000}
@@ -0,0 +1,26 @@
+#!/usr/bin/env python
+
+import os
+import sys
+sys.path.insert(0, os.path.abspath('..'))
+from CloudFlare.paging import all_pages
+from CloudFlare.exceptions import CloudFlareAPIError
+
+import pytest
+
+def test_all_pages(cf):
+    cf.zones._records[()] = [{'id': i} for i in range(25)]
+    cf.zones._per_page = 10
+    assert list(all_pages(cf.zones, params={'name': 'x'}, workers=4)) == cf.zones._records[()]
+    assert sorted(params['page'] for _, params in cf.zones._calls_of('_get_raw')) == [1, 2, 3]
+
+def test_list_params(cf):
+    with pytest.raises(CloudFlareAPIError) as e:
+        list(all_pages(cf.zones, params=['a', 'b']))
+    assert 'named params' in str(e.value)
+
+def test_unwrapped(cf):
+    # the method - not the endpoint
+    with pytest.raises(CloudFlareAPIError) as e:
+        list(all_pages(cf.zones.get))
+    assert 'paging not available' in str(e.value)
@@ -0,0 +1,31 @@
+#!/usr/bin/env python
+
+import os
+import sys
+sys.path.insert(0, os.path.abspath('..'))
+from CloudFlare.purge import PurgeQueue
+
+import pytest
+
+def test_coalesce(cf):
+    with PurgeQueue(cf, window=60, batch_size=5, rate=None) as q:
+        futures = [q.purge('zone', files=['/%d' % (i % 4)]) for i in range(8)]
+        futures.append(q.purge('zone', tags=['a', 'b'], files=['/0']))
+        q.flush()
+        assert all(f.result() is None for f in futures)
+        assert (q.requested, q.coalesced, q.api_calls) == (11, 5, 2)
+        # a full batch is sent without waiting - and no more than batch_size at a time
+        q.purge('zone', files=['/%d' % (i) for i in range(7)]).result(timeout=10)
+    assert sorted(cf.zones.purge_cache._calls_of('post'), key=str) == [
+        (('zone',), {'files': ['/0', '/1', '/2', '/3', '/4']}),
+        (('zone',), {'files': ['/0', '/1', '/2', '/3']}),
+        (('zone',), {'files': ['/5', '/6']}),
+        (('zone',), {'tags': ['a', 'b']}),
+    ]
+
+def test_error(cf):
+    cf.zones.purge_cache._errors[('bad',)] = ValueError('purge failed')
+    with PurgeQueue(cf, window=0, rate=None) as q:
+        future = q.purge('bad', hosts=['example.com'])
+        with pytest.raises(ValueError):
+            future.result(timeout=10)
@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+
+import os
+import sys
+sys.path.insert(0, os.path.abspath('..'))
+import CloudFlare
+from CloudFlare.read_configs import read_configs
+
+import pytest
+
+CONFIG = """
+[CloudFlare]
+email = user@example.com
+token = 00000000000000000000000000000000
+
+[Work]
+email = admin@example.org
+token = 1111111111111111 1111111111111111
+extras = /zones/:id/example   /zones/:id/example2
+"""
+
+@pytest.fixture
+def config_dir(tmp_path, monkeypatch):
+    for name in ['CF_API_EMAIL', 'CF_API_KEY', 'CF_API_CERTKEY', 'CF_API_BEARER', 'CF_API_EXTRAS', 'CF_API_PROFILE']:
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv('HOME', str(tmp_path / 'home'))
+    monkeypatch.chdir(tmp_path)
+    with open('.cloudflare.cfg', 'w') as f:
+        f.write(CONFIG)
+    return tmp_path
+
+def test_default_profile(config_dir):
+    [email, token, certtoken, bearer, extras] = read_configs()
+    assert email == 'user@example.com'
+    assert token == '00000000000000000000000000000000'
+    assert certtoken is None
+    assert bearer is None
+    assert extras is None
+
+def test_named_profile(config_dir):
+    [email, token, certtoken, bearer, extras] = read_configs('Work')
+    assert email == 'admin@example.org'
+    assert token == '11111111111111111111111111111111'
+    assert extras == ['/zones/:id/example', '/zones/:id/example2']
+
+def test_profile_from_environment(config_dir, monkeypatch):
+    monkeypatch.setenv('CF_API_PROFILE', 'Work')
+    assert read_configs()[0] == 'admin@example.org'
+
+def test_missing_profile(config_dir):
+    with pytest.raises(CloudFlare.exceptions.CloudFlareAPIError):
+        read_configs('Missing')
+
+def test_cache_invalidated_by_change(config_dir):
+    assert read_configs()[0] == 'user@example.com'
+    with open('.cloudflare.cfg', 'w') as f:
+        f.write('[CloudFlare]\nemail = other@example.com\n')
+    st = os.stat('.cloudflare.cfg')
+    os.utime('.cloudflare.cfg', (st.st_atime, st.st_mtime + 10))
+    assert read_configs()[0] == 'other@example.com'
+
+def test_class_with_profile(config_dir):
+    cf = CloudFlare.CloudFlare(profile='Work')
+    assert str(cf) == '["admin@example.org","REDACTED"]'
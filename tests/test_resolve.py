@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+
+import os
+import sys
+sys.path.insert(0, os.path.abspath('..'))
+from CloudFlare.resolve import Resolver
+from CloudFlare.exceptions import CloudFlareAPIError
+
+import pytest
+
+ZONE_ID = '023e105f4ecef8ad9ca31a8372d0c353'
+
+def by_name(endpoint):
+    """ a get of the records with params['name']"""
+    def get(*identifiers, **kwargs):
+        return [r for r in endpoint._records.get(identifiers, []) if r['name'] == kwargs['params']['name']]
+    endpoint._handlers['get'] = get
+
+@pytest.fixture
+def cf(cf):
+    """ the zone example.com"""
+    cf.zones._records[()] = [{'id': ZONE_ID, 'name': 'example.com'}]
+    by_name(cf.zones)
+    return cf
+
+def calls(endpoint):
+    return len(endpoint._calls)
+
+def test_zone_cached(cf):
+    resolver = Resolver(cf)
+    assert resolver.zone('example.com') == ZONE_ID
+    assert resolver.zone('example.com') == ZONE_ID
+    assert calls(cf.zones) == 1
+    assert resolver.api_calls == 1
+
+def test_zone_not_found_cached(cf):
+    resolver = Resolver(cf)
+    assert resolver.zone('missing.com') is None
+    assert resolver.zone('missing.com') is None
+    assert calls(cf.zones) == 1
+
+def test_forget(cf):
+    resolver = Resolver(cf)
+    resolver.zone('example.com')
+    resolver.forget('zones', 'example.com')
+    resolver.zone('example.com')
+    assert calls(cf.zones) == 2
+
+def test_store_shared(cf, tmp_path):
+    store = str(tmp_path / 'cache.db')
+    Resolver(cf, store=store).zone('example.com')
+    Resolver(cf, store=store).zone('missing.com')
+    # a new resolver (think new process) finds the zone on disk; but names not found are not saved
+    del cf.zones._calls[:]
+    resolver = Resolver(cf, store=store)
+    assert resolver.zone('example.com') == ZONE_ID
+    assert resolver.zone('missing.com') is None
+    assert calls(cf.zones) == 1
+
+def test_store_per_account(cf, tmp_path):
+    store = str(tmp_path / 'cache.db')
+    Resolver(cf, store=store).zone('example.com')
+    del cf.zones._calls[:]
+    cf._base.token = '11111111111111111111111111111111'
+    Resolver(cf, store=store).zone('example.com')
+    assert calls(cf.zones) == 1
+
+def dns_records(cf, n, per_page):
+    """ n records in the zone - host0 has two of them"""
+    cf.zones.dns_records._records[('zone',)] = [{'id': '%032x' % i, 'name': 'host%d.example.com' % (i % (n - 1))}
+                                                for i in range(n)]
+    cf.zones.dns_records._per_page = per_page
+    by_name(cf.zones.dns_records)
+    return cf
+
+def test_many_lists_when_cheaper(cf):
+    dns_records(cf, 100, 10)
+    names = ['host%d.example.com' % i for i in range(50)] + ['missing.example.com']
+    results, api_calls = Resolver(cf).many('dns_records', names, 'zone', workers=1)
+    # one listing (10 pages) rather than 51 lookups; host0 is on the first and the last page
+    assert api_calls == 10
+    assert calls(cf.zones.dns_records) == 10
+    assert results['host0.example.com'] == ['%032x' % 0, '%032x' % 99]
+    assert results['missing.example.com'] is None
+
+def test_many_looks_up_when_cheaper(cf):
+    dns_records(cf, 1000, 10)
+    names = ['host%d.example.com' % i for i in range(500, 505)]
+    resolver = Resolver(cf)
+    results, api_calls = resolver.many('dns_records', names, 'zone', workers=1)
+    # one page to see how big the zone is; then one lookup per name
+    assert api_calls == 6
+    assert results['host500.example.com'] == ['%032x' % 500]
+    # and now they are all cached
+    assert resolver.many('dns_records', names, 'zone', workers=1)[1] == 0
+
+def test_many_listed_once(cf):
+    cf.user.organizations._records[()] = [{'id': 'o1', 'name': 'one'}, {'id': 'o2', 'name': 'two'}]
+    resolver = Resolver(cf)
+    results, api_calls = resolver.many('organizations', ['one', 'missing', 'other'])
+    # one listing for all of them; names that aren't there are remembered as not found
+    assert api_calls == 1
+    assert results == {'one': 'o1', 'missing': None, 'other': None}
+    assert resolver.organization('missing') is None
+    assert resolver.organization('two') == 'o2'
+    assert calls(cf.user.organizations) == 1
+
+def test_many_bad_kind(cf):
+    with pytest.raises(CloudFlareAPIError):
+        Resolver(cf).many('dns_records', ['www.example.com'])
+    with pytest.raises(CloudFlareAPIError):
+        Resolver(cf).many('nope', ['www.example.com'])
@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+
+import os
+import sys
+import time
+import threading
+sys.path.insert(0, os.path.abspath('..'))
+from cli4 import server
+from cli4.cli4 import api_error
+from CloudFlare.exceptions import CloudFlareAPIError
+
+import pytest
+
+def handler(args, stream):
+    if args[0] == 'fail':
+        sys.exit('cli4: %s - failed' % (args[1]))
+    if args[0] == 'api_error':
+        e = CloudFlareAPIError(1004, 'DNS Validation Error',
+                               [{'code': 9005, 'message': 'Content for A record is invalid'},
+                                {'code': 9021, 'message': 'Invalid TTL'}])
+        api_error(None, args[1], e)
+    for arg in args:
+        stream.write(arg + '\n')
+        stream.flush()
+
+def test_connect(tmp_path, capfdbinary):
+    path = str(tmp_path / 'cli4.sock')
+    t = threading.Thread(target=server.serve, args=(path, handler))
+    t.daemon = True
+    t.start()
+    for _ in range(100):
+        if os.path.exists(path):
+            break
+        time.sleep(0.01)
+
+    assert server.connect(path, ['a', u'é']) == 0
+    assert capfdbinary.readouterr().out == u'a\né\n'.encode('utf-8')
+    assert server.connect(path, ['fail', 'b']) == 'cli4: b - failed'
+    # every error the API returned goes back to the client; none are left on the server
+    assert server.connect(path, ['api_error', 'zones']) == ('cli4: /zones - 9005 Content for A record is invalid\n'
+                                                            'cli4: /zones - 9021 Invalid TTL\n'
+                                                            'cli4: /zones - 1004 DNS Validation Error')
+    assert capfdbinary.readouterr().err == b''
+
+def test_absolute_args():
+    assert server.absolute_args(['name=x', 'file=@a.txt', '@b.js']) == \
+        ['name=x', 'file=@' + os.path.abspath('a.txt'), '@' + os.path.abspath('b.js')]
+    with pytest.raises(SystemExit):
+        server.absolute_args(['file=@-'])
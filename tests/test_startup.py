@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+
+import os
+import sys
+import subprocess
+
+import pytest
+
+# The cli4 import time budget (in microseconds) - see "CLI startup time" in README.md
+IMPORT_BUDGET = 30000
+
+# These are slow to import and should only be imported when needed
+LAZY_MODULES = ['requests', 'yaml', 'logging']
+
+TOP = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+def import_time(module):
+    """cumulative import time (usec) of module; as reported by python -X importtime"""
+    env = os.environ.copy()
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    p = subprocess.Popen([sys.executable, '-X', 'importtime', '-c', 'import ' + module],
+                         cwd=TOP, env=env, stderr=subprocess.PIPE, universal_newlines=True)
+    _, stderr = p.communicate()
+    for l in stderr.splitlines():
+        if l.startswith('import time:') and l.split('|')[-1].strip() == module:
+            return int(l.split('|')[1])
+    return None
+
+def test_lazy_imports():
+    p = subprocess.Popen([sys.executable, '-c',
+                          'import sys, cli4.cli4, CloudFlare; '
+                          'cf = CloudFlare.CloudFlare(); '
+                          'print(" ".join(sorted(sys.modules)))'],
+                         cwd=TOP, stdout=subprocess.PIPE, universal_newlines=True)
+    stdout, _ = p.communicate()
+    modules = stdout.split()
+    for module in LAZY_MODULES:
+        assert module not in modules
+
+def test_import_budget():
+    if sys.version_info < (3, 7):
+        pytest.skip('python -X importtime needs python 3.7')
+    # first run writes the .pyc files; then take the best of a few runs
+    import_time('cli4.cli4')
+    best = min(import_time('cli4.cli4') for _ in range(3))
+    assert best < IMPORT_BUDGET
+
+def test_failed_api_tree(monkeypatch):
+    sys.path.insert(0, TOP)
+    import CloudFlare
+    from CloudFlare import cloudflare
+    cf = CloudFlare.CloudFlare()
+    cf._extras = ['/zones/:zone_id/extra']
+    def bad_extras(self, extras):
+        raise ValueError('bad extras')
+    monkeypatch.setattr(cloudflare, 'api_extras', bad_extras)
+    with pytest.raises(ValueError):
+        cf.zones
+    # no part of the tree is left behind and the next lookup tries again
+    assert 'zones' not in cf.__dict__
+    assert not cf._api_loading
+    monkeypatch.undo()
+    assert cf.zones.dns_records is not None
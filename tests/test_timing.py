@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+
+import os
+import sys
+import io
+import time
+import datetime
+sys.path.insert(0, os.path.abspath('..'))
+import CloudFlare
+from CloudFlare.timing import Timings
+from cli4 import cli4
+
+import pytest
+
+def test_phases():
+    timings = Timings()
+    timings.add('config', 0.5)
+    timings.add('network ttfb', 0.25)
+    timings.add('network ttfb', 0.25)
+    timings.since('output', time.time())
+    phases = timings.phases()
+    assert [phase for phase, _, _ in phases] == ['config', 'network ttfb', 'output']
+    assert phases[1][1:] == (0.5, 2)
+
+def test_report():
+    timings = Timings()
+    timings.add('config', 0.001)
+    lines = timings.report()
+    assert lines[0].split() == ['config', '1.0', 'ms', '1']
+    assert lines[-1].split()[0] == 'total'
+
+class FakeResponse(object):
+    def __init__(self, ttfb, body):
+        self.elapsed = datetime.timedelta(seconds=ttfb)
+        self.body = body
+        self.reads = 0
+    @property
+    def content(self):
+        self.reads += 1
+        time.sleep(self.body)
+        return b'{}'
+
+def test_network_body():
+    timings = Timings()
+    cf = CloudFlare.CloudFlare(timings=timings)
+    response = FakeResponse(0.5, 0.02)
+    # time spent before the headers arrived (i.e. preparing the request) isn't part of the body
+    time.sleep(0.05)
+    cf._base._time_network('https://api.example.com/', None, response, False)
+    phases = dict((phase, total) for phase, total, _ in timings.phases())
+    assert phases['network ttfb'] == 0.5
+    assert 0.02 <= phases['network body'] < 0.05
+    assert response.reads == 1
+    # a streamed body is read (and timed) by the caller
+    cf._base._time_network('https://api.example.com/', None, response, True)
+    assert response.reads == 1
+
+def test_dump_timing(capsys):
+    stream = io.StringIO()
+    with pytest.raises(SystemExit):
+        cli4.do_it(['--timing', '--dump'], stream=stream)
+    assert '/zones' in stream.getvalue().split()
+    phases = [line.split()[0] for line in capsys.readouterr().err.splitlines()[1:]]
+    assert 'config' in phases and 'api' in phases
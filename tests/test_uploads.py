@@ -0,0 +1,39 @@
+#!/usr/bin/env python
+
+import os
+import sys
+import io
+sys.path.insert(0, os.path.abspath('..'))
+from CloudFlare.uploads import MultipartStream, is_stream
+
+import pytest
+
+def parse(body, content_type):
+    import email.parser
+    msg = email.parser.BytesParser().parsebytes(b'Content-Type: ' + content_type.encode('utf-8') + b'\r\n\r\n' + body)
+    return dict((part.get_param('name', header='content-disposition'), (part.get_filename(), part.get_payload(decode=True)))
+                for part in msg.get_payload())
+
+def test_multipart(tmp_path):
+    filename = str(tmp_path / 'example.com.txt')
+    contents = b'www.example.com. 300 IN A 10.0.0.1\n' * 10000
+    with open(filename, 'wb') as f:
+        f.write(contents)
+    body = MultipartStream({'file': open(filename, 'rb')}, {'proxied': True})
+    data = b''.join(body)
+    assert body.len == len(data)
+    assert parse(data, body.content_type) == {
+        'file': ('example.com.txt', contents),
+        'proxied': (None, b'true'),
+    }
+
+def test_multipart_unknown_length():
+    body = MultipartStream({'file': ('zone.txt', io.StringIO(u'zone data\n'))})
+    assert body.len is None
+    assert parse(body.read(), body.content_type) == {'file': ('zone.txt', b'zone data\n')}
+
+def test_is_stream():
+    assert is_stream(io.BytesIO(b'x'))
+    assert is_stream(iter([b'x']))
+    assert not is_stream('x')
+    assert not is_stream({'name': 'x'})
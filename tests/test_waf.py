@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+
+import os
+import sys
+sys.path.insert(0, os.path.abspath('..'))
+from CloudFlare import waf
+from CloudFlare.exceptions import CloudFlareAPIError
+
+import pytest
+
+def zones(cf, zone_ids):
+    """ one package in each zone - with three groups and 250 rules"""
+    packages = cf.zones.firewall.waf.packages
+    groups = [{'id': 'g%d' % g, 'mode': 'on', 'allowed_modes': ['on', 'off']} for g in range(3)]
+    rules = [{'id': str(100000 + r), 'group': {'id': 'g%d' % (r % 3)}, 'mode': 'default',
+              'allowed_modes': ['default', 'block', 'disable']} for r in range(250)]
+    for zone_id in zone_ids:
+        packages._records[(zone_id,)] = [{'id': 'p1'}]
+        packages.groups._records[(zone_id, 'p1')] = [dict(g) for g in groups]
+        packages.rules._records[(zone_id, 'p1')] = [dict(r) for r in rules]
+    return cf
+
+def test_crawl(cf):
+    zones(cf, ['z1', 'z2'])
+    tree = waf.crawl(cf, ['z1', {'id': 'z2'}], rate=None, workers=4)
+    assert tree.summary() == {'zones': 2, 'packages': 2, 'groups': 6, 'rules': 500, 'errors': 0, 'api_calls': 10}
+    assert tree.rules[('z2', 'p1', '100004')]['group']['id'] == 'g1'
+    assert len(tree.group_rules[('z1', 'p1', 'g0')]) == 84
+    pages = cf.zones.firewall.waf.packages.rules._calls_of('_get_raw')
+    assert sorted(identifiers + (params['page'],) for identifiers, params in pages)[-1] == ('z2', 'p1', 3)
+
+def test_crawl_errors(cf):
+    zones(cf, ['z1'])
+    cf.zones.firewall.waf.packages._errors[('denied',)] = CloudFlareAPIError(10000, 'Authentication error')
+    tree = waf.crawl(cf, ['z1', 'denied'], rate=None)
+    # the zone that can't be read is an error; the other is still crawled
+    assert tree.summary() == {'zones': 2, 'packages': 1, 'groups': 3, 'rules': 250, 'errors': 1, 'api_calls': 6}
+    assert [(key, int(e)) for key, e in tree.errors] == [(('packages', 'denied', None), 10000)]
+
+def test_set_modes(cf):
+    zones(cf, ['z1', 'z2'])
+    tree = waf.crawl(cf, ['z1', 'z2'], rate=None)
+    tree.rules[('z2', 'p1', '100001')]['mode'] = 'block'
+    r = waf.set_modes(cf, tree, rules={'100001': 'block'}, groups={'g2': 'off'}, dry_run=True)
+    assert r.summary()['changed'] == 3
+    assert cf.zones.firewall.waf.packages.rules._calls_of('patch') == []
+    r = waf.set_modes(cf, tree, rules={'100001': 'block'}, groups={'g2': 'off'}, rate=None)
+    assert r.summary() == {'changed': 3, 'unchanged': 1, 'errors': 0, 'api_calls': 3, 'applied': True}
+    assert cf.zones.firewall.waf.packages.rules._calls_of('patch') == [(('z1', 'p1', '100001'), {'mode': 'block'})]
+    assert waf.set_modes(cf, tree, rules={'100001': 'block'}, groups={'g2': 'off'}).summary()['changed'] == 0
+    with pytest.raises(CloudFlareAPIError):
+        waf.set_modes(cf, tree, rules={'100001': 'on'})
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+
+import os
+import sys
+sys.path.insert(0, os.path.abspath('..'))
+from CloudFlare import workers_deploy
+from CloudFlare.exceptions import CloudFlareAPIError
+
+import pytest
+
+def workers(cf):
+    """ z1 has the script and two routes (read two a page); a script that isn't there raises 10007"""
+    scripts = {'z1': 'v1'}
+    def get(zone_id):
+        if zone_id not in scripts:
+            raise CloudFlareAPIError(10007, 'workers.api.error.script_not_found')
+        return scripts[zone_id]
+    def put(zone_id, data=None):
+        scripts[zone_id] = data
+        return {'script': data}
+    cf.zones.workers.script._handlers.update({'get': get, 'put': put})
+    cf.zones.workers.script._errors[('denied',)] = CloudFlareAPIError(10000, 'Authentication error')
+    cf.zones.workers.routes._records[('z1',)] = [{'id': 'r1', 'pattern': 'old.example.com/*', 'enabled': True},
+                                                 {'id': 'r2', 'pattern': 'z1.example.com/*', 'enabled': False}]
+    cf.zones.workers.routes._per_page = 2
+    return cf
+
+def route_writes(cf):
+    """ (method, zone_id, route id or pattern) of each route written"""
+    return sorted((method, identifiers[0], value['pattern'] if method == 'post' else identifiers[1])
+                  for method, identifiers, value in cf.zones.workers.routes._calls if method != '_get_raw')
+
+def puts(cf):
+    return [identifiers[0] for identifiers, _ in cf.zones.workers.script._calls_of('put')]
+
+def test_routes_diff():
+    current = [{'id': '1', 'pattern': 'a/*', 'script': 'x'}, {'id': '2', 'pattern': 'b/*', 'script': 'y'}]
+    adds, updates, removes = workers_deploy.routes_diff(current, ['b/*', 'c/*'], 'x')
+    assert adds == ['c/*']
+    assert [r['id'] for r in updates] == ['2']
+    assert [r['id'] for r in removes] == ['1']
+
+def test_deploy(cf, tmpdir):
+    workers(cf)
+    manifest = str(tmpdir.join('manifest.json'))
+    routes = {'z1': ['z1.example.com/*'], 'z2': ['z2.example.com/*']}
+    r = workers_deploy.deploy(cf, 'v1', ['z1', 'z2'], routes, manifest=manifest, rate=None)
+    # z1 already has the script
+    assert puts(cf) == ['z2']
+    assert r.summary()['unchanged'] == 1
+    assert route_writes(cf) == [('delete', 'z1', 'r1'), ('post', 'z2', 'z2.example.com/*'), ('put', 'z1', 'r2')]
+    # nothing has changed; so the manifest is enough
+    r = workers_deploy.deploy(cf, 'v1', ['z1', 'z2'], routes, manifest=manifest, rate=None)
+    assert r.api_calls == 0
+    # a new script is uploaded without reading the old one
+    gets = len(cf.zones.workers.script._calls_of('get'))
+    r = workers_deploy.deploy(cf, 'v2', ['z1', 'z2'], routes, manifest=manifest, rate=None)
+    assert sorted(r.uploaded) == ['z1', 'z2']
+    assert len(cf.zones.workers.script._calls_of('get')) == gets
+    assert r.api_calls == 2
+
+def test_deploy_errors(cf):
+    workers(cf)
+    r = workers_deploy.deploy(cf, 'v1', ['z1', 'denied', 'z3'], rate=None)
+    # only a missing script means there's no script; other errors are reported for the zone
+    assert puts(cf) == ['z3']
+    assert [(zone_id, int(e)) for zone_id, e in r.errors] == [('denied', 10000)]
+
+def test_deploy_route_pages(cf):
+    workers(cf)
+    cf.zones.workers.routes._records[('z1',)] += [{'id': 'r%d' % i, 'pattern': 'r%d.example.com/*' % i, 'enabled': True}
+                                                 for i in range(3, 6)]
+    r = workers_deploy.deploy(cf, 'v1', ['z1'], ['z1.example.com/*'], dry_run=True, rate=None)
+    # one script read and three pages of routes
+    assert r.api_calls == 4
+    assert r.routes == {'add': 0, 'update': 1, 'remove': 4}
@@ -0,0 +1,38 @@
+#!/usr/bin/env python
+
+import os
+import sys
+import io
+import json
+sys.path.insert(0, os.path.abspath('..'))
+from cli4.writers import write_result, write_list
+
+import pytest
+
+records = [{'id': '%032x' % i, 'name': 'host%d.example.com' % i, 'meta': {'auto_added': False}} for i in range(250)]
+
+def expected(results):
+    return json.dumps(results, indent=4, sort_keys=True, ensure_ascii=False) + '\n'
+
+@pytest.mark.parametrize('results', [[], [1], records, records[0], 'text'])
+def test_json_unchanged(results):
+    stream = io.StringIO()
+    write_result(results, 'json', stream)
+    if results == 'text':
+        assert stream.getvalue() == 'text\n'
+    else:
+        assert stream.getvalue() == expected(results)
+
+def test_json_generator():
+    stream = io.StringIO()
+    write_list(iter(records), 'json', stream)
+    assert stream.getvalue() == expected(records)
+
+def test_ndjson():
+    stream = io.StringIO()
+    write_result(records[0:2], 'ndjson', stream)
+    lines = stream.getvalue().splitlines()
+    assert [json.loads(line) for line in lines] == records[0:2]
+    stream = io.StringIO()
+    write_result(records[0], 'ndjson', stream)
+    assert json.loads(stream.getvalue()) == records[0]
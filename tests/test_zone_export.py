@@ -0,0 +1,34 @@
+#!/usr/bin/env python
+
+import os
+import sys
+sys.path.insert(0, os.path.abspath('..'))
+from CloudFlare.zone_export import export_zones, Archive
+
+import pytest
+
+def test_export_zones(tmp_path, cf):
+    directory = str(tmp_path / 'archive')
+    cf.zones._records[()] = [{'id': 'z%d' % i, 'name': 'zone%d.com' % i, 'modified_on': '2020'} for i in range(3)]
+    cf.zones.dns_records.export._handlers['get'] = lambda zone_id: 'www.%s. 1 IN A 10.0.0.1\n' % (zone_id)
+    assert export_zones(cf, directory).summary() == {
+        'exported': 3, 'unchanged': 0, 'removed': 0, 'errors': 0, 'api_calls': 4}
+
+    # only the zone that changed is exported again
+    cf.zones._records[()][1]['modified_on'] = '2021'
+    del cf.zones._records[()][2]
+    e = export_zones(cf, directory)
+    assert (e.exported, e.unchanged, e.removed, e.api_calls) == (['zone1.com'], ['zone0.com'], ['zone2.com'], 2)
+    assert len(cf.zones.dns_records.export._calls) == 4
+    assert Archive(directory).get('zone1.com') == 'www.z1. 1 IN A 10.0.0.1\n'
+    assert Archive(directory).get('zone2.com') is None
+
+    assert export_zones(cf, directory, max_age=-1).summary()['exported'] == 2
+
+def test_export_zones_raw(tmp_path, cf):
+    directory = str(tmp_path / 'archive')
+    cf._base.raw = True
+    cf.zones._records[()] = [{'id': 'z1', 'name': 'zone1.com', 'modified_on': '2020'}]
+    cf.zones.dns_records.export._handlers['get'] = lambda zone_id: {'result': 'www.%s. 1 IN A 10.0.0.1\n' % (zone_id)}
+    assert export_zones(cf, directory).summary()['exported'] == 1
+    assert Archive(directory).get('zone1.com') == 'www.z1. 1 IN A 10.0.0.1\n'
@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+
+import os
+import sys
+sys.path.insert(0, os.path.abspath('..'))
+from CloudFlare.zone_settings import diff, apply_settings
+from CloudFlare.exceptions import CloudFlareAPIError
+
+import pytest
+
+SETTINGS = [
+    {'id': 'ssl', 'value': 'flexible', 'editable': True},
+    {'id': 'http2', 'value': 'on', 'editable': True},
+    {'id': 'minify', 'value': {'css': 'off', 'html': 'off', 'js': 'off'}, 'editable': True},
+    {'id': 'tls_1_3', 'value': 'off', 'editable': False},
+]
+
+def test_diff():
+    assert diff(SETTINGS, {'ssl': 'strict', 'http2': 'on', 'minify': {'css': 'on'}}) == {
+        'ssl': ('flexible', 'strict'),
+        'minify': ({'css': 'off', 'html': 'off', 'js': 'off'}, {'css': 'on', 'html': 'off', 'js': 'off'}),
+    }
+    assert diff(SETTINGS, {'tls_1_3': 'off', 'minify': {'js': 'off'}}) == {}
+    with pytest.raises(CloudFlareAPIError):
+        diff(SETTINGS, {'tls_1_3': 'on'})
+    with pytest.raises(CloudFlareAPIError):
+        diff(SETTINGS, {'nope': 'on'})
+
+def settings(cf):
+    """ one.com needs changes, two.com doesn't and three.com can't be read"""
+    cf.zones._records[()] = [{'id': 'z1', 'name': 'one.com'}, {'id': 'z2', 'name': 'two.com'},
+                             {'id': 'z3', 'name': 'three.com'}]
+    cf.zones.settings._records[('z1',)] = SETTINGS
+    cf.zones.settings._records[('z2',)] = [dict(setting) for setting in SETTINGS]
+    cf.zones.settings._records[('z2',)][0]['value'] = 'strict'
+    cf.zones.settings._errors[('z3',)] = CloudFlareAPIError(1003, 'Invalid or missing zone id.')
+    return cf
+
+def test_apply_settings(cf):
+    settings(cf)
+    desired = {'ssl': 'strict', 'http2': 'on'}
+    r = apply_settings(cf, desired, dry_run=True, rate=None)
+    # one listing of the zones and one read of each zone's settings
+    assert r.summary() == {'changed': 1, 'settings_changed': 1, 'unchanged': 1, 'errors': 1, 'api_calls': 4,
+                           'applied': False}
+    assert r.changed == {'one.com': {'ssl': ('flexible', 'strict')}}
+    assert r.unchanged == ['two.com']
+    assert [(zone_name, int(e)) for zone_name, e in r.errors] == [('three.com', 1003)]
+    assert sorted(cf.zones.settings._calls_of('patch')) == []
+
+    # only the settings that differ are sent; in one PATCH
+    r = apply_settings(cf, dict(desired, minify={'css': 'on'}), zones=['z1', {'id': 'z2', 'name': 'two.com'}],
+                       rate=None)
+    # a read and a PATCH each
+    assert r.summary()['api_calls'] == 4 and r.applied
+    assert sorted(r.changed) == ['two.com', 'z1']
+    assert sorted(cf.zones.settings._calls_of('patch')) == [
+        (('z1',), {'items': [{'id': 'minify', 'value': {'css': 'on', 'html': 'off', 'js': 'off'}},
+                             {'id': 'ssl', 'value': 'strict'}]}),
+        (('z2',), {'items': [{'id': 'minify', 'value': {'css': 'on', 'html': 'off', 'js': 'off'}}]}),
+    ]
+
+def test_apply_settings_raw(cf):
+    cf._base.raw = True
+    cf.zones.settings._handlers['get'] = lambda zone_id: {'result': SETTINGS}
+    cf.zones.settings._handlers['patch'] = lambda zone_id, data=None: {'result': data['items']}
+    r = apply_settings(cf, {'http2': 'off'}, zones=['z1'], rate=None)
+    assert r.changed == {'z1': {'http2': ('on', 'off')}}
+    assert r.summary()['api_calls'] == 2